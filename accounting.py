@@ -0,0 +1,354 @@
+"""Token and payload accounting for every model call.
+
+Before a request is sent, the gateway asks `before_request` for a local
+estimate: text tokens from the character count, a flat per-image token cost,
+and the size of inline data (base64 strings are counted as sent, raw bytes
+at their base64-encoded size). Session budgets are checked against that
+estimate: a request that would push the session past GEMINI_SESSION_TOKEN_BUDGET,
+or a single request larger than GEMINI_MAX_REQUEST_TOKENS, is rejected with
+BudgetExceeded, or, with GEMINI_BUDGET_ACTION=downgrade, sent to the cheaper
+GEMINI_DOWNGRADE_MODEL instead (where the call allows switching models).
+`after_response` then records the usage metadata the model reported; a call
+that shared another caller's in-flight request (see singleflight) is counted
+as coalesced and charged its estimate, since it cost no upstream tokens.
+
+Calls are attributed to the app, feature (button) and session set with
+`set_scope` at the top of each script run and `scope(...)` around a feature.
+Totals are kept in memory for the UI, and each call is appended to
+usage_ledger.jsonl for capacity planning:
+
+    python accounting.py --report --by app feature
+"""
+import argparse
+import atexit
+import math
+import os
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from chat_sessions import content_text, estimate_tokens
+from question_log import JsonlLog, iter_records
+
+USAGE_LOG_FILE = "usage_ledger.jsonl"
+IMAGE_TOKENS = 258  # Gemini's per-image prompt cost for a standard tile
+SESSION_TOKEN_BUDGET = int(os.getenv("GEMINI_SESSION_TOKEN_BUDGET", "0"))  # 0 = unlimited
+MAX_REQUEST_TOKENS = int(os.getenv("GEMINI_MAX_REQUEST_TOKENS", "0"))  # 0 = unlimited
+BUDGET_ACTION = os.getenv("GEMINI_BUDGET_ACTION", "reject")  # or "downgrade"
+DOWNGRADE_MODEL = os.getenv("GEMINI_DOWNGRADE_MODEL", "gemini-2.0-flash-lite")
+MAX_SESSIONS = 10_000  # in-memory per-session totals kept
+
+SCOPE_FIELDS = ("app", "feature", "session")
+TOTAL_FIELDS = (
+    "requests", "estimated_tokens", "prompt_tokens", "output_tokens",
+    "payload_bytes", "base64_bytes", "images", "rejected", "downgraded", "coalesced",
+)
+
+
+class BudgetExceeded(RuntimeError):
+    """A request was refused before sending because it is over a token budget."""
+
+
+def _base64_size(n):
+    return 4 * math.ceil(n / 3)
+
+
+def measure(contents):
+    """Local estimate for request contents: a Counter of tokens, bytes and images."""
+    totals = Counter()
+
+    def visit(item):
+        if item is None:
+            return
+        if isinstance(item, str):
+            totals["estimated_tokens"] += estimate_tokens(item)
+            totals["payload_bytes"] += len(item.encode("utf-8"))
+        elif isinstance(item, (bytes, bytearray)):
+            totals["payload_bytes"] += len(item)
+            totals["base64_bytes"] += _base64_size(len(item))
+        elif isinstance(item, dict) and "mime_type" in item:
+            data = item.get("data") or b""
+            if isinstance(data, str):  # already base64-encoded by the caller
+                totals["base64_bytes"] += len(data)
+                totals["payload_bytes"] += len(data)
+            else:
+                totals["base64_bytes"] += _base64_size(len(data))
+                totals["payload_bytes"] += len(data)
+            if str(item["mime_type"]).startswith(("image/", "application/pdf")):
+                totals["images"] += 1
+                totals["estimated_tokens"] += IMAGE_TOKENS
+            else:
+                totals["estimated_tokens"] += len(data) // 4 + 1
+        elif isinstance(item, dict) and "parts" in item:
+            for part in item["parts"]:
+                visit(part)
+        elif isinstance(item, (list, tuple)):
+            for part in item:
+                visit(part)
+        elif hasattr(item, "size") and hasattr(item, "mode"):  # PIL image
+            totals["images"] += 1
+            totals["estimated_tokens"] += IMAGE_TOKENS
+        elif hasattr(item, "parts"):  # proto Content from a chat history
+            visit(content_text(item))
+        elif hasattr(item, "content"):  # LangChain message
+            visit(item.content)
+        else:
+            visit(str(item))
+
+    visit(contents)
+    return totals
+
+
+_local = threading.local()
+
+
+def current_scope():
+    return dict(getattr(_local, "scope", None) or {})
+
+
+def set_scope(**fields):
+    """Attribute calls on this thread (one Streamlit script run) to app/feature/session."""
+    _local.scope = {k: fields.get(k) for k in SCOPE_FIELDS}
+
+
+@contextmanager
+def scope(**fields):
+    """Temporarily override scope fields, e.g. `with scope(feature="percentage_match"):`."""
+    previous = getattr(_local, "scope", None)
+    merged = dict(previous or {})
+    merged.update({k: v for k, v in fields.items() if k in SCOPE_FIELDS})
+    _local.scope = merged
+    try:
+        yield
+    finally:
+        _local.scope = previous
+
+
+class Ledger:
+    """In-memory totals per (app, feature, session), plus the JSONL ledger."""
+
+    def __init__(self, sink=None, max_sessions=MAX_SESSIONS):
+        self._lock = threading.Lock()
+        self._totals = {}  # (app, feature, session) -> Counter
+        self._sessions = OrderedDict()  # session -> tokens charged
+        self.max_sessions = max_sessions
+        self.sink = sink
+
+    def session_tokens(self, session):
+        with self._lock:
+            return self._sessions.get(session, 0)
+
+    def _charge(self, session, tokens):
+        if session is None:
+            return
+        self._sessions[session] = self._sessions.get(session, 0) + tokens
+        self._sessions.move_to_end(session)
+        while len(self._sessions) > self.max_sessions:
+            evicted, _ = self._sessions.popitem(last=False)
+            for key in [k for k in self._totals if k[2] == evicted]:
+                del self._totals[key]
+
+    def add(self, fields, counts, charge=0):
+        key = tuple(fields.get(k) for k in SCOPE_FIELDS)
+        with self._lock:
+            self._totals.setdefault(key, Counter()).update(counts)
+            self._charge(fields.get("session"), charge)
+        if self.sink is not None:
+            self.sink.write(dict(fields, **counts))
+
+    def summary(self, by=("app",)):
+        """{group key tuple: totals} aggregated over the given scope fields."""
+        index = [SCOPE_FIELDS.index(f) for f in by]
+        groups = {}
+        with self._lock:
+            for key, counts in self._totals.items():
+                groups.setdefault(tuple(key[i] for i in index), Counter()).update(counts)
+        return groups
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    """Process-wide ledger, writing to usage_ledger.jsonl in the background."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            sink = JsonlLog(os.getenv("GEMINI_USAGE_LOG", USAGE_LOG_FILE))
+            atexit.register(sink.close)
+            _ledger = Ledger(sink)
+        return _ledger
+
+
+class Ticket:
+    """What `before_request` decided; passed back to `after_response`."""
+
+    def __init__(self, fields, counts, model):
+        self.fields = fields
+        self.counts = counts
+        self.model = model
+
+
+def before_request(contents, model=None, can_downgrade=True):
+    """Measure a request and apply budgets; returns a Ticket whose `.model` may be downgraded.
+
+    Raises BudgetExceeded when the request has to be refused.
+    """
+    fields = current_scope()
+    counts = measure(contents)
+    tokens = counts["estimated_tokens"]
+    session = fields.get("session")
+    ledger = get_ledger()
+    over = None
+    if MAX_REQUEST_TOKENS and tokens > MAX_REQUEST_TOKENS:
+        over = f"request of ~{tokens} tokens is over the {MAX_REQUEST_TOKENS}-token limit"
+    elif SESSION_TOKEN_BUDGET and session is not None:
+        used = ledger.session_tokens(session)
+        if used + tokens > SESSION_TOKEN_BUDGET:
+            over = f"session has used {used} of its {SESSION_TOKEN_BUDGET}-token budget"
+    if over is not None:
+        if BUDGET_ACTION == "downgrade" and can_downgrade and model != DOWNGRADE_MODEL:
+            counts["downgraded"] = 1
+            model = DOWNGRADE_MODEL
+        else:
+            ledger.add(fields, Counter(rejected=1))
+            raise BudgetExceeded(over)
+    counts["requests"] = 1
+    return Ticket(fields, counts, model)
+
+
+def after_response(ticket, usage=None, coalesced=False):
+    """Record a finished call; `usage` is the response's usage_metadata, if any."""
+    counts = Counter(ticket.counts)
+    if coalesced:
+        counts["coalesced"] = 1
+        usage = None  # the leader's call already recorded the upstream usage
+    prompt = getattr(usage, "prompt_token_count", None) if usage is not None else None
+    output = getattr(usage, "candidates_token_count", None) if usage is not None else None
+    if prompt is not None:
+        counts["prompt_tokens"] += prompt
+    if output is not None:
+        counts["output_tokens"] += output
+    # Charge the session what the model reported, falling back to the local estimate
+    charge = (prompt if prompt is not None else counts["estimated_tokens"]) + (output or 0)
+    get_ledger().add(ticket.fields, counts, charge)
+
+
+class _AccountedStream:
+    """Passes a streamed response through and records its usage once consumed."""
+
+    def __init__(self, response, ticket):
+        self._response = response
+        self._ticket = ticket
+
+    def __iter__(self):
+        yield from self._response
+        after_response(
+            self._ticket, getattr(self._response, "usage_metadata", None),
+            getattr(self._response, "coalesced", False),
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+def track(response, ticket, stream=False):
+    """Record a response now, or when a streamed one has been fully read."""
+    if stream:
+        return _AccountedStream(response, ticket)
+    after_response(ticket, getattr(response, "usage_metadata", None), getattr(response, "coalesced", False))
+    return response
+
+
+def langchain_callbacks():
+    """Callbacks that account for (and budget) LangChain chat model calls."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class UsageCallback(BaseCallbackHandler):
+        raise_error = True  # let BudgetExceeded stop the call
+
+        def __init__(self):
+            self._tickets = {}
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._tickets[run_id] = before_request(messages, can_downgrade=False)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            ticket = self._tickets.pop(run_id, None)
+            if ticket is None:
+                return
+            usage = None
+            try:
+                meta = response.generations[0][0].message.usage_metadata or {}
+                usage = SimpleNamespace(
+                    prompt_token_count=meta.get("input_tokens"),
+                    candidates_token_count=meta.get("output_tokens"),
+                )
+            except (AttributeError, IndexError):
+                pass
+            after_response(ticket, usage)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._tickets.pop(run_id, None)
+
+    return [UsageCallback()]
+
+
+def session_summary(session):
+    """Totals for one session, for a sidebar caption."""
+    return get_ledger().summary(by=("session",)).get((session,), Counter())
+
+
+def use_streamlit_session(app):
+    """Scope this Streamlit script run to `app` and the visitor's session; returns the session id."""
+    import streamlit as st
+
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
+    set_scope(app=app, session=st.session_state["session_id"])
+    return st.session_state["session_id"]
+
+
+def show_session_usage():
+    """Sidebar caption with this session's token and payload totals."""
+    import streamlit as st
+
+    session = current_scope().get("session")
+    totals = session_summary(session) if session else None
+    if not totals:
+        return
+    budget = f" of {SESSION_TOKEN_BUDGET}" if SESSION_TOKEN_BUDGET else ""
+    st.sidebar.caption(
+        f"This session: {totals['requests']} model calls, {get_ledger().session_tokens(session)}{budget} tokens, "
+        f"{totals['base64_bytes'] / 1024:.0f} KiB of inline data"
+    )
+
+
+def report(path=USAGE_LOG_FILE, by=("app",)):
+    """Aggregate the persisted ledger by the given scope fields."""
+    groups = {}
+    for record in iter_records(path):
+        key = tuple(record.get(f) for f in by)
+        groups.setdefault(key, Counter()).update(
+            {k: record[k] for k in TOTAL_FIELDS if isinstance(record.get(k), (int, float))}
+        )
+    return groups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gemini token and payload accounting")
+    parser.add_argument("--report", action="store_true", help="aggregate the usage ledger")
+    parser.add_argument("--by", nargs="+", default=["app"], choices=SCOPE_FIELDS)
+    parser.add_argument("--ledger", default=os.getenv("GEMINI_USAGE_LOG", USAGE_LOG_FILE))
+    args = parser.parse_args()
+    if not args.report:
+        parser.print_help()
+    else:
+        columns = ("requests", "estimated_tokens", "prompt_tokens", "output_tokens", "base64_bytes", "coalesced", "rejected")
+        print(" / ".join(args.by).ljust(40) + "".join(f"{c:>18}" for c in columns))
+        for key, counts in sorted(report(args.ledger, args.by).items(), key=lambda kv: -kv[1]["requests"]):
+            label = " / ".join(str(k) for k in key)
+            print(label[:40].ljust(40) + "".join(f"{counts[c]:>18}" for c in columns))
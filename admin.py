@@ -1,20 +1,9 @@
-import os
-import json
 import streamlit as st
-
-EVENTS_FILE = "events.json"
-
-def save_events_to_file(events):
-    """Save events to a JSON file."""
-    with open(EVENTS_FILE, "w") as file:
-        json.dump(events, file)
-
-def load_events_from_file():
-    """Load events from a JSON file."""
-    if os.path.exists(EVENTS_FILE):
-        with open(EVENTS_FILE, "r") as file:
-            return json.load(file)
-    return {}
+from event_cache import get_event_cache
+from event_faq import faq_status, load_faq_questions, schedule_faq_generation
+from event_response import get_event_response
+from event_retrieval import build_event_index
+from event_store import get_event_store, load_events_from_file
 
 def admin_page():
     """Admin page for managing events."""
@@ -31,8 +20,12 @@ def admin_page():
 
         if submitted:
             if event_name and event_description:
+                get_event_store().upsert(event_name, event_description)
+                get_event_cache().invalidate_event(event_name)
+                build_event_index(event_name, event_description)
+                # Answer the common questions now so visitors don't wait for the model
+                schedule_faq_generation(event_name, event_description, get_event_response)
                 events[event_name] = event_description
-                save_events_to_file(events)
                 st.success(f"Event '{event_name}' added/updated successfully!")
             else:
                 st.error("Please fill in all fields.")
@@ -43,9 +36,16 @@ def admin_page():
         for event_name in list(events.keys()):
             with st.expander(event_name):
                 st.write(events[event_name])
+                answered = len(get_event_store().get_faq(event_name, events[event_name]))
+                status = faq_status(event_name)
+                if status == "pending":
+                    st.caption("Pre-generating answers to common questions...")
+                else:
+                    st.caption(f"{answered}/{len(load_faq_questions())} common questions pre-answered.")
                 if st.button(f"Delete '{event_name}'", key=f"delete_{event_name}"):
+                    get_event_store().delete(event_name)
+                    get_event_cache().invalidate_event(event_name)
                     del events[event_name]
-                    save_events_to_file(events)
                     st.success(f"Event '{event_name}' deleted.")
                     st.experimental_rerun()
 
@@ -0,0 +1,16 @@
+"""Headless core of the Streamlit apps, importable without side effects.
+
+- `analysers.pdf_qa`: PDF text extraction, chunking, FAISS indexing, QA, sentiment
+- `analysers.ocr`: scanned-page detection and transcription for PDF text extraction
+- `analysers.reranking`: diverse re-ranking of over-fetched FAISS candidates
+- `analysers.resume`: resume review and ATS percentage match
+- `analysers.resume_ranking`: rank many resumes, model review for the top N only
+- `analysers.invoice`: invoice image question answering
+- `analysers.image`: image description and follow-up questions
+- `analysers.events`: event question answering
+
+Importing a module configures nothing and loads heavy dependencies only when
+a function needs them; the Gemini SDK is configured by gemini_gateway on the
+first call. `python -m analysers --help` runs any of them over many inputs in
+parallel and writes JSONL results.
+"""
@@ -0,0 +1,183 @@
+"""Batch runner: one analyser over many inputs in parallel, results as JSONL.
+
+    python -m analysers resume --job-description jd.txt --mode percentage_match resumes/*.pdf
+    python -m analysers invoice --question "What is the total amount?" invoices/*.png -o out.jsonl
+    python -m analysers image photos/*.jpg
+    python -m analysers pdf-qa -q "What is the warranty period?" -q "Who is the vendor?" docs/*.pdf
+    python -m analysers event --questions-file questions.txt "Tech Fest" "Hackathon"
+
+Each output line has the task, the input, the result or error and the latency.
+Concurrency of model calls is still bounded by gemini_gateway.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import accounting
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _text_arg(value):
+    """A literal string, or the contents of a file when given as @path."""
+    if value and value.startswith("@"):
+        with open(value[1:], "r", encoding="utf-8") as f:
+            return f.read()
+    return value or ""
+
+
+def resume_items(args):
+    from analysers.resume import analyse_resume
+
+    job_description = _text_arg(args.job_description)
+    for path in args.inputs:
+        yield {"input": path}, lambda path=path: analyse_resume(_read(path), job_description, args.mode)
+
+
+def invoice_items(args):
+    from analysers.invoice import extract_invoice, guess_mime_type
+
+    for path in args.inputs:
+        yield {"input": path, "question": args.question}, (
+            lambda path=path: extract_invoice(_read(path), guess_mime_type(path), args.question)
+        )
+
+
+def image_items(args):
+    from PIL import Image
+
+    from analysers.image import answer_question, get_image_description, get_image_model
+
+    def run(path):
+        with Image.open(path) as image:
+            image.load()
+            if args.question:
+                return answer_question(get_image_model(), image, args.question, [])
+            return get_image_description(get_image_model(), image)
+
+    for path in args.inputs:
+        yield {"input": path, "question": args.question}, lambda path=path: run(path)
+
+
+def pdf_qa_items(args):
+    from analysers import pdf_qa
+
+    def run(path):
+        # One in-memory index per document, answering every question against it
+        chunks = pdf_qa.get_text_chunks(pdf_qa.get_pdf_text([path]), args.chunk_size, args.chunk_size // 10)
+        if not chunks:
+            raise ValueError("no extractable text")
+        store = pdf_qa.get_vector_store(chunks, index_dir=None)
+        return {q: pdf_qa.answer_question(q, store, k=args.k) for q in args.question}
+
+    for path in args.inputs:
+        yield {"input": path, "questions": args.question}, lambda path=path: run(path)
+
+
+def event_items(args):
+    from analysers.events import answer_event_question
+
+    questions = list(args.question or [])
+    if args.questions_file:
+        with open(args.questions_file, "r", encoding="utf-8") as f:
+            questions.extend(line.strip() for line in f if line.strip())
+    for event in args.inputs:
+        for question in questions:
+            yield {"input": event, "question": question}, (
+                lambda event=event, question=question: answer_event_question(event, question)
+            )
+
+
+TASKS = {
+    "resume": resume_items,
+    "invoice": invoice_items,
+    "image": image_items,
+    "pdf-qa": pdf_qa_items,
+    "event": event_items,
+}
+
+
+def run(task, items, out, jobs=4):
+    """Run work items on a thread pool, writing one JSON line per item as it finishes.
+
+    Returns (succeeded, failed).
+    """
+    lock = threading.Lock()
+    counts = {"ok": 0, "failed": 0}
+
+    def work(fields, fn):
+        start = time.perf_counter()
+        record = dict(task=task, **fields)
+        try:
+            with accounting.scope(app="cli", feature=task):
+                record["result"] = fn()
+            record["ok"] = True
+        except Exception as e:
+            record.update(ok=False, error=f"{type(e).__name__}: {e}")
+        record["latency_s"] = round(time.perf_counter() - start, 3)
+        line = json.dumps(record, ensure_ascii=False)
+        with lock:
+            out.write(line + "\n")
+            out.flush()
+            counts["ok" if record["ok"] else "failed"] += 1
+
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix=f"analysers-{task}") as pool:
+        for future in as_completed([pool.submit(work, fields, fn) for fields, fn in items]):
+            future.result()
+    return counts["ok"], counts["failed"]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m analysers", description="Run an analyser over many inputs")
+    parser.add_argument("-o", "--out", default="-", help="JSONL output file (default stdout)")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="inputs processed in parallel")
+    sub = parser.add_subparsers(dest="task", required=True)
+
+    p = sub.add_parser("resume", help="review resume PDFs against a job description")
+    p.add_argument("--job-description", required=True, help="text, or @file")
+    p.add_argument("--mode", default="evaluation", choices=["evaluation", "percentage_match"])
+    p.add_argument("inputs", nargs="+", metavar="PDF")
+
+    p = sub.add_parser("invoice", help="ask a question about invoice images")
+    p.add_argument("--question", default="", help="question to ask (default: describe the invoice)")
+    p.add_argument("inputs", nargs="+", metavar="IMAGE")
+
+    p = sub.add_parser("image", help="describe images, or ask one question about each")
+    p.add_argument("--question")
+    p.add_argument("inputs", nargs="+", metavar="IMAGE")
+
+    p = sub.add_parser("pdf-qa", help="ask questions of each PDF")
+    p.add_argument("-q", "--question", action="append", required=True)
+    p.add_argument("-k", type=int, default=4, help="chunks retrieved per question")
+    p.add_argument("--chunk-size", type=int, default=5000)
+    p.add_argument("inputs", nargs="+", metavar="PDF")
+
+    p = sub.add_parser("event", help="ask questions about stored events")
+    p.add_argument("-q", "--question", action="append")
+    p.add_argument("--questions-file", help="one question per line")
+    p.add_argument("inputs", nargs="+", metavar="EVENT")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    items = TASKS[args.task](args)
+    out = sys.stdout if args.out == "-" else open(args.out, "a", encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        ok, failed = run(args.task, items, out, args.jobs)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{args.task}: {ok} ok, {failed} failed in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""Event question answering over the events in the event store."""
+from event_response import (
+    get_cached_event_response, get_event_response, stream_cached_event_response, stream_event_response,
+)
+from event_store import get_event_store
+
+
+class UnknownEvent(KeyError):
+    """The event is not in the event store."""
+
+
+def _description(event_name, description):
+    if description is None:
+        description = get_event_store().get(event_name)
+        if description is None:
+            raise UnknownEvent(event_name)
+    return description
+
+
+def answer_event_question(event_name, question, description=None, cached=True):
+    """Answer a question about a stored event (or one given by `description`)."""
+    description = _description(event_name, description)
+    if cached:
+        return get_cached_event_response(event_name, description, question)
+    return get_event_response(description, question, event_name)
+
+
+def stream_event_answer(event_name, question, description=None, cached=True):
+    """A generator of answer chunks; raises UnknownEvent now, before anything is streamed."""
+    description = _description(event_name, description)
+    if cached:
+        return stream_cached_event_response(event_name, description, question)
+    return stream_event_response(description, question, event_name)
@@ -0,0 +1,44 @@
+"""Image description and follow-up questions about an image."""
+import base64
+import os
+from io import BytesIO
+
+from tracing import trace
+
+import gemini_gateway
+
+DESCRIBE_PROMPT = "Describe this image in detail. Include objects, colors, actions, and any text present."
+
+
+def get_image_model():
+    """The model named by GEMINI_MODEL (default gemini-2.0-flash)."""
+    return gemini_gateway.get_model(os.getenv("GEMINI_MODEL", "gemini-2.0-flash"))
+
+
+def image_part(image):
+    """A PIL image as a base64 PNG inline part."""
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return {"mime_type": "image/png", "data": base64.b64encode(buffer.getvalue()).decode()}
+
+
+@trace("get_image_description")
+def get_image_description(model, image):
+    response = gemini_gateway.generate_content([DESCRIBE_PROMPT, image_part(image)], model=model)
+    return response.text
+
+
+@trace("answer_question")
+def answer_question(model, image, question, history):
+    """Answer a question about the image given earlier (question, answer) turns."""
+    context = "\n".join([f"Q: {q}\nA: {a}" for q, a in history])
+    prompt = f"""
+        Context from previous conversation:
+        {context}
+
+        New question: {question}
+
+        Answer the question based on the image and previous context.
+        """
+    response = gemini_gateway.generate_content([prompt, image_part(image)], model=model)
+    return response.text
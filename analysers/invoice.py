@@ -0,0 +1,33 @@
+"""Question answering over invoice images, in any language."""
+import mimetypes
+
+from tracing import trace
+
+from analysers.resume import get_gemini_response
+
+INVOICE_PROMPT = """
+               You are an expert in understanding invoices.
+               You will receive input images as invoices &
+               you will have to answer questions based on the input image
+               """
+
+DETAILED_INVOICE_PROMPT = """
+                    You are an expert in understanding invoices.
+                    You will receive input images as invoices and answer questions based on the input image.
+                    Provide detailed, accurate responses with extracted values when possible.
+                    """
+
+
+@trace("input_image_setup")
+def input_image_setup(image_bytes, mime_type):
+    """Raw image bytes as an inline part (a list with one part)."""
+    return [{"mime_type": mime_type, "data": image_bytes}]
+
+
+def guess_mime_type(path):
+    return mimetypes.guess_type(path)[0] or "image/jpeg"
+
+
+def extract_invoice(image_bytes, mime_type, question="", instruction=INVOICE_PROMPT):
+    """Answer `question` about an invoice image (describe it if the question is empty)."""
+    return get_gemini_response(instruction, input_image_setup(image_bytes, mime_type), question)
@@ -0,0 +1,286 @@
+"""Text for scanned PDF pages: classify each page, transcribe the image-only ones.
+
+PyPDF2 finds no text on a page that is only a picture of text, and such pages
+used to drop out of the index silently. `read_pages` reads each page's text
+layer as before (the fast path) and classifies it:
+
+- text:  the text layer has at least MIN_TEXT_CHARS characters
+- ocr:   little or no text but the page draws an image; it is rendered with
+         pdf2image and transcribed by Gemini on a shared pool of OCR_WORKERS
+         threads while the parser carries on with the following pages
+- blank: no text and nothing drawn
+
+so a mixed document takes about as long as its scanned pages do. The page
+classification, the text layers and the transcripts go into the shared
+artifact cache under the document's content hash, so a re-uploaded document
+is neither parsed nor transcribed again. Each document's page counts come
+back as `DocumentStats`.
+
+    python -m analysers.ocr scanned.pdf mixed.pdf
+"""
+import argparse
+import base64
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import tracing
+from analysers.chunking import Page
+from artifact_cache import content_hash, get_artifact_cache
+
+OCR_ENABLED = os.getenv("PDF_OCR", "1") != "0"
+OCR_WORKERS = int(os.getenv("PDF_OCR_WORKERS", "4"))
+OCR_MODEL = "gemini-2.0-flash"
+OCR_DPI = 200
+MIN_TEXT_CHARS = 20  # fewer is a page number or a stray header over a scan
+
+OCR_PROMPT = (
+    "Transcribe all text on this scanned document page exactly as written, in reading order. "
+    "Put headings, list items and table rows on their own lines. "
+    "Return only the transcribed text with no commentary, or nothing if the page has no text."
+)
+
+TEXT, OCR, BLANK = "text", "ocr", "blank"
+
+
+@dataclass
+class DocumentStats:
+    source: Optional[str]
+    pages: int = 0
+    text_pages: int = 0
+    ocr_pages: int = 0
+    cached_pages: int = 0  # OCR pages answered from the cache
+    cached_text_layer: bool = False  # the document was not parsed again
+    blank_pages: int = 0
+    missing_pages: int = 0  # OCR pages left without text: OCR disabled or failed
+    seconds: float = 0.0
+
+    def summary(self):
+        ocr = f"{self.ocr_pages} OCR"
+        if self.cached_pages:
+            ocr += f" ({self.cached_pages} cached)"
+        line = f"{self.pages} pages: {self.text_pages} text, {ocr}, {self.blank_pages} blank"
+        if self.missing_pages:
+            line += f", {self.missing_pages} without text"
+        if self.cached_text_layer:
+            line += ", text layer cached"
+        return f"{line}; {self.seconds:.1f}s"
+
+
+def _ocr_params(dpi=OCR_DPI, model=OCR_MODEL):
+    """Everything besides the page that shapes a transcript, as artifact cache parameters."""
+    return {"dpi": dpi, "model": model, "prompt": content_hash(OCR_PROMPT.encode("utf-8"))[:16]}
+
+
+def _draws_image(resources, depth=0):
+    """Whether a resource dictionary has an image XObject, looking into form XObjects."""
+    xobjects = resources.get("/XObject") if resources is not None else None
+    if xobjects is None or depth > 3:
+        return False
+    for ref in xobjects.get_object().values():
+        obj = ref.get_object()
+        subtype = obj.get("/Subtype")
+        if subtype == "/Image":
+            return True
+        if subtype == "/Form" and _draws_image(obj.get("/Resources"), depth + 1):
+            return True
+    return False
+
+
+def classify(page, text):
+    """TEXT, OCR or BLANK for a PyPDF2 page and its extracted text."""
+    if len(text.strip()) >= MIN_TEXT_CHARS:
+        return TEXT
+    try:
+        resources = page.get("/Resources")
+        # Resources inherited from the page tree are not looked up; transcribing is the safe guess
+        images = resources is None or _draws_image(resources.get_object())
+    except Exception:
+        images = True
+    if images:
+        return OCR
+    return TEXT if text.strip() else BLANK
+
+
+def render_page(data, number, dpi=OCR_DPI, grayscale=False, quality=75, data_hash=None):
+    """Page `number` (1-based) of a PDF as JPEG bytes, through the artifact cache."""
+    cache = get_artifact_cache()
+    data_hash = data_hash or content_hash(data)
+    params = {"dpi": dpi, "grayscale": grayscale, "quality": quality}
+    jpeg = cache.get("page_image", data_hash, number, **params)
+    if jpeg is None:
+        import pdf2image
+
+        with tracing.trace("render_page"):
+            image = pdf2image.convert_from_bytes(data, dpi=dpi, first_page=number, last_page=number,
+                                                 grayscale=grayscale)[0]
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality)
+            jpeg = buffer.getvalue()
+        cache.put("page_image", data_hash, jpeg, number, **params)
+    return jpeg
+
+
+def transcribe_page(data, number, dpi=OCR_DPI, model=OCR_MODEL, data_hash=None):
+    """Render page `number` (1-based) of a PDF and transcribe it with Gemini."""
+    import gemini_gateway
+
+    jpeg = render_page(data, number, dpi=dpi, grayscale=True, quality=85, data_hash=data_hash)
+    part = {"mime_type": "image/jpeg", "data": base64.b64encode(jpeg).decode()}
+    with tracing.trace("ocr_transcribe"):
+        response = gemini_gateway.generate_content([OCR_PROMPT, part], model=model)
+    return response.text or ""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """One pool per process, so OCR_WORKERS bounds concurrent transcriptions across documents and sessions."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, OCR_WORKERS), thread_name_prefix="pdf-ocr")
+        return _pool
+
+
+def _read_bytes(pdf):
+    if isinstance(pdf, str):
+        with open(pdf, "rb") as f:
+            return f.read()
+    if hasattr(pdf, "getvalue"):
+        return pdf.getvalue()
+    pdf.seek(0)
+    return pdf.read()
+
+
+def _cached_text_layer(cache, doc_hash):
+    """[(number, method, text)] from the artifact cache, or None unless every text page is there."""
+    layout = cache.get_json("pdf_layout", doc_hash, min_chars=MIN_TEXT_CHARS)
+    if layout is None:
+        return None
+    results = []
+    for number, method in enumerate(layout, 1):
+        text = "" if method == OCR else cache.get_text("page_text", doc_hash, number)
+        if text is None:
+            return None  # evicted: parse again
+        results.append((number, method, text))
+    return results
+
+
+def _text_layer(cache, doc_hash, data):
+    """(page count, iterator of (number, method, text), whether it came from the cache).
+
+    Uncached, pages are extracted and classified one at a time as the
+    iterator is consumed, and stored for the next upload of the same file.
+    """
+    from PyPDF2 import PdfReader
+
+    cached = _cached_text_layer(cache, doc_hash)
+    if cached is not None:
+        return len(cached), iter(cached), True
+    pages = PdfReader(io.BytesIO(data)).pages
+
+    def read():
+        methods = []
+        for number, page in enumerate(pages, 1):
+            with tracing.trace("pdf_page_text"):
+                text = page.extract_text() or ""
+                method = classify(page, text)
+            if method != OCR:
+                cache.put_text("page_text", doc_hash, text, number)
+            methods.append(method)
+            yield number, method, "" if method == OCR else text
+        # Written last, so a layout in the cache means its pages were stored too
+        cache.put_json("pdf_layout", doc_hash, methods, min_chars=MIN_TEXT_CHARS)
+
+    return len(pages), read(), False
+
+
+def read_pages(pdf, ocr=None, cache=None, on_stats=None):
+    """Pages of one PDF (a path or file-like object) in order, scanned pages transcribed.
+
+    Yields `Page`s whose `method` says which path each took, each as soon as
+    it and every page before it are ready: text pages come straight from the
+    parser while scanned pages are transcribed in the background, and the
+    parser carries on past a page that is still being transcribed. The file's
+    bytes are held in memory for the content hash and page rendering.
+    `ocr=False` skips transcription (scanned pages come back empty);
+    `on_stats(DocumentStats)` is called once the whole document has been read.
+    """
+    import accounting
+
+    ocr = OCR_ENABLED if ocr is None else ocr
+    cache = cache or get_artifact_cache()
+    source = pdf if isinstance(pdf, str) else getattr(pdf, "name", None)
+    start = time.perf_counter()
+    data = _read_bytes(pdf)
+    doc_hash = content_hash(data)
+    fields = accounting.current_scope()  # the caller's app/session, for the OCR threads
+    params = _ocr_params()
+    count, layer, cached_layer = _text_layer(cache, doc_hash, data)
+    stats = DocumentStats(source, count, cached_text_layer=cached_layer)
+
+    def run_ocr(number):
+        with accounting.scope(**fields):
+            text = transcribe_page(data, number, data_hash=doc_hash)
+        cache.put_text("ocr_text", doc_hash, text, number, **params)
+        return text
+
+    def finish(number, method, text):
+        if not isinstance(text, str):
+            try:
+                text = text.result()
+            except Exception as e:
+                print(f"OCR failed for page {number} of {source or 'PDF'}: {type(e).__name__}: {e}")
+                tracing.count("pdf_ocr_failures_total")
+                text = ""
+        if method == OCR and not text.strip():
+            stats.missing_pages += 1
+        setattr(stats, f"{method}_pages", getattr(stats, f"{method}_pages") + 1)
+        return Page(source, number, count, text, method)
+
+    waiting = deque()  # pages read but not yet yielded, in order; OCR pages hold a Future
+    try:
+        for number, method, text in layer:
+            if method == OCR and ocr:
+                transcript = cache.get_text("ocr_text", doc_hash, number, **params)
+                if transcript is not None:
+                    stats.cached_pages += 1
+                    text = transcript
+                else:
+                    text = _get_pool().submit(run_ocr, number)
+            waiting.append((number, method, text))
+            while waiting and (isinstance(waiting[0][2], str) or waiting[0][2].done()):
+                yield finish(*waiting.popleft())
+        while waiting:
+            yield finish(*waiting.popleft())
+    finally:
+        for _, _, text in waiting:
+            if not isinstance(text, str):
+                text.cancel()  # the reader stopped early (a cancelled ingest job)
+    stats.seconds = time.perf_counter() - start
+    for method in (TEXT, OCR, BLANK):
+        tracing.count(f"pdf_pages_{method}_total", getattr(stats, f"{method}_pages"))
+    if on_stats:
+        on_stats(stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m analysers.ocr",
+                                     description="Classify PDF pages and transcribe the scanned ones")
+    parser.add_argument("--no-ocr", action="store_true", help="classify only")
+    parser.add_argument("--print", action="store_true", help="print the text of every page")
+    parser.add_argument("pdfs", nargs="+", metavar="PDF")
+    args = parser.parse_args()
+
+    for path in args.pdfs:
+        for page in read_pages(path, ocr=not args.no_ocr, on_stats=lambda s: print(f"{s.source}: {s.summary()}")):
+            if args.print:
+                print(f"--- page {page.number} ({page.method}) ---\n{page.text}")
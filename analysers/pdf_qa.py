@@ -0,0 +1,163 @@
+"""Question answering over PDF documents: extract, chunk, index, retrieve, answer."""
+import functools
+
+from tracing import trace
+
+import gemini_gateway
+from analysers.chunking import CHUNK_TOKENS, OVERLAP_TOKENS, chunk_pages, chunk_text, iter_pdf_pages
+from chat_sessions import CHARS_PER_TOKEN
+
+INDEX_DIR = "faiss_index"
+EMBEDDING_MODEL = "models/embedding-001"
+
+# Prompt used by the original "Chat PDF" app: detailed, refuses when unsure
+DETAILED_PROMPT = """
+    Answer the question as detailed as possible from the provided context, make sure to provide all the details, if the answer is not in
+    provided context just say, "answer is not available in the context", don't provide the wrong answer\n\n
+    Context:\n {context}?\n
+    Question: \n{question}\n
+
+    Answer:
+    """
+
+# Prompt used by "Chat & Analyze PDF": explains in its own words
+EXPLAIN_PROMPT = """
+    Based on the provided context from the document(s), answer the following question.
+    Do not just copy text verbatim. Explain the answer in your own words while staying true to the information in the context.
+    If the answer cannot be found or inferred from the provided context, clearly state that the information is not available in the document(s).
+    Do not provide speculative or incorrect answers.
+
+    Context:\n{context}\n
+    Question: \n{question}\n
+
+    Answer:
+    """
+
+SENTIMENT_PROMPT = """
+    Analyze the overall sentiment of the following text.
+    Describe the dominant sentiment (e.g., Positive, Negative, Neutral, Mixed) and briefly explain why, citing examples from the text if possible.
+
+    Text:\n{text}\n
+
+    Sentiment Analysis:
+    """
+
+
+@trace("get_pdf_text")
+def get_pdf_text(pdf_docs, on_error=None, on_stats=None):
+    """Concatenated text of PDFs (paths or file-like objects), scanned pages transcribed.
+
+    Unreadable files are skipped and reported to `on_error(pdf, exc)` if given,
+    otherwise the error is raised. `on_stats` gets each document's
+    `analysers.ocr.DocumentStats`.
+    """
+    return "".join(page.text for page in iter_pdf_pages(pdf_docs, on_error, on_stats=on_stats))
+
+
+@trace("get_text_chunks")
+def get_text_chunks(text, chunk_size=5000, chunk_overlap=500):
+    """Split text into overlapping sentence-aligned chunks; sizes in characters, as before."""
+    if not text:
+        return []
+    return chunk_text(text, chunk_size // CHARS_PER_TOKEN, chunk_overlap // CHARS_PER_TOKEN)
+
+
+@trace("get_pdf_chunks")
+def get_pdf_chunks(pdf_docs, chunk_tokens=CHUNK_TOKENS, overlap_tokens=OVERLAP_TOKENS, on_error=None,
+                   on_stats=None):
+    """Chunks of PDFs with source, page and heading metadata, chunked page by page as they are read."""
+    pages = iter_pdf_pages(pdf_docs, on_error, on_stats=on_stats)
+    return list(chunk_pages(pages, chunk_tokens, overlap_tokens))
+
+
+@trace("get_vector_store")
+def get_vector_store(text_chunks, index_dir=INDEX_DIR):
+    """Embed chunks (strings, or Chunks whose metadata is kept) into a FAISS index.
+
+    The index is saved to `index_dir` unless it is None.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    texts = [getattr(c, "text", c) for c in text_chunks]
+    metadatas = [c.metadata for c in text_chunks] if text_chunks and hasattr(text_chunks[0], "metadata") else None
+    vector_store = FAISS.from_texts(
+        texts, embedding=gemini_gateway.get_embeddings(EMBEDDING_MODEL), metadatas=metadatas,
+    )
+    if index_dir:
+        vector_store.save_local(index_dir)
+    return vector_store
+
+
+@trace("load_index")
+def load_vector_store(index_dir=INDEX_DIR):
+    from langchain_community.vectorstores import FAISS
+
+    embeddings = gemini_gateway.get_embeddings(EMBEDDING_MODEL)
+    # Only ever loads indexes this code wrote itself
+    return FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+
+
+@functools.lru_cache(maxsize=None)
+def get_conversational_chain(prompt_template=DETAILED_PROMPT, temperature=0.3, model="gemini-2.0-flash"):
+    """A "stuff" question-answering chain over retrieved documents, built once per settings."""
+    from langchain.chains.question_answering import load_qa_chain
+    from langchain.prompts import PromptTemplate
+
+    llm = gemini_gateway.get_chat_llm(model=model, temperature=temperature)
+    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
+    return load_qa_chain(llm, chain_type="stuff", prompt=prompt)
+
+
+def retrieve(question, vector_store=None, k=4, fetch_k=None):
+    """The `k` chunks to answer from: the nearest `fetch_k`, re-ranked for relevance and diversity."""
+    from analysers import reranking
+
+    vector_store = vector_store or load_vector_store()
+    return reranking.retrieve(vector_store, question, k, reranking.FETCH_K if fetch_k is None else fetch_k)
+
+
+def answer_question(question, vector_store=None, k=4, prompt_template=DETAILED_PROMPT, temperature=0.3):
+    """Answer from the best retrieved chunks; returns None if nothing relevant was found."""
+    docs = retrieve(question, vector_store, k)
+    if not docs:
+        return None
+    chain = get_conversational_chain(prompt_template, temperature)
+    with trace("qa_chain"):
+        response = chain({"input_documents": docs, "question": question}, return_only_outputs=True)
+    return response["output_text"]
+
+
+def stream_answer(question, vector_store=None, k=4, prompt_template=DETAILED_PROMPT, temperature=0.3,
+                  model="gemini-2.0-flash"):
+    """`answer_question` as a generator of text chunks; yields nothing if nothing relevant was found."""
+    docs = retrieve(question, vector_store, k)
+    if not docs:
+        return
+    # The same prompt the "stuff" chain builds: retrieved chunks joined into {context}
+    context = "\n\n".join(doc.page_content for doc in docs)
+    prompt = prompt_template.format(context=context, question=question)
+    with trace("qa_chain"):
+        response = gemini_gateway.generate_content(
+            [prompt], model=model, stream=True, generation_config={"temperature": temperature},
+        )
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+@functools.lru_cache(maxsize=None)
+def analyze_sentiment_chain(temperature=0.4):
+    """LCEL chain: text -> sentiment analysis string, built once per temperature."""
+    from langchain.prompts import PromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.runnables import RunnablePassthrough
+
+    llm = gemini_gateway.get_chat_llm(model="gemini-pro", temperature=temperature)
+    prompt = PromptTemplate(template=SENTIMENT_PROMPT, input_variables=["text"])
+    return {"text": RunnablePassthrough()} | prompt | llm | StrOutputParser()
+
+
+@trace("sentiment_chain")
+def analyze_sentiment(text, max_chars=20000):
+    """Sentiment of (the first `max_chars` characters of) a text."""
+    return analyze_sentiment_chain().invoke(text[:max_chars])
@@ -0,0 +1,161 @@
+"""Diverse re-ranking of retrieved PDF chunks.
+
+Chunks overlap, so the k nearest to a question are often near copies of one
+another, and every copy takes prompt room from a chunk that would add
+something. `retrieve` over-fetches FETCH_K candidates from the FAISS index and
+re-ranks them locally by maximal marginal relevance, each pick maximising
+
+    lambda * relevance - (1 - lambda) * (max cosine to the chunks already picked)
+
+Relevance is the embedding cosine to the question, blended with a BM25-style
+lexical score of the question's words in each candidate, which keeps exact
+matches on codes, names and figures that embeddings blur. Everything after
+the index lookup is a handful of NumPy operations over the candidates.
+
+    python -m analysers.reranking --bench
+"""
+import argparse
+import re
+import statistics
+import time
+
+import numpy as np
+
+from tracing import trace
+
+FETCH_K = 50
+MMR_LAMBDA = 0.7  # 1.0 is plain relevance order
+LEXICAL_WEIGHT = 0.3  # share of the lexical score in relevance; 0 disables it
+K1, B = 1.5, 0.75
+
+_WORD_RE = re.compile(r"\w+")
+_STOPWORDS = {
+    "the", "and", "for", "are", "was", "with", "what", "when", "where", "who", "how", "which", "this",
+    "that", "does", "can", "will", "there", "any", "about", "from", "into", "have", "has", "not", "you",
+    "your", "our", "its", "their", "they", "them", "should", "would", "could", "document", "documents",
+}
+
+
+def query_terms(question):
+    """Distinct lower-cased words of a question worth matching: no stopwords, nothing under 3 letters but numbers."""
+    words = _WORD_RE.findall(question.lower())
+    return list(dict.fromkeys(w for w in words if w not in _STOPWORDS and (len(w) > 2 or w.isdigit())))
+
+
+def lexical_scores(question, texts):
+    """BM25-style score of the question's terms in each text, IDF taken over the texts.
+
+    Terms are counted as substrings, so "refund" also counts "refunds"; that
+    keeps the whole computation in str.count and NumPy.
+    """
+    terms = query_terms(question)
+    if not terms or not texts:
+        return np.zeros(len(texts), dtype=np.float32)
+    lowered = [t.lower() for t in texts]
+    tf = np.array([[text.count(term) for term in terms] for text in lowered], dtype=np.float32)
+    lengths = np.array([len(text) for text in lowered], dtype=np.float32)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(texts) - df + 0.5) / (df + 0.5))
+    norm = K1 * (1 - B + B * lengths / max(float(lengths.mean()), 1.0))
+    return (idf * tf * (K1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def mmr(relevance, unit_vectors, k, lambda_mult=MMR_LAMBDA):
+    """Indices of `k` candidates picked by maximal marginal relevance, in pick order."""
+    n = len(relevance)
+    if n == 0 or k <= 0:
+        return []
+    similarity = unit_vectors @ unit_vectors.T
+    first = int(np.argmax(relevance))
+    picked = [first]
+    redundancy = similarity[first].copy()  # max cosine of each candidate to the picks so far
+    available = np.ones(n, dtype=bool)
+    available[first] = False
+    for _ in range(min(k, n) - 1):
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
+
+
+def rerank(question, query_vector, vectors, texts, k=4, lambda_mult=MMR_LAMBDA, lexical_weight=LEXICAL_WEIGHT):
+    """Indices of the `k` candidates to use, most relevant first, near duplicates pushed out."""
+    unit = _unit(vectors)
+    relevance = unit @ _unit(query_vector)
+    if lexical_weight:
+        lexical = lexical_scores(question, texts)
+        top = float(lexical.max()) if len(lexical) else 0.0
+        if top > 0:
+            relevance = (1 - lexical_weight) * relevance + lexical_weight * lexical / top
+    return mmr(relevance, unit, k, lambda_mult)
+
+
+def retrieve(vector_store, question, k=4, fetch_k=FETCH_K, lambda_mult=MMR_LAMBDA, lexical_weight=LEXICAL_WEIGHT):
+    """The `k` chunks of a FAISS store to answer `question` from, re-ranked from `fetch_k` candidates.
+
+    With fetch_k <= k this is a plain `similarity_search`.
+    """
+    if fetch_k <= k:
+        with trace("similarity_search"):
+            return vector_store.similarity_search(question, k=k)
+    with trace("similarity_search"):
+        query = np.asarray([vector_store.embedding_function.embed_query(question)], dtype=np.float32)
+        _, ids = vector_store.index.search(query, fetch_k)
+        ids = [int(i) for i in ids[0] if i != -1]
+        if not ids:
+            return []
+        vectors = vector_store.index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+        docs = [vector_store.docstore.search(vector_store.index_to_docstore_id[i]) for i in ids]
+    with trace("rerank"):
+        order = rerank(question, query[0], vectors, [d.page_content for d in docs], k, lambda_mult, lexical_weight)
+    return [docs[i] for i in order]
+
+
+def _synthetic_candidates(n=FETCH_K, dim=768, copies=5, seed=7):
+    """`n` candidates in groups of `copies` near-identical chunks (overlapping windows of one passage)."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n // copies, dim)).astype(np.float32)
+    vectors = np.repeat(topics, copies, axis=0) + 0.15 * rng.normal(size=(n, dim)).astype(np.float32)
+    words = [f"w{i}" for i in range(400)]
+    texts = [" ".join(rng.choice(words, 700)) + f" section {i // copies}" for i in range(n)]
+    # The question sits between the first topics, closest to the first
+    query = 1.0 * topics[0] + 0.8 * topics[1] + 0.6 * topics[2] + 0.3 * rng.normal(size=dim)
+    return query.astype(np.float32), vectors, texts, np.arange(n) // copies
+
+
+def benchmark(k=5, runs=500):
+    """Median re-rank time and distinct passages in the top k, against plain nearest-neighbour order."""
+    query, vectors, texts, groups = _synthetic_candidates()
+    question = "What does section 1 say about w12 and w305?"
+    plain = np.argsort(-(_unit(vectors) @ _unit(query)))[:k]
+    rows = [("nearest neighbours", None, len(set(groups[plain])))]
+    for name, weight in (("mmr", 0.0), ("mmr + lexical", LEXICAL_WEIGHT)):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            order = rerank(question, query, vectors, texts, k, lexical_weight=weight)
+            times.append((time.perf_counter() - start) * 1000)
+        rows.append((name, statistics.median(times), len(set(groups[order]))))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m analysers.reranking", description="Retrieved chunk re-ranking")
+    parser.add_argument("--bench", action="store_true", help="re-rank latency and diversity on synthetic candidates")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.bench:
+        print(f"{FETCH_K} candidates of 768 dimensions, 5 near copies per passage, top {args.k}")
+        for name, ms, distinct in benchmark(args.k):
+            timing = f"{ms:7.3f} ms" if ms is not None else " " * 10
+            print(f"{name:<20} {timing}   {distinct} distinct passages")
+    else:
+        parser.print_help()
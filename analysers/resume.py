@@ -0,0 +1,50 @@
+"""Resume review and ATS match scoring against a job description."""
+import base64
+
+from tracing import trace
+
+import gemini_gateway
+from artifact_cache import content_hash, get_artifact_cache
+
+MODEL = "gemini-2.0-flash"
+PAGE_DPI = 200  # pdf2image's default, which the first-page render always used
+
+PROMPTS = {
+    "evaluation": """
+ You are an experienced Technical Human Resource Manager or you are in field of any one job role in data science ,machine learning ,ai ,deep learning, dev ops, full stack developer, mlops, data analyst your task is to review the provided resume against the job description.
+  Please share your professional evaluation on whether the candidate's profile aligns with the role.
+ Highlight the strengths and weaknesses of the applicant in relation to the specified job requirements.
+""",
+    "percentage_match": """
+You are an skilled ATS (Applicant Tracking System) scanner with a deep understanding of data science ,machine learning ,ai ,deep learning, dev ops, full stack developer, mlops, data analyst and ATS functionality,
+your task is to evaluate the resume against the provided job description. give me the percentage of match if the resume matches
+the job description. First the output should come as percentage and then keywords missing and last final thoughts.
+""",
+}
+
+
+@trace("input_pdf_setup")
+def input_pdf_setup(pdf_bytes):
+    """First page of a PDF as a base64 JPEG part (a list with one part), via the artifact cache."""
+    from analysers.ocr import render_page
+
+    cache = get_artifact_cache()
+    pdf_hash = content_hash(pdf_bytes)
+    part = cache.get_json("model_part", pdf_hash, 1, dpi=PAGE_DPI, format="jpeg")
+    if part is None:
+        jpeg = render_page(pdf_bytes, 1, dpi=PAGE_DPI, data_hash=pdf_hash)
+        part = {"mime_type": "image/jpeg", "data": base64.b64encode(jpeg).decode()}
+        cache.put_json("model_part", pdf_hash, part, 1, dpi=PAGE_DPI, format="jpeg")
+    return [part]
+
+
+@trace("get_gemini_response")
+def get_gemini_response(input, content, prompt):
+    """Generic instruction + document part + user text call used by the document apps."""
+    response = gemini_gateway.generate_content([input, content[0], prompt], model=MODEL)
+    return response.text
+
+
+def analyse_resume(pdf_bytes, job_description, mode="evaluation", instruction=None):
+    """Review a resume PDF against a job description; `mode` picks one of PROMPTS."""
+    return get_gemini_response(instruction or PROMPTS[mode], input_pdf_setup(pdf_bytes), job_description)
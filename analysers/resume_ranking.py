@@ -0,0 +1,248 @@
+"""Rank many resumes against one job description.
+
+Reviewing a resume is a full multimodal model call, so screening a folder of
+500 one by one costs 500 calls. Here every resume is first scored by a cheap
+local prefilter over the text layer of its PDF (extracted in parallel worker
+processes):
+
+- keyword coverage: the share of the job description's most frequent terms
+  that appear in the resume (the rest are reported as missing keywords)
+- similarity: TF-IDF cosine between the job description and the resume, or
+  Gemini embedding cosine with use_embeddings=True (one batched call)
+
+Only the top N by prefilter score get the ATS percentage-match review from
+the model, so cost and latency grow with N, not with the folder size.
+
+    python -m analysers.resume_ranking --job-description @jd.txt --top 20 resumes/
+"""
+import argparse
+import csv
+import glob
+import io
+import math
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from tracing import trace
+
+KEYWORD_COUNT = 30
+COVERAGE_WEIGHT = 0.5  # prefilter score = weight * coverage + (1 - weight) * similarity
+
+# Words a job description uses that say nothing about the candidate
+STOPWORDS = set("""
+a an the and or of to in on for is are be as at by with from that this it its we our you your they their
+will can may must should would could has have had not no but if than then so such these those who what when
+where which how all any each other into over per via etc also more most able ability experience experienced
+years year work working team teams role job candidate candidates strong good excellent knowledge understanding
+including include includes required requirements preferred plus responsibilities skills skill using use
+need needs looking seeking want join help familiarity proficiency proficient hands-on
+""".split())
+_TERM_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z]")
+_PERCENT_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)\s*%")
+
+
+def terms(text):
+    """Lower-cased terms of a text without stopwords; keeps c++, c#, node.js and the like."""
+    return [t for t in _TERM_RE.findall(text.lower()) if t not in STOPWORDS and not t.isdigit()]
+
+
+def job_keywords(job_description, count=KEYWORD_COUNT):
+    """The job description's `count` most frequent terms, most frequent first."""
+    return [t for t, _ in Counter(terms(job_description)).most_common(count)]
+
+
+def _extract(item):
+    """(name, text) for one (name, pdf bytes); runs in a worker process."""
+    from PyPDF2 import PdfReader
+
+    name, data = item
+    try:
+        pages = PdfReader(io.BytesIO(data)).pages
+        return name, "".join(page.extract_text() or "" for page in pages)
+    except Exception:
+        return name, ""  # unreadable or encrypted: scored 0, reported as having no text
+
+
+@trace("resume_prefilter_extract")
+def extract_texts(resumes, jobs=4):
+    """{name: text} for [(name, pdf bytes)], parsed in parallel processes."""
+    if jobs <= 1 or len(resumes) < 2:
+        return dict(map(_extract, resumes))
+    # Spawned, not forked: this may run inside a multi-threaded Streamlit server
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx) as pool:
+        return dict(pool.map(_extract, resumes, chunksize=max(1, len(resumes) // (jobs * 4))))
+
+
+def _cosine(a, b):
+    dot = sum(v * b.get(k, 0.0) for k, v in a.items())
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm if norm else 0.0
+
+
+def tfidf_similarities(job_description, texts):
+    """TF-IDF cosine of each text against the job description, IDF taken over the texts."""
+    counts = [Counter(terms(t)) for t in texts]
+    df = Counter(term for c in counts for term in c)
+    n = len(texts) + 1
+
+    def vector(c):
+        return {term: (1 + math.log(tf)) * math.log(n / (1 + df.get(term, 0)) + 1) for term, tf in c.items()}
+
+    query = vector(Counter(terms(job_description)))
+    return [_cosine(query, vector(c)) for c in counts]
+
+
+def embedding_similarities(job_description, texts, max_chars=8000):
+    """Gemini embedding cosine of each text against the job description (one batched call)."""
+    import gemini_gateway
+
+    embeddings = gemini_gateway.get_embeddings()
+    query = embeddings.embed_query(job_description[:max_chars])
+    query = dict(enumerate(query))
+    vectors = embeddings.embed_documents([t[:max_chars] or " " for t in texts])
+    return [_cosine(query, dict(enumerate(v))) for v in vectors]
+
+
+@trace("resume_prefilter")
+def prefilter(texts, job_description, use_embeddings=False, keyword_count=KEYWORD_COUNT):
+    """Prefilter rows for {name: text}, best first."""
+    keywords = job_keywords(job_description, keyword_count)
+    names = list(texts)
+    similarity = (embedding_similarities if use_embeddings else tfidf_similarities)(
+        job_description, [texts[n] for n in names]
+    )
+    rows = []
+    for name, sim in zip(names, similarity):
+        present = set(terms(texts[name]))
+        missing = [k for k in keywords if k not in present]
+        coverage = 1 - len(missing) / len(keywords) if keywords else 0.0
+        rows.append({
+            "name": name,
+            "text_chars": len(texts[name]),
+            "keyword_coverage": round(coverage, 3),
+            "similarity": round(max(sim, 0.0), 3),
+            "score": round(COVERAGE_WEIGHT * coverage + (1 - COVERAGE_WEIGHT) * max(sim, 0.0), 3),
+            "missing_keywords": missing,
+            "match_percent": None,
+            "evaluation": None,
+            "error": None if texts[name].strip() else "no text layer (scanned or unreadable PDF)",
+        })
+    rows.sort(key=lambda r: -r["score"])
+    return rows
+
+
+def parse_match_percent(text):
+    """The first percentage in an ATS review ("Match: 78%"), or None."""
+    match = _PERCENT_RE.search(text or "")
+    return min(100.0, float(match.group(1))) if match else None
+
+
+def unique_names(resumes):
+    """[(name, pdf bytes)] with repeated names suffixed " (2)", " (3)", ... so none collapse in a dict."""
+    originals = {name for name, _ in resumes}
+    used = set()
+    renamed = []
+    for name, data in resumes:
+        unique, n = name, 1
+        while unique in used or (unique != name and unique in originals):
+            n += 1
+            unique = f"{name} ({n})"
+        used.add(unique)
+        renamed.append((unique, data))
+    return renamed
+
+
+def rank_resumes(resumes, job_description, top_n=10, jobs=4, use_embeddings=False, keyword_count=KEYWORD_COUNT):
+    """Rank [(name, pdf bytes)] against a job description.
+
+    Returns prefilter rows (see `prefilter`), with the top `top_n` also
+    reviewed by the model (`match_percent`, `evaluation`), sorted with the
+    reviewed resumes first by match percentage, then the rest by score.
+    Repeated names get a suffix (see `unique_names`); every resume is ranked.
+    """
+    import accounting
+    from analysers.resume import analyse_resume
+
+    fields = accounting.current_scope()  # the caller's app/session, for the review threads
+    resumes = unique_names(resumes)
+    data = dict(resumes)
+    rows = prefilter(extract_texts(resumes, jobs), job_description, use_embeddings, keyword_count)
+    shortlist = [r for r in rows if r["error"] is None][:top_n]
+
+    def review(row):
+        try:
+            with accounting.scope(**fields):
+                row["evaluation"] = analyse_resume(data[row["name"]], job_description, "percentage_match")
+            row["match_percent"] = parse_match_percent(row["evaluation"])
+        except Exception as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="resume-review") as pool:
+        list(pool.map(review, shortlist))
+    rows.sort(key=lambda r: (r["match_percent"] is None, -(r["match_percent"] or 0), -r["score"]))
+    return rows
+
+
+def load_folder(path):
+    """[(file name, bytes)] for the PDFs in a folder (or a single PDF path)."""
+    paths = [path] if os.path.isfile(path) else sorted(glob.glob(os.path.join(path, "**", "*.pdf"), recursive=True))
+    resumes = []
+    for p in paths:
+        with open(p, "rb") as f:
+            resumes.append((os.path.relpath(p, path) if os.path.isdir(path) else os.path.basename(p), f.read()))
+    return resumes
+
+
+TABLE_COLUMNS = ("name", "match_percent", "score", "keyword_coverage", "similarity", "missing_keywords")
+
+
+def table_rows(rows, missing=8):
+    """Rows flattened for a table or CSV: missing keywords joined, evaluation left out."""
+    return [
+        dict({c: r[c] for c in TABLE_COLUMNS}, missing_keywords=", ".join(r["missing_keywords"][:missing]),
+             rank=i, error=r["error"] or "")
+        for i, r in enumerate(rows, 1)
+    ]
+
+
+def main(argv=None):
+    from analysers.__main__ import _text_arg
+
+    parser = argparse.ArgumentParser(prog="python -m analysers.resume_ranking",
+                                     description="Rank a folder of resume PDFs against a job description")
+    parser.add_argument("--job-description", required=True, help="text, or @file")
+    parser.add_argument("--top", type=int, default=10, help="resumes reviewed by the model")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="parallel extraction processes and model calls")
+    parser.add_argument("--embeddings", action="store_true", help="Gemini embedding similarity instead of TF-IDF")
+    parser.add_argument("--csv", metavar="PATH", help="also write the table as CSV")
+    parser.add_argument("folders", nargs="+", metavar="FOLDER")
+    args = parser.parse_args(argv)
+
+    import accounting
+
+    accounting.set_scope(app="cli", feature="rank_resumes")
+    resumes = [r for folder in args.folders for r in load_folder(folder)]
+    start = time.perf_counter()
+    rows = table_rows(rank_resumes(resumes, _text_arg(args.job_description), args.top, args.jobs, args.embeddings))
+    print(f"{'#':>4}  {'resume':<40} {'match':>6} {'score':>6} {'cover':>6} {'sim':>6}  missing keywords")
+    for r in rows:
+        match = f"{r['match_percent']:.0f}%" if r["match_percent"] is not None else "-"
+        print(f"{r['rank']:>4}  {r['name'][:40]:<40} {match:>6} {r['score']:>6.2f} {r['keyword_coverage']:>6.0%} "
+              f"{r['similarity']:>6.2f}  {r['error'] or r['missing_keywords']}")
+    print(f"{len(resumes)} resumes, {min(args.top, len(resumes))} reviewed by the model, "
+          f"{time.perf_counter() - start:.1f}s", file=sys.stderr)
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=("rank",) + TABLE_COLUMNS + ("error",))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Frequency-aware answer cache for the Q&A bots.
+
+Questions are keyed after normalising case, whitespace and punctuation, so
+"What is R2 score?" and "what is r2  score" share one entry. Misses can fall
+back to fuzzy matching against the cached keys (off by default), and a fuzzy
+match must still ask with the same content words, digits included, so "r3
+score" never gets the "r2 score" answer. Entries expire after a TTL and,
+when the cache is full, the least frequently used entry is evicted (ties go to
+the least recently used one).
+
+The cache keeps hit/miss counters and the model latency it has avoided, which
+the apps show in the sidebar via `stats()`.
+"""
+import difflib
+import re
+import threading
+import time
+from collections import Counter
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL = 24 * 60 * 60  # seconds
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+# Words that never change what is being asked; interrogatives, nouns and numbers are all kept
+_FILLER_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did", "of", "to", "for", "in", "on",
+    "at", "please", "can", "could", "would", "you", "me", "i", "tell", "it", "this", "that", "there",
+}
+
+
+def normalize_question(text):
+    """Canonical cache key: lowercase, no punctuation, single spaces."""
+    text = _PUNCT_RE.sub(" ", text.lower())
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def content_tokens(text):
+    """The words of a question that matter, as a set; two questions match only if these are equal."""
+    return frozenset(w for w in normalize_question(text).split() if w not in _FILLER_WORDS)
+
+
+class _Entry:
+    __slots__ = ("answer", "created", "last_used", "hits", "latency")
+
+    def __init__(self, answer, latency):
+        now = time.monotonic()
+        self.answer = answer
+        self.created = now
+        self.last_used = now
+        self.hits = 0
+        self.latency = latency
+
+
+class AnswerCache:
+    """Thread-safe normalised-question cache with TTL and LFU eviction."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, fuzzy_threshold=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # e.g. 0.92; None disables fuzzy lookups. A fuzzy match must still have the same content
+        # words, so "python 3" never gets the "python 2" answer.
+        self.fuzzy_threshold = fuzzy_threshold
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._latency_saved = 0.0
+
+    def get(self, question):
+        """Return the cached answer for the question, or None."""
+        key = normalize_question(question)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._lookup(key, now)
+            if entry is None:
+                self._misses += 1
+                return None
+            entry.hits += 1
+            entry.last_used = now
+            self._hits += 1
+            self._latency_saved += entry.latency
+            return entry.answer
+
+    def put(self, question, answer, latency=0.0):
+        """Store an answer along with how long the model took to produce it."""
+        key = normalize_question(question)
+        if not key or not answer:
+            return
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                self._evict(time.monotonic())
+            self._entries[key] = _Entry(answer, latency)
+
+    def invalidate(self, question=None):
+        """Drop one question, or everything when no question is given."""
+        with self._lock:
+            if question is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(normalize_question(question), None)
+
+    def prewarm(self, questions, answer_fn, top_n=20, min_count=2):
+        """Answer the most frequently asked questions ahead of time.
+
+        `questions` is the raw question log; `answer_fn(question)` produces the
+        answer. Returns the number of entries added.
+        """
+        counts = Counter(normalize_question(q) for q in questions)
+        added = 0
+        for key, count in counts.most_common(top_n):
+            if count < min_count or not key:
+                break
+            with self._lock:
+                if self._lookup(key, time.monotonic()) is not None:
+                    continue
+            start = time.perf_counter()
+            try:
+                answer = answer_fn(key)
+            except Exception as e:
+                print(f"answer-cache: prewarm failed for {key!r}: {e}")
+                continue
+            self.put(key, answer, time.perf_counter() - start)
+            added += 1
+        return added
+
+    def stats(self):
+        """Hit ratio, counters and total model latency avoided (seconds)."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "latency_saved_s": self._latency_saved,
+            }
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and now - entry.created > self.ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None and self.fuzzy_threshold and self._entries:
+            match = difflib.get_close_matches(key, list(self._entries), n=1, cutoff=self.fuzzy_threshold)
+            if match and content_tokens(match[0]) == content_tokens(key):
+                entry = self._entries[match[0]]
+                if now - entry.created > self.ttl:
+                    del self._entries[match[0]]
+                    entry = None
+        return entry
+
+    def _evict(self, now):
+        expired = [k for k, e in self._entries.items() if now - e.created > self.ttl]
+        for key in expired:
+            del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            victim = min(self._entries, key=lambda k: (self._entries[k].hits, self._entries[k].last_used))
+            del self._entries[victim]
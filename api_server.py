@@ -0,0 +1,319 @@
+"""Async HTTP API for the PDF collections and event questions.
+
+    python api_server.py --port 8080
+
+Endpoints (JSON in and out):
+
+    GET    /healthz
+    GET    /metrics                         Prometheus text, from tracing
+    GET    /collections                     names of queryable collections
+    POST   /collections/{name}/ingest       multipart PDF upload -> 202 {"job": {...}}
+    GET    /jobs/{id}                       ingestion job status
+    DELETE /jobs/{id}                       cancel an ingestion job
+    POST   /collections/{name}/query        {"question": ..., "k": 5, "stream": false}
+    POST   /events/{name}/question          {"question": ..., "stream": false}
+
+Queries and event questions answer with {"answer": ...}, or as server-sent
+events when the body has "stream": true or the client sends
+`Accept: text/event-stream`: one `chunk` event per piece of text
+({"text": ...}), then `done`, or `error` if the call fails mid-stream.
+
+The pipeline (analysers, gemini_gateway) is blocking, so every call runs on a
+bounded thread pool and the event loop only waits on it; a streamed answer is
+produced on a pool thread and handed to the loop chunk by chunk. Each request
+has a deadline (API_TIMEOUT seconds; 504, or an `error` event once streaming).
+The deadline ends the wait, not the work: a call that misses it keeps its
+pool thread until the gateway gives up on it (GEMINI_TIMEOUT per attempt,
+plus retries), so API_THREADS should allow for a few such stragglers.
+FAISS indexes are loaded once per collection version and stay resident,
+shared by all requests. Ingestion is queued to the ingest_jobs workers, the
+same ones the Streamlit app uses. Calls are accounted to app "api", with the
+X-Session-Id header as the session.
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+import accounting
+import ingest_jobs
+import tracing
+from analysers import pdf_qa
+from analysers.events import UnknownEvent, answer_event_question, stream_event_answer
+
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "60"))
+API_THREADS = int(os.getenv("API_THREADS", "16"))
+MAX_INDEXES = int(os.getenv("API_MAX_INDEXES", "8"))
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+
+# Same retrieval settings as the "Chat & Analyze PDF" app's handle_user_input
+QUERY_K = 5
+MAX_QUERY_K = 20
+QUERY_TEMPERATURE = 0.6
+
+NO_ANSWER = "Could not find relevant information in the documents for your question."
+
+
+class ResidentIndexes:
+    """FAISS indexes kept in memory per (collection, version), least recently used evicted."""
+
+    def __init__(self, max_entries=MAX_INDEXES):
+        self.max_entries = max_entries
+        self._indexes = OrderedDict()
+        self._loading = {}  # key -> asyncio.Lock, so concurrent requests load an index once
+
+    async def get(self, name, run):
+        version = ingest_jobs.collection_version(name)
+        if version is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": f"no collection named {name!r}"}),
+                                   content_type="application/json")
+        key = (ingest_jobs.safe_collection_name(name), version)
+        lock = self._loading.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key not in self._indexes:
+                self._indexes[key] = await run(pdf_qa.load_vector_store, ingest_jobs.collection_dir(name))
+                for stale in [k for k in self._indexes if k[0] == key[0] and k != key]:
+                    del self._indexes[stale]
+                while len(self._indexes) > self.max_entries:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(key)
+            self._loading.pop(key, None)
+            return self._indexes[key]
+
+
+def _fields(request, feature):
+    return {"app": "api", "feature": feature, "session": request.headers.get("X-Session-Id")}
+
+
+def _runner(request, feature):
+    """`await run(fn, *args)`: fn on the pool, accounted and traced to this request's feature."""
+    loop = asyncio.get_running_loop()
+    pool = request.app["pool"]
+    fields = _fields(request, feature)
+
+    def call(fn, args):
+        with accounting.scope(**fields), tracing.trace(f"api_{feature}"):
+            return fn(*args)
+
+    async def run(fn, *args):
+        return await loop.run_in_executor(pool, call, fn, args)
+
+    return run
+
+
+async def _with_deadline(coro):
+    """Await `coro` for at most API_TIMEOUT seconds, then 504; the pool thread behind it runs on."""
+    try:
+        return await asyncio.wait_for(coro, API_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise web.HTTPGatewayTimeout(text=json.dumps({"error": f"no answer within {API_TIMEOUT:g}s"}),
+                                     content_type="application/json")
+
+
+def _wants_stream(request, body):
+    return bool(body.get("stream")) or "text/event-stream" in request.headers.get("Accept", "")
+
+
+async def _question_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "body must be JSON"}), content_type="application/json")
+    if not isinstance(body, dict) or not str(body.get("question") or "").strip():
+        raise web.HTTPBadRequest(text=json.dumps({"error": "'question' is required"}),
+                                 content_type="application/json")
+    k = body.get("k")
+    if k is not None and (not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= MAX_QUERY_K):
+        raise web.HTTPBadRequest(text=json.dumps({"error": f"'k' must be an integer from 1 to {MAX_QUERY_K}"}),
+                                 content_type="application/json")
+    return body
+
+
+def _error_status(exc):
+    if isinstance(exc, accounting.BudgetExceeded):
+        return 429
+    if isinstance(exc, (UnknownEvent, FileNotFoundError)):
+        return 404
+    return 502
+
+
+async def _send_event(response, event, data):
+    await response.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+
+async def _stream(request, feature, chunks):
+    """Serve a generator of text chunks (run on the pool) as server-sent events."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    fields = _fields(request, feature)
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:  # loop closed
+            stop.set()
+
+    def produce():
+        try:
+            with accounting.scope(**fields), tracing.trace(f"api_{feature}"):
+                for text in chunks:
+                    if stop.is_set():
+                        break
+                    put(("chunk", text))
+            put(("done", None))
+        except Exception as e:
+            put(("error", e))
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+    loop.run_in_executor(request.app["pool"], produce)
+    deadline = loop.time() + API_TIMEOUT
+    sent = 0
+    try:
+        while True:
+            try:
+                kind, value = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                await _send_event(response, "error", {"error": f"no answer within {API_TIMEOUT:g}s", "status": 504})
+                break
+            if kind == "chunk":
+                await _send_event(response, "chunk", {"text": value})
+                sent += 1
+            elif kind == "done":
+                if not sent and feature == "query":
+                    await _send_event(response, "chunk", {"text": NO_ANSWER})
+                await _send_event(response, "done", {"chunks": sent})
+                break
+            else:
+                await _send_event(response, "error", {"error": str(value), "status": _error_status(value)})
+                break
+    except ConnectionResetError:
+        return response  # client disconnected
+    finally:
+        stop.set()  # the producer stops at its next chunk if the client went away
+    await response.write_eof()
+    return response
+
+
+@web.middleware
+async def json_errors(request, handler):
+    try:
+        return await handler(request)
+    except web.HTTPException:
+        raise
+    except Exception as e:
+        return web.json_response({"error": f"{type(e).__name__}: {e}"}, status=_error_status(e))
+
+
+async def healthz(request):
+    return web.json_response({"ok": True})
+
+
+async def metrics(request):
+    return web.Response(text=tracing.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+
+async def collections(request):
+    return web.json_response({"collections": ingest_jobs.list_collections()})
+
+
+def _job_json(job):
+    return {k: v for k, v in job.items() if k not in ("files", "worker_pid")}
+
+
+async def ingest(request):
+    name = request.match_info["name"]
+    files = []
+    reader = await request.multipart()
+    async for part in reader:
+        if part.filename:
+            files.append((part.filename, await part.read()))
+    if not files:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "upload at least one PDF file"}),
+                                 content_type="application/json")
+    job_queue = request.app["jobs"]
+    job_id = await _runner(request, "ingest")(job_queue.submit, name, files)
+    return web.json_response({"job": _job_json(job_queue.get(job_id))}, status=202)
+
+
+def _job_or_404(request):
+    try:
+        job = request.app["jobs"].get(int(request.match_info["id"]))
+    except ValueError:
+        job = None
+    if job is None:
+        raise web.HTTPNotFound(text=json.dumps({"error": "no such job"}), content_type="application/json")
+    return job
+
+
+async def job_status(request):
+    return web.json_response({"job": _job_json(_job_or_404(request))})
+
+
+async def cancel_job(request):
+    job = _job_or_404(request)
+    request.app["jobs"].cancel(job["id"])
+    return web.json_response({"job": _job_json(request.app["jobs"].get(job["id"]))})
+
+
+async def query(request):
+    body = await _question_body(request)
+    run = _runner(request, "query")
+    store = await _with_deadline(request.app["indexes"].get(request.match_info["name"], run))
+    question, k = body["question"], body.get("k") or QUERY_K
+    kwargs = {"k": k, "prompt_template": pdf_qa.EXPLAIN_PROMPT, "temperature": QUERY_TEMPERATURE}
+    if _wants_stream(request, body):
+        return await _stream(request, "query", pdf_qa.stream_answer(question, store, **kwargs))
+    answer = await _with_deadline(run(lambda: pdf_qa.answer_question(question, store, **kwargs)))
+    return web.json_response({"answer": answer or NO_ANSWER, "found": answer is not None})
+
+
+async def event_question(request):
+    body = await _question_body(request)
+    run = _runner(request, "event_question")
+    name, question = request.match_info["name"], body["question"]
+    if _wants_stream(request, body):
+        # Looks the event up first, so an unknown event is a plain 404
+        chunks = await _with_deadline(run(stream_event_answer, name, question))
+        return await _stream(request, "event_question", chunks)
+    answer = await _with_deadline(run(answer_event_question, name, question))
+    return web.json_response({"answer": answer})
+
+
+def make_app(workers=ingest_jobs.DEFAULT_WORKERS):
+    app = web.Application(middlewares=[json_errors], client_max_size=MAX_UPLOAD_BYTES)
+    app["pool"] = ThreadPoolExecutor(max_workers=API_THREADS, thread_name_prefix="api")
+    app["indexes"] = ResidentIndexes()
+    app["jobs"] = ingest_jobs.ensure_workers(workers) if workers else ingest_jobs.get_job_queue()
+
+    async def shutdown(app):
+        app["pool"].shutdown(wait=False, cancel_futures=True)
+
+    app.on_cleanup.append(shutdown)
+    app.add_routes([
+        web.get("/healthz", healthz),
+        web.get("/metrics", metrics),
+        web.get("/collections", collections),
+        web.post("/collections/{name}/ingest", ingest),
+        web.post("/collections/{name}/query", query),
+        web.get("/jobs/{id}", job_status),
+        web.delete("/jobs/{id}", cancel_job),
+        web.post("/events/{name}/question", event_question),
+    ])
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async HTTP API for PDF collections and event questions")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=ingest_jobs.DEFAULT_WORKERS,
+                        help="ingestion worker processes to start (0: rely on separately started workers)")
+    args = parser.parse_args()
+    web.run_app(make_app(args.workers), host=args.host, port=args.port)
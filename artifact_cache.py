@@ -0,0 +1,193 @@
+"""Shared on-disk cache of artifacts derived from uploaded files.
+
+Users re-upload the same PDFs across sessions, and every upload used to redo
+text extraction and page rendering from scratch. Artifacts are keyed by the
+SHA-256 of the file's bytes, the kind of artifact, the page and whatever
+parameters shape them (DPI, model, prompt), so the same file uploaded to any
+app, in any session, finds them again:
+
+- "pdf_layout"  how each page of a PDF is read: text, ocr or blank (analysers.ocr)
+- "page_text"   the text layer of one PDF page
+- "ocr_text"    the Gemini transcript of one scanned page
+- "page_image"  one PDF page rendered to JPEG
+- "model_part"  an inline part ready to send (the resume's first page)
+
+Everything lives in one SQLite file (WAL mode, so the Streamlit apps, the
+ingest workers and the API share it). When a write takes the total over
+ARTIFACT_CACHE_MB, the least recently used artifacts are evicted.
+ARTIFACT_CACHE=0 turns the cache off.
+
+    python artifact_cache.py            # size and entry counts per kind
+    python artifact_cache.py --clear
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import tracing
+
+ARTIFACT_CACHE_FILE = os.getenv("ARTIFACT_CACHE_DB", "artifact_cache.db")
+MAX_BYTES = int(float(os.getenv("ARTIFACT_CACHE_MB", "512")) * 2**20)
+ENABLED = os.getenv("ARTIFACT_CACHE", "1") != "0"
+TOUCH_INTERVAL = 60  # seconds; a hit refreshes last_used at most this often, so reads rarely write
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_last_used ON artifacts (last_used);
+"""
+
+
+def content_hash(data):
+    """SHA-256 hex digest of a file's bytes: the identity of an upload, whatever its name."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def artifact_key(kind, data_hash, page=None, **params):
+    return hashlib.sha256(json.dumps([kind, data_hash, page, params], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ArtifactCache:
+    """Size-capped LRU cache of bytes, text and JSON artifacts in a SQLite file."""
+
+    def __init__(self, path=ARTIFACT_CACHE_FILE, max_bytes=MAX_BYTES, enabled=ENABLED):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        if enabled:
+            self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, kind, data_hash, page=None, **params):
+        """The stored bytes, or None."""
+        if not self.enabled:
+            return None
+        key = artifact_key(kind, data_hash, page, **params)
+        row = self._conn().execute("SELECT value, last_used FROM artifacts WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        tracing.count("artifact_cache_hits_total" if row else "artifact_cache_misses_total")
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > TOUCH_INTERVAL:
+            self._conn().execute("UPDATE artifacts SET last_used = ? WHERE key = ?", (now, key))
+        return bytes(row[0])
+
+    def put(self, kind, data_hash, value, page=None, **params):
+        """Store bytes, evicting the least recently used artifacts if the cache goes over its cap."""
+        if not self.enabled or len(value) > self.max_bytes:
+            return
+        key = artifact_key(kind, data_hash, page, **params)
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts (key, kind, size, created_at, last_used, value) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, len(value), now, now, sqlite3.Binary(value)),
+            )
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn):
+        excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM artifacts ORDER BY last_used"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM artifacts WHERE key = ?", victims)
+        tracing.count("artifact_cache_evictions_total", len(victims))
+
+    def get_text(self, kind, data_hash, page=None, **params):
+        value = self.get(kind, data_hash, page, **params)
+        return None if value is None else value.decode("utf-8")
+
+    def put_text(self, kind, data_hash, text, page=None, **params):
+        self.put(kind, data_hash, text.encode("utf-8"), page, **params)
+
+    def get_json(self, kind, data_hash, page=None, **params):
+        value = self.get(kind, data_hash, page, **params)
+        return None if value is None else json.loads(value)
+
+    def put_json(self, kind, data_hash, obj, page=None, **params):
+        self.put(kind, data_hash, json.dumps(obj).encode("utf-8"), page, **params)
+
+    def stats(self):
+        """Entries and bytes per kind, plus this process's hit/miss counts."""
+        kinds = {}
+        if self.enabled:
+            rows = self._conn().execute("SELECT kind, COUNT(*), SUM(size) FROM artifacts GROUP BY kind").fetchall()
+            kinds = {kind: {"entries": n, "bytes": size} for kind, n, size in rows}
+        with self._lock:
+            return {
+                "kinds": kinds,
+                "bytes": sum(k["bytes"] for k in kinds.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+    def clear(self):
+        if self.enabled:
+            self._conn().execute("DELETE FROM artifacts")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_artifact_cache():
+    """Return the process-wide artifact cache, opening the database on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ArtifactCache()
+        return _cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared artifact cache")
+    parser.add_argument("--clear", action="store_true", help="delete every cached artifact")
+    args = parser.parse_args()
+
+    cache = get_artifact_cache()
+    if args.clear:
+        cache.clear()
+    stats = cache.stats()
+    print(f"{cache.path}: {stats['bytes'] / 2**20:.1f} of {stats['max_bytes'] / 2**20:.0f} MB")
+    for kind, entry in sorted(stats["kinds"].items()):
+        print(f"    {kind:<12} {entry['entries']:>7} entries {entry['bytes'] / 2**20:9.1f} MB")
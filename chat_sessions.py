@@ -0,0 +1,208 @@
+"""Per-user Gemini chat sessions with a bounded context window.
+
+A module-level `model.start_chat()` is shared by every visitor and its history
+grows forever, and the SDK resends that history on every `send_message`. The
+ChatSessionManager keeps one chat per Streamlit session, trims each chat's
+history to a token budget before it is used (optionally folding the dropped
+turns into a summary), and evicts sessions that have been idle for too long.
+
+Run `python chat_sessions.py --bench` to compare per-turn latency of an
+unbounded chat and a managed one over 100 turns against a stub model.
+"""
+import argparse
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TOKEN_BUDGET = 4000
+DEFAULT_IDLE_TTL = 30 * 60  # seconds
+DEFAULT_MAX_SESSIONS = 500
+CHARS_PER_TOKEN = 4  # rough local estimate; good enough for budgeting
+
+
+def _parts(content):
+    if isinstance(content, dict):
+        return content.get("parts", [])
+    return content.parts
+
+
+def _role(content):
+    return content.get("role") if isinstance(content, dict) else content.role
+
+
+def content_text(content):
+    """Concatenated text of a history entry (proto Content or dict)."""
+    texts = []
+    for part in _parts(content):
+        if isinstance(part, str):
+            texts.append(part)
+        elif isinstance(part, dict):
+            texts.append(part.get("text", ""))
+        else:
+            texts.append(getattr(part, "text", ""))
+    return "".join(texts)
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def history_tokens(history):
+    return sum(estimate_tokens(content_text(c)) for c in history)
+
+
+class _Session:
+    __slots__ = ("chat", "last_used")
+
+    def __init__(self, chat):
+        self.chat = chat
+        self.last_used = time.monotonic()
+
+
+class ChatSessionManager:
+    """Owns one chat per session id, with token-budget trimming and idle eviction."""
+
+    def __init__(self, model, token_budget=DEFAULT_TOKEN_BUDGET, idle_ttl=DEFAULT_IDLE_TTL,
+                 max_sessions=DEFAULT_MAX_SESSIONS, summarize_fn=None):
+        self.model = model
+        self.token_budget = token_budget
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        # summarize_fn(text) -> str; when set, dropped turns are folded into a summary
+        self.summarize_fn = summarize_fn
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_chat(self, session_id):
+        """Return the session's chat, creating it and trimming its history as needed."""
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = _Session(self.model.start_chat(history=[]))
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        self._trim(session.chat)
+        return session.chat
+
+    def compact_last_turn(self, session_id, user_text):
+        """Replace the last user message with a shorter form (e.g. the bare question).
+
+        Call after the response has been fully consumed, so instruction-heavy
+        prompts are not carried in the history of every later request.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            return
+        history = list(session.chat.history)
+        if len(history) >= 2 and _role(history[-2]) == "user":
+            history[-2] = {"role": "user", "parts": [{"text": user_text}]}
+            session.chat.history = history
+
+    def record_turn(self, session_id, user_text, model_text):
+        """Append a turn answered without the model (e.g. from a cache), so follow-ups see it."""
+        chat = self.get_chat(session_id)
+        chat.history = list(chat.history) + [
+            {"role": "user", "parts": [{"text": user_text}]},
+            {"role": "model", "parts": [{"text": model_text}]},
+        ]
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.idle_ttl:
+                break
+            del self._sessions[session_id]
+
+    def _trim(self, chat):
+        history = list(chat.history)
+        if history_tokens(history) <= self.token_budget:
+            return
+        dropped = []
+        # Drop whole user/model exchanges from the front until we fit (keep at least one)
+        while len(history) > 2 and history_tokens(history) > self.token_budget / 2:
+            dropped.extend(history[:2])
+            history = history[2:]
+        if self.summarize_fn and dropped:
+            transcript = "\n".join(f"{_role(c)}: {content_text(c)}" for c in dropped)
+            try:
+                summary = self.summarize_fn(transcript)
+                history = [
+                    {"role": "user", "parts": [{"text": f"Summary of our earlier conversation: {summary}"}]},
+                    {"role": "model", "parts": [{"text": "Understood."}]},
+                ] + history
+            except Exception as e:
+                print(f"chat-sessions: summary failed, truncating instead: {e}")
+        chat.history = history
+
+
+class _StubChat:
+    """Chat whose latency grows with the size of the history it resends."""
+
+    def __init__(self, seconds_per_1k_tokens):
+        self.history = []
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+
+    def send_message(self, prompt):
+        request_tokens = history_tokens(self.history) + estimate_tokens(prompt)
+        time.sleep(0.001 + self.seconds_per_1k_tokens * request_tokens / 1000)
+        reply = "An answer of moderate length. " * 20
+        self.history += [
+            {"role": "user", "parts": [{"text": prompt}]},
+            {"role": "model", "parts": [{"text": reply}]},
+        ]
+        return reply
+
+
+class _StubModel:
+    def __init__(self, seconds_per_1k_tokens):
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+
+    def start_chat(self, history=None):
+        return _StubChat(self.seconds_per_1k_tokens)
+
+
+def benchmark(turns=100, seconds_per_1k_tokens=0.002, token_budget=2000):
+    """Per-turn latency of an unbounded chat vs a managed one, in milliseconds."""
+    prompt = "Determine if this question is IT related and answer it in detail. " * 5
+    unbounded = _StubModel(seconds_per_1k_tokens).start_chat()
+    manager = ChatSessionManager(_StubModel(seconds_per_1k_tokens), token_budget=token_budget)
+    results = {"unbounded": [], "managed": []}
+    for _ in range(turns):
+        start = time.perf_counter()
+        unbounded.send_message(prompt)
+        results["unbounded"].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        manager.get_chat("bench").send_message(prompt)
+        manager.compact_last_turn("bench", "what is r2 score")
+        results["managed"].append((time.perf_counter() - start) * 1000)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chat session manager")
+    parser.add_argument("--bench", action="store_true", help="run the per-turn latency benchmark")
+    parser.add_argument("--turns", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.bench:
+        results = benchmark(args.turns)
+        print(f"{'turn':>6} {'unbounded ms':>14} {'managed ms':>12}")
+        for turn in sorted({1, 10, 25, 50, 75, args.turns}):
+            if turn <= args.turns:
+                print(f"{turn:>6} {results['unbounded'][turn - 1]:>14.1f} {results['managed'][turn - 1]:>12.1f}")
+    else:
+        parser.print_help()
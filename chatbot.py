@@ -1,20 +1,31 @@
-from dotenv import load_dotenv
-load_dotenv() ## loading all the environment variables
-
 import streamlit as st
-import os
-import google.generativeai as genai
+import time
+import uuid
+import accounting
+import gemini_gateway
+from answer_cache import AnswerCache
+from chat_sessions import ChatSessionManager
+from streaming import render_stream, show_stream_timings
+from tracing import trace
+
+MODEL = "gemini-2.0-flash"
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+@st.cache_resource
+def get_chat_manager():
+    """One bounded chat per visitor instead of a single module-level chat."""
+    return ChatSessionManager(gemini_gateway.get_model(MODEL))
 
-## function to load Gemini Pro model and get repsonses
-model=genai.GenerativeModel("gemini-2.0-flash") 
-chat = model.start_chat(history=[])
+@trace("get_gemini_response")
 def get_gemini_response(question):
-    
-    response=chat.send_message(question,stream=True)
+    chat=get_chat_manager().get_chat(st.session_state['session_id'])
+    response=gemini_gateway.send_message(chat,question,stream=True)
     return response
 
+@st.cache_resource
+def get_answer_cache():
+    """Answer cache shared by every session of this app, for opening questions only."""
+    return AnswerCache()
+
 ##initialize our streamlit app
 
 st.set_page_config(page_title="Q&A Demo")
@@ -24,18 +35,46 @@ st.header("Gemini LLM Application")
 # Initialize session state for chat history if it doesn't exist
 if 'chat_history' not in st.session_state:
     st.session_state['chat_history'] = []
+if 'session_id' not in st.session_state:
+    st.session_state['session_id'] = uuid.uuid4().hex
+accounting.use_streamlit_session("chatbot")
 
 input=st.text_input("Input: ",key="input")
 submit=st.button("Ask the question")
 
 if submit and input:
-    response=get_gemini_response(input)
+    cache=get_answer_cache()
+    # Later turns depend on this visitor's conversation ("tell me more"), so only opening questions are cached
+    first_turn=not st.session_state['chat_history']
+    cached=cache.get(input) if first_turn else None
     # Add user query and response to session state chat history
     st.session_state['chat_history'].append(("You", input))
     st.subheader("The Response is")
-    for chunk in response:
-        st.write(chunk.text)
-        st.session_state['chat_history'].append(("Bot", chunk.text))
+    if cached is not None:
+        st.write(cached)
+        st.session_state['chat_history'].append(("Bot", cached))
+        get_chat_manager().record_turn(st.session_state['session_id'], input, cached)
+    else:
+        start=time.perf_counter()
+        try:
+            with accounting.scope(feature="ask"):
+                response=get_gemini_response(input)
+        except accounting.BudgetExceeded as e:
+            st.warning(f"Request not sent: {e}")
+            st.stop()
+        # Render tokens as they arrive, but keep the reply as one history entry
+        result=render_stream(response, start)
+        st.session_state['chat_history'].append(("Bot", result.text))
+        if first_turn:
+            cache.put(input, result.text, result.total)
+
+stats=get_answer_cache().stats()
+st.sidebar.caption(
+    f"FAQ cache: {stats['hits']} hits / {stats['misses']} misses "
+    f"({stats['hit_ratio']:.0%}), {stats['latency_saved_s']:.1f}s of model time saved"
+)
+show_stream_timings()
+accounting.show_session_usage()
 st.subheader("The Chat History is")
     
 for role, text in st.session_state['chat_history']:
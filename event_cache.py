@@ -0,0 +1,104 @@
+"""Response cache for event Q&A.
+
+Answers are keyed by (hash of the event description, normalised question), so
+a cached answer can never outlive the description it was generated from. The
+cache also remembers which description hash each event was last seen with:
+the first lookup after an admin edit, in this process or another one, drops
+every entry of that event. Entries expire after a TTL and the least recently
+used entry is evicted when the cache is full. Hits and misses are counted per
+event.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from answer_cache import normalize_question
+from event_store import description_hash
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL = 6 * 60 * 60  # seconds
+
+
+class EventResponseCache:
+    """LRU + TTL cache of event answers with per-event invalidation and stats."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (event, desc_hash, question) -> (answer, created)
+        self._current_hash = {}  # event -> description hash last seen
+        self._stats = {}  # event -> [hits, misses]
+        self._lock = threading.Lock()
+
+    def get(self, event_name, description, question):
+        """Return the cached answer, or None."""
+        key = (event_name, description_hash(description), normalize_question(question))
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(event_name, key[1])
+            counters = self._stats.setdefault(event_name, [0, 0])
+            item = self._entries.get(key)
+            if item is not None and now - item[1] > self.ttl:
+                del self._entries[key]
+                item = None
+            if item is None:
+                counters[1] += 1
+                return None
+            self._entries.move_to_end(key)
+            counters[0] += 1
+            return item[0]
+
+    def put(self, event_name, description, question, answer):
+        key = (event_name, description_hash(description), normalize_question(question))
+        with self._lock:
+            self._check_version(event_name, key[1])
+            self._entries[key] = (answer, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_event(self, event_name):
+        """Drop every cached answer for one event."""
+        with self._lock:
+            self._drop_event(event_name)
+            self._current_hash.pop(event_name, None)
+
+    def stats(self):
+        """Per-event hits, misses, hit ratio and number of cached answers."""
+        with self._lock:
+            sizes = {}
+            for event_name, _, _ in self._entries:
+                sizes[event_name] = sizes.get(event_name, 0) + 1
+            result = {}
+            for event_name, (hits, misses) in self._stats.items():
+                lookups = hits + misses
+                result[event_name] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_ratio": hits / lookups if lookups else 0.0,
+                    "entries": sizes.get(event_name, 0),
+                }
+            return result
+
+    def _check_version(self, event_name, desc_hash):
+        # A new description hash means the event was edited: drop its stale answers
+        if self._current_hash.get(event_name) != desc_hash:
+            self._drop_event(event_name)
+            self._current_hash[event_name] = desc_hash
+
+    def _drop_event(self, event_name):
+        for key in [k for k in self._entries if k[0] == event_name]:
+            del self._entries[key]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_event_cache():
+    """Return the process-wide event response cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EventResponseCache()
+        return _cache
@@ -0,0 +1,109 @@
+"""Pre-generated answers to common event questions.
+
+When an admin saves an event, `schedule_faq_generation` queues a background
+job that answers a configurable set of canonical questions (venue, dates,
+price, ...) with bounded parallelism and stores the results next to the event
+in the event store. Public questions are matched against these answers first,
+exactly after normalisation or with the same content words (see
+`answer_cache.content_tokens`), and served without a model call. There is no
+fuzzy matching: "Where is the event?" and "When is the event?" differ in one
+word and need different answers.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from answer_cache import content_tokens, normalize_question
+from event_store import get_event_store
+
+FAQ_QUESTIONS_FILE = "event_faq_questions.txt"  # optional override, one question per line
+DEFAULT_FAQ_QUESTIONS = [
+    "What is this event about?",
+    "When is the event?",
+    "What are the event timings?",
+    "Where is the venue?",
+    "How do I register?",
+    "What is the entry fee?",
+    "Who can participate?",
+    "What is the schedule?",
+    "Are there any prizes?",
+    "Who are the guests or speakers?",
+    "Whom do I contact for more information?",
+]
+MAX_PARALLEL = 4  # concurrent model calls per event
+
+# One job at a time; each job fans out to at most MAX_PARALLEL model calls
+_jobs = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-faq")
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def load_faq_questions(path=FAQ_QUESTIONS_FILE):
+    """Canonical questions from the override file, or the defaults."""
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        if questions:
+            return questions
+    return list(DEFAULT_FAQ_QUESTIONS)
+
+
+def generate_faq(event_name, description, answer_fn, questions=None, max_parallel=MAX_PARALLEL):
+    """Answer the canonical questions concurrently and store them; returns the count stored."""
+    questions = questions or load_faq_questions()
+    answers = {}
+
+    def answer(question):
+        try:
+            return question, answer_fn(description, question)
+        except Exception as e:
+            print(f"event-faq: {event_name!r} / {question!r} failed: {e}")
+            return question, None
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        for question, text in pool.map(answer, questions):
+            if text:
+                answers[question] = text
+    if answers and get_event_store().put_faq(event_name, description, answers):
+        return len(answers)
+    return 0
+
+
+def schedule_faq_generation(event_name, description, answer_fn, questions=None):
+    """Queue FAQ generation for an event in the background and return the Future."""
+    with _pending_lock:
+        future = _jobs.submit(generate_faq, event_name, description, answer_fn, questions)
+        _pending[event_name] = future
+    return future
+
+
+def faq_status(event_name):
+    """'pending', 'done', 'failed' or None if nothing was scheduled in this process."""
+    with _pending_lock:
+        future = _pending.get(event_name)
+    if future is None:
+        return None
+    if not future.done():
+        return "pending"
+    return "failed" if future.exception() else "done"
+
+
+def find_faq_answer(faq, question):
+    """The answer in {canonical question: answer} asking the same thing as `question`, or None."""
+    by_key = {normalize_question(q): a for q, a in faq.items()}
+    key = normalize_question(question)
+    if key in by_key:
+        return by_key[key]
+    tokens = content_tokens(question)
+    if not tokens:
+        return None
+    for canonical, answer in faq.items():
+        if content_tokens(canonical) == tokens:
+            return answer
+    return None
+
+
+def match_faq(event_name, description, question):
+    """Pre-generated answer for a question asking the same as a canonical one, or None."""
+    faq = get_event_store().get_faq(event_name, description)
+    return find_faq_answer(faq, question) if faq else None
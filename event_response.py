@@ -1,19 +1,65 @@
-import os
-import google.generativeai as genai
-from dotenv import load_dotenv
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+import gemini_gateway
+from event_cache import get_event_cache
+from event_faq import match_faq
+from event_retrieval import select_context
+from event_store import EVENTS_FILE, load_events_from_file, save_events_to_file
+from tracing import trace
 
 
-def get_event_response(event_description, question):
-    """Fetch response for the event-specific question."""
-    prompt = (
+def build_event_prompt(event_description, question, event_name=None):
+    # Long descriptions are cut down to the sections relevant to the question
+    with trace("select_context"):
+        context = select_context(event_description, question, event_name)
+    return (
         f"You are an expert on the following event. "
         f"Only use the description provided to answer questions: \n"
-        f"{event_description}\n\n"
+        f"{context}\n\n"
         f"Answer questions strictly related to this event.\n\n"
         f"Question: {question}"
     )
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content([prompt])
-    return response.text
\ No newline at end of file
+
+
+@trace("get_event_response")
+def get_event_response(event_description, question, event_name=None):
+    """Fetch response for the event-specific question."""
+    prompt = build_event_prompt(event_description, question, event_name)
+    response = gemini_gateway.generate_content([prompt], model="gemini-2.0-flash")
+    return response.text
+
+
+def stream_event_response(event_description, question, event_name=None):
+    """`get_event_response` as a generator of text chunks."""
+    prompt = build_event_prompt(event_description, question, event_name)
+    with trace("get_event_response"):
+        for chunk in gemini_gateway.generate_content([prompt], model="gemini-2.0-flash", stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+@trace("get_cached_event_response")
+def get_cached_event_response(event_name, event_description, question):
+    """Answer from the pre-generated FAQ or the response cache, calling the model only on a miss."""
+    answer = match_faq(event_name, event_description, question)
+    if answer is not None:
+        return answer
+    cache = get_event_cache()
+    answer = cache.get(event_name, event_description, question)
+    if answer is None:
+        answer = get_event_response(event_description, question, event_name)
+        cache.put(event_name, event_description, question, answer)
+    return answer
+
+
+def stream_cached_event_response(event_name, event_description, question):
+    """`get_cached_event_response` as a generator: a hit is one chunk, a miss streams and is cached."""
+    answer = match_faq(event_name, event_description, question)
+    if answer is None:
+        answer = get_event_cache().get(event_name, event_description, question)
+    if answer is not None:
+        yield answer
+        return
+    chunks = []
+    for text in stream_event_response(event_description, question, event_name):
+        chunks.append(text)
+        yield text
+    get_event_cache().put(event_name, event_description, question, "".join(chunks))
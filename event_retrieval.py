@@ -0,0 +1,222 @@
+"""Chunked BM25 retrieval over long event descriptions.
+
+Conference agendas can run to dozens of pages, and pasting the whole
+description into every prompt ships the entire document per question. When
+an event is saved its description is split into section-sized chunks and
+stored; at question time the opening chunk plus the best-matching ones, up to
+a prompt token cap and in document order, go into the prompt. Short
+descriptions that already fit under the cap are used whole.
+
+Run `python event_retrieval.py --bench` for prompt size and retrieval latency
+against description length.
+"""
+import argparse
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from chat_sessions import CHARS_PER_TOKEN, estimate_tokens
+from event_store import description_hash, get_event_store
+
+CHUNK_TOKENS = 250
+MAX_CONTEXT_TOKENS = 1500  # cap on description tokens sent per question
+INDEX_CACHE_SIZE = 64
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "is", "are", "was", "be", "at",
+    "by", "with", "what", "when", "where", "who", "how", "which", "this", "that", "it", "do", "does",
+    "i", "me", "my", "you", "can", "will", "there", "any", "event",
+}
+
+
+def _terms(text):
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def _wrap_words(text, chunk_tokens):
+    """Hard-wrap text at word boundaries into pieces of at most ~chunk_tokens."""
+    pieces, current, size = [], [], 0
+    for word in text.split():
+        tokens = estimate_tokens(word + " ")
+        if current and size + tokens > chunk_tokens:
+            pieces.append(" ".join(current))
+            current, size = [], 0
+        current.append(word)
+        size += tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _split(text, chunk_tokens):
+    """Pieces of one paragraph no larger than chunk_tokens: lines, then sentences, then words."""
+    if estimate_tokens(text) <= chunk_tokens:
+        return [text]
+    pieces = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if estimate_tokens(line) <= chunk_tokens:
+            pieces.append(line)
+            continue
+        for sentence in _SENTENCE_RE.split(line):
+            if estimate_tokens(sentence) <= chunk_tokens:
+                pieces.append(sentence)
+            else:
+                pieces.extend(_wrap_words(sentence, chunk_tokens))
+    return [p for p in pieces if p.strip()]
+
+
+def chunk_description(text, chunk_tokens=CHUNK_TOKENS):
+    """Split on blank lines (sections/headings) and pack paragraphs into ~chunk_tokens chunks.
+
+    Paragraphs over the size are split by line, then by sentence, then by
+    word, so an agenda with one unpunctuated line per slot still chunks.
+    """
+    pieces = []
+    for para in re.split(r"\n\s*\n", text):
+        para = para.strip()
+        if para:
+            pieces.extend(_split(para, chunk_tokens))
+
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        if current and size + tokens > chunk_tokens:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over a small list of chunks."""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self._tfs = [Counter(_terms(c)) for c in chunks]
+        self._lengths = [sum(tf.values()) for tf in self._tfs]
+        self._avg_len = (sum(self._lengths) / len(chunks)) if chunks else 0.0
+        df = Counter(term for tf in self._tfs for term in tf)
+        n = len(chunks)
+        self._idf = {t: math.log(1 + (n - c + 0.5) / (c + 0.5)) for t, c in df.items()}
+
+    def search(self, query, k=None):
+        """Return [(score, chunk_index)] best first, skipping zero scores."""
+        terms = [t for t in set(_terms(query)) if t in self._idf]
+        scores = []
+        for i, tf in enumerate(self._tfs):
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / (self._avg_len or 1))
+            score = sum(
+                self._idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm)
+                for t in terms if t in tf
+            )
+            if score > 0:
+                scores.append((score, i))
+        scores.sort(reverse=True)
+        return scores[:k] if k else scores
+
+
+_indexes = OrderedDict()  # description hash -> BM25Index
+_indexes_lock = threading.Lock()
+
+
+def build_event_index(event_name, description):
+    """Chunk and persist an event's description; called when the admin saves it."""
+    chunks = chunk_description(description)
+    get_event_store().put_chunks(event_name, description, chunks)
+    return _remember(description_hash(description), BM25Index(chunks))
+
+
+def _remember(key, index):
+    with _indexes_lock:
+        _indexes[key] = index
+        _indexes.move_to_end(key)
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def get_event_index(description, event_name=None):
+    """In-process index for a description, loaded from the store or built on the fly."""
+    key = description_hash(description)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    chunks = get_event_store().get_chunks(event_name, description) if event_name else []
+    return _remember(key, BM25Index(chunks or chunk_description(description)))
+
+
+def select_context(description, question, event_name=None, max_tokens=MAX_CONTEXT_TOKENS):
+    """Description text to put in the prompt: whole if small, else the best chunks under the cap."""
+    if estimate_tokens(description) <= max_tokens:
+        return description
+    index = get_event_index(description, event_name)
+    chosen, used = [], 0
+    # The first chunk is the event overview; always keep it for context
+    ranked = [0] + [i for _, i in index.search(question) if i != 0]
+    for i in ranked:
+        tokens = estimate_tokens(index.chunks[i])
+        if used + tokens > max_tokens:
+            continue
+        chosen.append(i)
+        used += tokens
+    if not chosen:
+        # No chunk fits (e.g. stored before oversized paragraphs were split): send the start of the description
+        return description[:max_tokens * CHARS_PER_TOKEN]
+    return "\n...\n".join(index.chunks[i] for i in sorted(chosen))
+
+
+def _synthetic_agenda(sections):
+    topics = ["keynote", "registration", "workshop", "panel", "networking", "lunch", "awards", "venue"]
+    parts = ["Overview:\nAnnual developer conference. Venue: City Convention Centre, Hall B. Fee: Rs. 999."]
+    for i in range(sections):
+        topic = topics[i % len(topics)]
+        parts.append(
+            f"Session {i + 1} - {topic.title()} track:\n"
+            f"Speaker {i} will cover {topic} topics including scaling, testing and deployment. "
+            f"Starts at {9 + i % 8}:00 in room {100 + i}. Seating is limited, arrive early. "
+            f"Materials for the {topic} session will be shared after the talk."
+        )
+    return "\n\n".join(parts)
+
+
+def benchmark(section_counts=(5, 50, 200, 500, 1000), question="What time does the awards session start?"):
+    """Prompt tokens and retrieval time against description length."""
+    rows = []
+    for sections in section_counts:
+        description = _synthetic_agenda(sections)
+        start = time.perf_counter()
+        index = BM25Index(chunk_description(description))
+        build_ms = (time.perf_counter() - start) * 1000
+        _remember(description_hash(description), index)
+        start = time.perf_counter()
+        context = select_context(description, question)
+        query_ms = (time.perf_counter() - start) * 1000
+        rows.append((estimate_tokens(description), estimate_tokens(context), build_ms, query_ms))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event description retrieval")
+    parser.add_argument("--bench", action="store_true", help="prompt size / latency vs description length")
+    args = parser.parse_args()
+
+    if args.bench:
+        print(f"{'desc tokens':>12} {'prompt tokens':>14} {'index ms':>9} {'query ms':>9}")
+        for desc_tokens, prompt_tokens, build_ms, query_ms in benchmark():
+            print(f"{desc_tokens:>12} {prompt_tokens:>14} {build_ms:>9.2f} {query_ms:>9.2f}")
+    else:
+        parser.print_help()
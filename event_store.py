@@ -0,0 +1,241 @@
+"""SQLite-backed event storage shared by admin.py and public.py.
+
+Replaces rewriting the whole events.json on every change. Each add/update or
+delete is a single-row statement in its own transaction (WAL mode, so readers
+never block on a writer and concurrent admins do not overwrite each other).
+Reads are served from an in-process cache that is revalidated with one
+indexed lookup of a generation counter, bumped by every write.
+
+`load_events_from_file`, `save_events_to_file` and `EVENTS_FILE` keep their
+old names so existing callers work unchanged. The legacy events.json is
+imported once, the first time the database is created. EVENTS_DB overrides
+the database path.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+EVENTS_FILE = os.getenv("EVENTS_DB", "events.db")
+LEGACY_EVENTS_FILE = "events.json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    name TEXT PRIMARY KEY,
+    description TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS event_faq (
+    event_name TEXT NOT NULL,
+    desc_hash TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (event_name, question)
+);
+CREATE TABLE IF NOT EXISTS event_chunks (
+    event_name TEXT NOT NULL,
+    desc_hash TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (event_name, idx)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+"""
+
+
+def description_hash(description):
+    """Short content hash identifying one version of an event description."""
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()[:16]
+
+
+class EventStore:
+    """Event table with O(1) single-event writes and a generation-checked read cache."""
+
+    def __init__(self, path=EVENTS_FILE, legacy_path=LEGACY_EVENTS_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._cache_lock = threading.Lock()
+        self._cache = None
+        self._cache_generation = -1
+
+        is_new = not os.path.exists(path)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        if is_new and legacy_path and os.path.exists(legacy_path):
+            self._import_legacy(legacy_path)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _import_legacy(self, legacy_path):
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                events = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"event-store: could not import {legacy_path}: {e}")
+            return
+        self.save_all(events)
+
+    def generation(self):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0]
+
+    def all(self):
+        """Return a fresh dict of event name -> description."""
+        generation = self.generation()
+        with self._cache_lock:
+            if self._cache is None or generation != self._cache_generation:
+                rows = self._conn().execute("SELECT name, description FROM events ORDER BY rowid").fetchall()
+                self._cache = dict(rows)
+                self._cache_generation = generation
+            return dict(self._cache)
+
+    def get(self, name):
+        return self.all().get(name)
+
+    def upsert(self, name, description):
+        """Add or update one event."""
+        self._write((
+            "INSERT INTO events (name, description, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET description = excluded.description, updated_at = excluded.updated_at",
+            (name, description, time.time()),
+        ))
+
+    def delete(self, name):
+        """Delete one event and its pre-generated answers; unknown names are ignored."""
+        self._write(
+            ("DELETE FROM events WHERE name = ?", (name,)),
+            ("DELETE FROM event_faq WHERE event_name = ?", (name,)),
+            ("DELETE FROM event_chunks WHERE event_name = ?", (name,)),
+        )
+
+    def put_faq(self, event_name, description, answers):
+        """Replace an event's pre-generated answers ({question: answer}) in one transaction.
+
+        Skipped (returns False) if the event was edited or deleted after the
+        answers were generated from `description`.
+        """
+        conn = self._conn()
+        now = time.time()
+        desc_hash = description_hash(description)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT description FROM events WHERE name = ?", (event_name,)).fetchone()
+            if row is None or row[0] != description:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute("DELETE FROM event_faq WHERE event_name = ?", (event_name,))
+            conn.executemany(
+                "INSERT INTO event_faq (event_name, desc_hash, question, answer, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(event_name, desc_hash, q, a, now) for q, a in answers.items()],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def get_faq(self, event_name, description):
+        """Pre-generated {question: answer} matching this version of the description."""
+        rows = self._conn().execute(
+            "SELECT question, answer FROM event_faq WHERE event_name = ? AND desc_hash = ?",
+            (event_name, description_hash(description)),
+        ).fetchall()
+        return dict(rows)
+
+    def save_all(self, events):
+        """Make the table match `events`, touching only rows that changed."""
+        current = self.all()
+        changed = {k: v for k, v in events.items() if current.get(k) != v}
+        removed = [k for k in current if k not in events]
+        if not changed and not removed:
+            return
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO events (name, description, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET description = excluded.description, updated_at = excluded.updated_at",
+                [(k, v, now) for k, v in changed.items()],
+            )
+            conn.executemany("DELETE FROM events WHERE name = ?", [(k,) for k in removed])
+            conn.executemany("DELETE FROM event_faq WHERE event_name = ?", [(k,) for k in removed])
+            conn.executemany("DELETE FROM event_chunks WHERE event_name = ?", [(k,) for k in removed])
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def put_chunks(self, event_name, description, chunks):
+        """Replace the retrieval chunks stored for an event's description."""
+        desc_hash = description_hash(description)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM event_chunks WHERE event_name = ?", (event_name,))
+            conn.executemany(
+                "INSERT INTO event_chunks (event_name, desc_hash, idx, text) VALUES (?, ?, ?, ?)",
+                [(event_name, desc_hash, i, text) for i, text in enumerate(chunks)],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_chunks(self, event_name, description):
+        """Stored chunks for this version of the description, in document order."""
+        rows = self._conn().execute(
+            "SELECT text FROM event_chunks WHERE event_name = ? AND desc_hash = ? ORDER BY idx",
+            (event_name, description_hash(description)),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _write(self, *statements):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_event_store():
+    """Return the process-wide event store, opening the database on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = EventStore()
+        return _store
+
+
+def load_events_from_file():
+    """Load events (served from the in-process cache when nothing changed)."""
+    return get_event_store().all()
+
+
+def save_events_to_file(events):
+    """Save events, writing only the rows that differ from what is stored."""
+    get_event_store().save_all(events)
@@ -1,11 +1,8 @@
-from dotenv import load_dotenv
-import os
 import streamlit as st
-import google.generativeai as genai
-
-# Load environment variables
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+import accounting
+import gemini_gateway
+from event_cache import get_event_cache
+from tracing import trace
 
 def setup_css():
     """Add custom CSS for styling"""
@@ -60,6 +57,7 @@ def admin_page():
         if submitted:
             if event_name and event_description:
                 st.session_state["events"][event_name] = event_description
+                get_event_cache().invalidate_event(event_name)
                 st.success(f"Event '{event_name}' added/updated successfully!")
             else:
                 st.error("Please fill in all fields.")
@@ -70,6 +68,7 @@ def admin_page():
             with st.expander(event_name):
                 if st.button(f"Delete '{event_name}'", key=f"delete_{event_name}"):
                     del st.session_state["events"][event_name]
+                    get_event_cache().invalidate_event(event_name)
                     st.success(f"Event '{event_name}' deleted.")
                     st.experimental_rerun()
 
@@ -86,23 +85,33 @@ def public_page():
     question = st.text_input("Ask a question about this event:")
     if st.button("Submit Question"):
         if question:
-            response = get_event_response(selected_event, question)
+            try:
+                with accounting.scope(feature="event_question"):
+                    response = get_event_response(selected_event, question)
+            except accounting.BudgetExceeded as e:
+                st.warning(f"Request not sent: {e}")
+                return
             st.subheader("Response")
             st.write(response)
         else:
             st.error("Please enter a question.")
 
+@trace("get_event_response")
 def get_event_response(event_name, question):
     """Fetch response for the event-specific question"""
     event_description = st.session_state["events"].get(event_name, "")
+    cache = get_event_cache()
+    cached = cache.get(event_name, event_description, question)
+    if cached is not None:
+        return cached
     prompt = (
         f"You are an expert on the event '{event_name}'. Only use the following description to answer questions: \n"
         f"{event_description}\n\n"
         f"Answer questions strictly related to this event and do not use any other source of information.\n\n"
         f"Question: {question}"
     )
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content([prompt])
+    response = gemini_gateway.generate_content([prompt], model="gemini-2.0-flash")
+    cache.put(event_name, event_description, question, response.text)
     return response.text
 
 def main():
@@ -110,6 +119,7 @@ def main():
     st.markdown("<div class='main-header'>Event Q&A Bot</div>", unsafe_allow_html=True)
 
     mode = st.radio("Select Mode", ("Public", "Admin"), key="mode_selector")
+    accounting.use_streamlit_session("eventbot")
 
     if mode == "Admin":
         admin_page()
@@ -0,0 +1,393 @@
+"""Shared gateway for every Gemini call made by the apps.
+
+Each app used to call `genai.configure` at import time and build a fresh
+`genai.GenerativeModel` / `ChatGoogleGenerativeAI` / embeddings client per
+request, with no timeout, retry or concurrency control. This module:
+
+- configures the SDK once per process (one pooled gRPC channel, or a pooled
+  REST session when GEMINI_TRANSPORT=rest or GEMINI_API_ENDPOINT is set)
+- caches model, LangChain chat model and embeddings instances
+- caps in-flight calls with a process-wide semaphore and smooths the request
+  rate with a token bucket; the LangChain clients are wrapped so QA chains
+  and FAISS embedding go through the same limits
+- retries transient failures (429/5xx/timeouts) with full-jitter backoff
+- optionally hedges slow non-streaming calls: if no answer arrives within
+  GEMINI_HEDGE_AFTER seconds a second identical request is sent and the first
+  reply wins
+
+Pointing GEMINI_API_ENDPOINT at `stub_gemini_server.py` runs everything
+against a local stub; `python gemini_gateway.py --selftest` does exactly that.
+GEMINI_REPLAY=record|replay records or replays every call through
+`gemini_replay.py`. Request bytes and token usage are counted against the
+current `tracing` stage, and the metrics exporter is started by `configure`.
+Every call is also measured and budget-checked by `accounting` before it is
+sent. Identical calls in flight at the same time are coalesced into one
+upstream request by `singleflight`.
+
+Importing this module is cheap: the SDK is imported and configured on the
+first call that needs it, so apps render before paying for it.
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import accounting
+import gemini_replay
+import singleflight
+import tracing
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+EMBEDDING_MODEL = "models/embedding-001"
+
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+RATE_PER_SECOND = float(os.getenv("GEMINI_RATE_PER_SECOND", "10"))
+BURST = int(os.getenv("GEMINI_BURST", "20"))
+REQUEST_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_CAP = 8.0
+HEDGE_AFTER = float(os.getenv("GEMINI_HEDGE_AFTER", "0")) or None
+EMBED_BATCH = 100  # texts per batchEmbedContents request
+
+_RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, up to `burst` saved."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+_configured = False
+_config_lock = threading.Lock()
+_settings = {}
+_settings_loaded = False
+_models = {}
+_models_lock = threading.Lock()
+_semaphore = threading.BoundedSemaphore(MAX_CONCURRENCY)
+_bucket = TokenBucket(RATE_PER_SECOND, BURST)
+_hedge_pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY * 2, thread_name_prefix="gemini-hedge")
+
+
+def _load_settings():
+    """Load .env and resolve client settings once per process (without importing the SDK)."""
+    global _settings_loaded
+    if _settings_loaded:
+        return _settings
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY")
+    endpoint = os.getenv("GEMINI_API_ENDPOINT")
+    transport = os.getenv("GEMINI_TRANSPORT") or ("rest" if endpoint else None)
+    if (endpoint or gemini_replay.mode() == "replay") and not api_key:
+        api_key = "stub-key"  # neither a local stub nor a replay checks keys
+    _settings["api_key"] = api_key
+    if transport:
+        _settings["transport"] = transport
+    if endpoint:
+        _settings["client_options"] = {"api_endpoint": endpoint}
+    _settings_loaded = True
+    tracing.start_exporter()
+    return _settings
+
+
+def api_key():
+    """The API key the gateway will use (or None), without importing the SDK."""
+    with _config_lock:
+        return _load_settings().get("api_key")
+
+
+def configure():
+    """Configure the SDK once per process; returns the API key (or None)."""
+    global _configured
+    with _config_lock:
+        settings = _load_settings()
+        if not _configured:
+            import google.generativeai as genai
+
+            genai.configure(**settings)
+            _configured = True
+        return settings.get("api_key")
+
+
+def _cached(key, factory):
+    with _models_lock:
+        instance = _models.get(key)
+        if instance is None:
+            instance = _models[key] = factory()
+        return instance
+
+
+def get_model(name=None, **kwargs):
+    """Cached `genai.GenerativeModel`; kwargs are passed through (system_instruction, ...)."""
+    import google.generativeai as genai
+
+    configure()
+    name = name or os.getenv("GEMINI_MODEL", DEFAULT_MODEL)
+    key = ("genai", name, repr(sorted(kwargs.items())))
+    return _cached(key, lambda: genai.GenerativeModel(name, **kwargs))
+
+
+def _langchain_kwargs():
+    # LangChain clients take the settings directly; genai.configure is not needed
+    kwargs = {"google_api_key": api_key()}
+    if "transport" in _settings:
+        kwargs["transport"] = _settings["transport"]
+    if "client_options" in _settings:
+        kwargs["client_options"] = _settings["client_options"]
+    return kwargs
+
+
+def _limited_chat_model(llm):
+    """`llm` as a LangChain chat model whose calls go through `call`."""
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    class LimitedChatModel(BaseChatModel):
+        @property
+        def _llm_type(self):
+            return "gemini-gateway"
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            message = call(llm.invoke, messages, stop=stop, **kwargs)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    return LimitedChatModel()
+
+
+def _limited_embeddings(client):
+    """`client` as LangChain embeddings whose requests go through `call`, one batch at a time."""
+    from langchain_core.embeddings import Embeddings
+
+    class LimitedEmbeddings(Embeddings):
+        def embed_documents(self, texts):
+            vectors = []
+            for start in range(0, len(texts), EMBED_BATCH):
+                vectors.extend(call(client.embed_documents, texts[start:start + EMBED_BATCH]))
+            return vectors
+
+        def embed_query(self, text):
+            return call(client.embed_query, text)
+
+    return LimitedEmbeddings()
+
+
+def get_chat_llm(model=DEFAULT_MODEL, temperature=0.3):
+    """Cached LangChain chat model under the gateway's limits, with timeout and retries set."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    def factory():
+        # One attempt per call; `call` does the retrying
+        return _limited_chat_model(ChatGoogleGenerativeAI(
+            model=model, temperature=temperature, timeout=REQUEST_TIMEOUT, max_retries=1,
+            callbacks=accounting.langchain_callbacks(), **_langchain_kwargs(),
+        ))
+
+    key = ("langchain-chat", model, temperature)
+    if gemini_replay.mode():
+        return _cached(key, lambda: gemini_replay.wrap_chat_model(factory, f"{model}@{temperature}"))
+    return _cached(key, factory)
+
+
+def get_embeddings(model=EMBEDDING_MODEL):
+    """Cached LangChain embeddings client under the gateway's limits."""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    def factory():
+        kwargs = _langchain_kwargs()
+        client = GoogleGenerativeAIEmbeddings(model=model, **kwargs)
+        if "transport" in kwargs:
+            # The embeddings client builds its API client without the transport (gRPC only)
+            from langchain_google_genai._genai_extension import build_generative_service
+
+            client.client = build_generative_service(
+                api_key=kwargs["google_api_key"], client_options=kwargs.get("client_options"),
+                transport=kwargs["transport"],
+            )
+        return _limited_embeddings(client)
+
+    key = ("langchain-embeddings", model)
+    if gemini_replay.mode():
+        return _cached(key, lambda: gemini_replay.wrap_embeddings(factory, model))
+    return _cached(key, factory)
+
+
+def _retryable_types():
+    try:
+        from google.api_core import exceptions as gexc
+    except ImportError:
+        return (ConnectionError, TimeoutError)
+    return (
+        ConnectionError, TimeoutError, gexc.ResourceExhausted, gexc.ServiceUnavailable,
+        gexc.InternalServerError, gexc.DeadlineExceeded, gexc.BadGateway,
+    )
+
+
+def is_transient(exc):
+    """True for errors worth retrying: rate limits, 5xx, timeouts, dropped connections."""
+    if isinstance(exc, _retryable_types()):
+        return True
+    if getattr(exc, "code", None) in _RETRYABLE_CODES:
+        return True
+    # LangChain wraps API errors in its own exception types
+    return exc.__cause__ is not None and is_transient(exc.__cause__)
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def call(fn, *args, retries=MAX_RETRIES, **kwargs):
+    """Run one API call under the concurrency cap and rate limit, retrying transient errors."""
+    for attempt in range(retries + 1):
+        _bucket.acquire()
+        with _semaphore:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= retries or not is_transient(e):
+                    raise
+        time.sleep(backoff_delay(attempt))
+
+
+def _hedged(fn, args, kwargs, hedge_after):
+    primary = _hedge_pool.submit(call, fn, *args, **kwargs)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result()
+    backup = _hedge_pool.submit(call, fn, *args, **kwargs)
+    pending = {primary, backup}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def _count_request(ticket):
+    # The size accounting measured for the budget check, so a request is measured once
+    tracing.count("gemini_model_calls_total")
+    tracing.count("gemini_request_bytes_total", ticket.counts["payload_bytes"])
+
+
+def generate_content(contents, model=None, stream=False, timeout=REQUEST_TIMEOUT, hedge_after=HEDGE_AFTER,
+                     model_kwargs=None, **kwargs):
+    """`GenerativeModel.generate_content` through the gateway.
+
+    `model` is a model name (a cached instance is used) or a GenerativeModel.
+    Streaming calls hold the concurrency slot only while the request is being
+    opened, and are never hedged. Raises accounting.BudgetExceeded if the
+    request is over budget; it may instead be sent to a cheaper model.
+    """
+    if hasattr(model, "generate_content"):
+        target = model  # an already-built model instance
+        ticket = accounting.before_request(contents, target.model_name, can_downgrade=False)
+    else:
+        model = model or os.getenv("GEMINI_MODEL", DEFAULT_MODEL)
+        ticket = accounting.before_request(contents, model)
+        target = get_model(ticket.model, **(model_kwargs or {}))
+    request_options = dict(kwargs.pop("request_options", {}) or {})
+    request_options.setdefault("timeout", timeout)
+    call_kwargs = dict(kwargs, stream=stream, request_options=request_options)
+
+    def live():
+        if hedge_after and not stream:
+            return _hedged(target.generate_content, (contents,), call_kwargs, hedge_after)
+        return call(target.generate_content, contents, **call_kwargs)
+
+    request = {
+        "contents": contents,
+        "system_instruction": getattr(target, "_system_instruction", None),
+        "kwargs": kwargs,
+    }
+    _count_request(ticket)
+    response = gemini_replay.intercept(
+        "generate_content", target.model_name, request, stream,
+        lambda: singleflight.coalesce("generate_content", target.model_name, request, stream, live),
+    )
+    if not stream:  # streamed usage is only known once consumed; see streaming.render_stream
+        tracing.record_usage(getattr(response, "usage_metadata", None))
+    return accounting.track(response, ticket, stream)
+
+
+def send_message(chat, content, stream=False, timeout=REQUEST_TIMEOUT, **kwargs):
+    """`ChatSession.send_message` through the gateway (retried, never hedged)."""
+    request_options = dict(kwargs.pop("request_options", {}) or {})
+    request_options.setdefault("timeout", timeout)
+    # The SDK resends the whole history with every message
+    history = list(chat.history)
+    ticket = accounting.before_request([content] + history, chat.model.model_name, can_downgrade=False)
+
+    def live():
+        return call(chat.send_message, content, stream=stream, request_options=request_options, **kwargs)
+
+    def replayed(text):
+        chat.history = list(chat.history) + [
+            {"role": "user", "parts": [content]},
+            {"role": "model", "parts": [text]},
+        ]
+
+    request = {"history": history, "content": content, "kwargs": kwargs}
+    _count_request(ticket)
+    response = gemini_replay.intercept(
+        "send_message", chat.model.model_name, request, stream,
+        lambda: singleflight.coalesce("send_message", chat.model.model_name, request, stream, live, replayed),
+        replayed,
+    )
+    if not stream:
+        tracing.record_usage(getattr(response, "usage_metadata", None))
+    return accounting.track(response, ticket, stream)
+
+
+def _selftest():
+    from stub_gemini_server import start_stub_server
+
+    server, url = start_stub_server(latency=0.05, jitter=0.3, token_delay=0.0, error_rate=0.2, seed=1)
+    os.environ["GEMINI_API_ENDPOINT"] = url
+    configure()
+    start = time.perf_counter()
+    for i in range(10):
+        text = generate_content([f"question {i}"], hedge_after=0.15).text
+        assert text.startswith("Stub answer to:"), text
+    print(f"10 hedged calls with 20% injected 503s: {time.perf_counter() - start:.2f}s")
+    chunks = [c.text for c in generate_content(["stream please"], stream=True)]
+    print(f"streamed {len(chunks)} chunks")
+    chat = get_model().start_chat(history=[])
+    send_message(chat, "hello")
+    print(f"chat history length {len(chat.history)}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gemini gateway")
+    parser.add_argument("--selftest", action="store_true", help="exercise the gateway against the local stub")
+    args = parser.parse_args()
+    if args.selftest:
+        _selftest()
+    else:
+        parser.print_help()
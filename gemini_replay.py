@@ -0,0 +1,346 @@
+"""Record/replay of Gemini calls for offline benchmarking and regression tests.
+
+Set GEMINI_REPLAY=record to run the apps against the live API while every
+`generate_content`, `send_message`, chat-model and embedding call made through
+gemini_gateway is appended to a JSONL cassette (GEMINI_CASSETTE, default
+gemini_cassette.jsonl) keyed by a canonical hash of the request, together with
+its time-to-first-token and total latency.
+
+Set GEMINI_REPLAY=replay to serve those calls from the cassette with no
+network access. Latency is simulated: the recorded timings by default, or a
+fixed number of seconds via GEMINI_REPLAY_LATENCY, scaled by
+GEMINI_REPLAY_SPEED. A request that was never recorded raises ReplayMissError.
+
+`python gemini_replay.py stats` summarises a cassette.
+"""
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import threading
+import time
+from types import SimpleNamespace
+
+DEFAULT_CASSETTE = "gemini_cassette.jsonl"
+_INLINE_LIMIT = 2048  # longer strings/bytes are represented by their hash
+
+
+class ReplayMissError(KeyError):
+    """Raised in replay mode for a request that is not in the cassette."""
+
+
+def mode():
+    """'record', 'replay' or None, from GEMINI_REPLAY."""
+    value = (os.getenv("GEMINI_REPLAY") or "").strip().lower()
+    return value if value in ("record", "replay") else None
+
+
+def _canonical(obj):
+    if obj is None or isinstance(obj, (bool, int, float)):
+        return obj
+    if isinstance(obj, str):
+        if len(obj) > _INLINE_LIMIT:
+            return {"sha256": hashlib.sha256(obj.encode("utf-8")).hexdigest()}
+        return obj
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return {"sha256": hashlib.sha256(bytes(obj)).hexdigest()}
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in sorted(obj.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    if hasattr(obj, "tobytes") and hasattr(obj, "size"):  # PIL image
+        return {"image": list(obj.size), "sha256": hashlib.sha256(obj.tobytes()).hexdigest()}
+    to_dict = getattr(type(obj), "to_dict", None)
+    if to_dict is not None:  # proto-plus messages such as Content
+        try:
+            return _canonical(to_dict(obj))
+        except Exception:
+            pass
+    if hasattr(obj, "type") and hasattr(obj, "content"):  # LangChain messages
+        return {"type": obj.type, "content": _canonical(obj.content)}
+    return repr(obj)
+
+
+def request_hash(kind, model, request, stream=False):
+    """Stable hash of a request, independent of dict ordering and inline blob size."""
+    payload = json.dumps(
+        {"kind": kind, "model": model, "stream": bool(stream), "request": _canonical(request)},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Append-only JSONL store of recorded responses, indexed by request hash."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = None
+
+    def _load(self):
+        records = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    records[record["key"]] = record
+        return records
+
+    def get(self, key):
+        with self._lock:
+            if self._records is None:
+                self._records = self._load()
+            return self._records.get(key)
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if self._records is None:
+                self._records = self._load()
+            self._records[record["key"]] = record
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def records(self):
+        with self._lock:
+            if self._records is None:
+                self._records = self._load()
+            return list(self._records.values())
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette():
+    global _cassette
+    with _cassette_lock:
+        path = os.getenv("GEMINI_CASSETTE", DEFAULT_CASSETTE)
+        if _cassette is None or _cassette.path != path:
+            _cassette = Cassette(path)
+        return _cassette
+
+
+def _simulated(record):
+    """(time to first token, total) to sleep for when replaying a record."""
+    speed = float(os.getenv("GEMINI_REPLAY_SPEED", "1") or 1)
+    fixed = os.getenv("GEMINI_REPLAY_LATENCY")
+    if fixed not in (None, "", "recorded"):
+        total = float(fixed)
+        ttft = total * (record.get("ttft", 0) / record["total"]) if record.get("total") else total
+    else:
+        ttft, total = record.get("ttft", 0.0), record.get("total", 0.0)
+    return ttft / speed, total / speed
+
+
+def _usage(usage):
+    if usage is None:
+        return None
+    return {
+        "prompt_token_count": getattr(usage, "prompt_token_count", None),
+        "candidates_token_count": getattr(usage, "candidates_token_count", None),
+        "total_token_count": getattr(usage, "total_token_count", None),
+    }
+
+
+class ReplayResponse:
+    """Stands in for GenerateContentResponse: `.text`, `.usage_metadata`, iteration."""
+
+    def __init__(self, record, stream):
+        self._record = record
+        self._stream = stream
+        self._chunks = record["response"].get("chunks") or [record["response"].get("text", "")]
+        self.text = "".join(self._chunks)
+        usage = record.get("usage")
+        self.usage_metadata = SimpleNamespace(**usage) if usage else None
+        self._ttft, self._total = _simulated(record)
+        if not stream:
+            time.sleep(self._total)
+
+    def __iter__(self):
+        if not self._stream:
+            yield SimpleNamespace(text=self.text)
+            return
+        time.sleep(self._ttft)
+        gap = (self._total - self._ttft) / max(1, len(self._chunks) - 1)
+        for i, chunk in enumerate(self._chunks):
+            if i:
+                time.sleep(gap)
+            yield SimpleNamespace(text=chunk)
+
+
+class _RecordingStream:
+    """Passes a live stream through and records it once fully consumed."""
+
+    def __init__(self, response, on_done, start):
+        self._response = response
+        self._on_done = on_done
+        self._start = start
+
+    def __iter__(self):
+        chunks, first = [], None
+        for chunk in self._response:
+            if first is None:
+                first = time.perf_counter()
+            chunks.append(chunk.text)
+            yield chunk
+        end = time.perf_counter()
+        self._on_done(chunks, getattr(self._response, "usage_metadata", None),
+                      (first or end) - self._start, end - self._start)
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+def _record(key, kind, model, request, response, usage, ttft, total):
+    get_cassette().append({
+        "key": key,
+        "kind": kind,
+        "model": model,
+        "preview": str(_canonical(request))[:200],
+        "response": response,
+        "usage": _usage(usage),
+        "ttft": round(ttft, 4),
+        "total": round(total, 4),
+        "recorded_at": time.time(),
+    })
+
+
+def _lookup(key, kind, model):
+    record = get_cassette().get(key)
+    if record is None:
+        raise ReplayMissError(f"no recorded {kind} for model {model} (request {key[:12]}); re-record with GEMINI_REPLAY=record")
+    return record
+
+
+def intercept(kind, model, request, stream, live_call, on_replay=None):
+    """Record or replay a generate_content/send_message call; pass through when inactive.
+
+    `on_replay(text)` lets the caller apply side effects the live call would
+    have had, such as appending the turn to a chat history.
+    """
+    current = mode()
+    if current is None:
+        return live_call()
+    key = request_hash(kind, model, request, stream)
+    if current == "replay":
+        record = _lookup(key, kind, model)
+        response = ReplayResponse(record, stream)
+        if on_replay is not None:
+            on_replay(response.text)
+        return response
+
+    start = time.perf_counter()
+    response = live_call()
+    if stream:
+        return _RecordingStream(
+            response,
+            lambda chunks, usage, ttft, total: _record(
+                key, kind, model, request, {"chunks": chunks}, usage, ttft, total),
+            start,
+        )
+    total = time.perf_counter() - start
+    _record(key, kind, model, request, {"text": response.text}, getattr(response, "usage_metadata", None), total, total)
+    return response
+
+
+def _recorded_call(kind, model, request, live_call, encode, decode):
+    current = mode()
+    if current is None:
+        return live_call()
+    key = request_hash(kind, model, request)
+    if current == "replay":
+        record = _lookup(key, kind, model)
+        time.sleep(_simulated(record)[1])
+        return decode(record["response"])
+    start = time.perf_counter()
+    result = live_call()
+    total = time.perf_counter() - start
+    _record(key, kind, model, request, encode(result), None, total, total)
+    return result
+
+
+def wrap_embeddings(factory, model):
+    """LangChain Embeddings that records/replays; `factory()` builds the live client lazily."""
+    from langchain_core.embeddings import Embeddings
+
+    live = {}
+
+    def inner():
+        if "client" not in live:
+            live["client"] = factory()
+        return live["client"]
+
+    class RecordedEmbeddings(Embeddings):
+        def embed_documents(self, texts):
+            return _recorded_call(
+                "embed_documents", model, list(texts), lambda: inner().embed_documents(texts),
+                lambda vectors: {"vectors": vectors}, lambda response: response["vectors"],
+            )
+
+        def embed_query(self, text):
+            return _recorded_call(
+                "embed_query", model, text, lambda: inner().embed_query(text),
+                lambda vector: {"vector": vector}, lambda response: response["vector"],
+            )
+
+    return RecordedEmbeddings()
+
+
+def wrap_chat_model(factory, model):
+    """LangChain chat model that records/replays; `factory()` builds the live model lazily."""
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    live = {}
+
+    def inner():
+        if "llm" not in live:
+            live["llm"] = factory()
+        return live["llm"]
+
+    class RecordedChatModel(BaseChatModel):
+        @property
+        def _llm_type(self):
+            return "gemini-recorded"
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            text = _recorded_call(
+                "chat", model, {"messages": messages, "stop": stop},
+                lambda: inner().invoke(messages, stop=stop).content,
+                lambda content: {"text": content}, lambda response: response["text"],
+            )
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    return RecordedChatModel()
+
+
+def stats(path):
+    """Per-kind counts and recorded latency percentiles for a cassette."""
+    by_kind = {}
+    for record in Cassette(path).records():
+        by_kind.setdefault(record["kind"], []).append(record["total"])
+    summary = {}
+    for kind, totals in sorted(by_kind.items()):
+        totals.sort()
+        summary[kind] = {
+            "calls": len(totals),
+            "p50_s": statistics.median(totals),
+            "p95_s": totals[min(len(totals) - 1, int(len(totals) * 0.95))],
+        }
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gemini record/replay cassettes")
+    parser.add_argument("command", choices=["stats"])
+    parser.add_argument("--cassette", default=os.getenv("GEMINI_CASSETTE", DEFAULT_CASSETTE))
+    args = parser.parse_args()
+    for kind, row in stats(args.cassette).items():
+        print(f"{kind:>16}: {row['calls']:>5} calls, p50 {row['p50_s']:.3f}s, p95 {row['p95_s']:.3f}s")
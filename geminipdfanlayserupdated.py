@@ -1,243 +1,147 @@
-import streamlit as st
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 import os
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-import google.generativeai as genai
-# Use standard FAISS import if possible, otherwise keep specific one if needed
-# from langchain.vectorstores import FAISS
-from langchain_community.vectorstores import FAISS # More common import path
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains.question_answering import load_qa_chain
-from langchain.prompts import PromptTemplate
-from dotenv import load_dotenv
-import io # Needed for PdfReader with uploaded files
-
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
+import streamlit as st
+import accounting
+import gemini_gateway
+import ingest_jobs
+from analysers import pdf_qa
+from tracing import trace
+
+try:
+    api_key = gemini_gateway.api_key()
+except Exception as e:
+    st.error(f"Error configuring Google Generative AI: {e}")
+    st.stop()
 
 # Basic check for API key
 if not api_key:
     st.error("Google API Key not found. Please set it in your .env file or environment variables.")
     st.stop()
 
-try:
-    genai.configure(api_key=api_key)
-except Exception as e:
-    st.error(f"Error configuring Google Generative AI: {e}")
-    st.stop()
+# --- Core Functions (see analysers.pdf_qa; ingestion runs in ingest_jobs workers) ---
 
-# --- Core Functions ---
+@st.cache_resource(max_entries=8)
+def load_collection(name, version):
+    """Resident FAISS index for a collection; `version` changes when it is rebuilt."""
+    return pdf_qa.load_vector_store(ingest_jobs.collection_dir(name))
 
-def get_pdf_text(pdf_docs):
-    """Extracts text from a list of uploaded PDF files."""
-    text = ""
-    if not pdf_docs:
-        return ""
-    for pdf in pdf_docs:
-        try:
-            # PyPDF2 reads file-like objects
-            pdf_reader = PdfReader(pdf)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text: # Add text only if extraction was successful
-                    text += page_text
-        except Exception as e:
-            st.warning(f"Could not read text from {pdf.name}: {e}. It might be scanned or corrupted.")
-            # Optionally skip the file or handle differently
-    return text
-
-def get_text_chunks(text):
-    """Splits text into manageable chunks."""
-    if not text:
-        return []
-    # Smaller chunk size might be better for detailed retrieval and staying within context limits
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=5000, chunk_overlap=500)
-    chunks = text_splitter.split_text(text)
-    return chunks
-
-def get_vector_store(text_chunks):
-    """Creates and saves a FAISS vector store from text chunks."""
-    if not text_chunks:
-        st.warning("No text chunks found to create vector store.")
-        return False # Indicate failure
-    try:
-        # Ensure model name is correct, "models/embedding-001" is common
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-        vector_store.save_local("faiss_index")
-        return True # Indicate success
-    except Exception as e:
-        st.error(f"Error creating vector store: {e}")
-        return False
-
-def get_conversational_chain():
-    """Creates the Q&A chain with an improved prompt."""
-
-    # Modified prompt to encourage explanation and synthesis
-    prompt_template = """
-    Based on the provided context from the document(s), answer the following question.
-    Do not just copy text verbatim. Explain the answer in your own words while staying true to the information in the context.
-    If the answer cannot be found or inferred from the provided context, clearly state that the information is not available in the document(s).
-    Do not provide speculative or incorrect answers.
-
-    Context:\n{context}\n
-    Question: \n{question}\n
-
-    Answer:
-    """
-
-    # Use a generally capable model like gemini-pro. Adjust temperature for more creativity.
-    # Temperature 0.5-0.7 might yield more explanatory results than 0.3
-    model = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.6)
-
-    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-    # "stuff" chain is simple but can hit token limits with large contexts.
-    # Consider "map_reduce" or "refine" for very large documents if needed.
-    chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
-
-    return chain
-
-def analyze_sentiment_chain():
-    """Creates a chain specifically for sentiment analysis."""
-    prompt_template = """
-    Analyze the overall sentiment of the following text.
-    Describe the dominant sentiment (e.g., Positive, Negative, Neutral, Mixed) and briefly explain why, citing examples from the text if possible.
-
-    Text:\n{text}\n
-
-    Sentiment Analysis:
-    """
-    model = ChatGoogleGenerativeAI(model="gemini-pro", temperature=0.4) # Slightly lower temp for analysis
-    prompt = PromptTemplate(template=prompt_template, input_variables=["text"])
-    # For analysis, we might not need a specific chain type like load_qa_chain,
-    # we can invoke the model directly with the prompt, but using a chain keeps consistency.
-    # We'll create a simple chain structure manually for this.
-    # This is a simplified approach; a dedicated sentiment analysis model might be better
-    # but this uses the existing LLM.
-
-    # Langchain LCEL (Langchain Expression Language) approach
-    from langchain_core.runnables import RunnablePassthrough
-    from langchain_core.output_parsers import StrOutputParser
-
-    sentiment_chain = (
-        {"text": RunnablePassthrough()} # Pass the input text directly
-        | prompt
-        | model
-        | StrOutputParser()
-    )
-    return sentiment_chain
-
-
-def handle_user_input(user_question):
+
+@trace("handle_user_input")
+def handle_user_input(user_question, collection):
     """Processes user question, retrieves context, and gets answer."""
-    if 'vector_store_ready' not in st.session_state or not st.session_state.vector_store_ready:
+    version = ingest_jobs.collection_version(collection)
+    if version is None:
         st.warning("Please upload and process PDF files first.")
         return
 
     try:
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        # Load the vector store
-        new_db = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True) # Be cautious with this flag
-        # Retrieve relevant documents
-        docs = new_db.similarity_search(user_question, k=5) # Retrieve top 5 relevant chunks
-
-        if not docs:
+        # Explanatory prompt and a slightly higher temperature than the plain PDF chat
+        answer = pdf_qa.answer_question(
+            user_question, load_collection(collection, version), k=5,
+            prompt_template=pdf_qa.EXPLAIN_PROMPT, temperature=0.6,
+        )
+        if answer is None:
             st.write("Reply: Could not find relevant information in the documents for your question.")
             return
 
-        # Get the Q&A chain
-        chain = get_conversational_chain()
-
-        # Run the chain
-        response = chain(
-            {"input_documents": docs, "question": user_question},
-            return_only_outputs=True
-        )
-
         # Display the response
-        st.write("Reply: ", response["output_text"])
+        with trace("render"):
+            st.write("Reply: ", answer)
 
     except FileNotFoundError:
-         st.error("Could not find the 'faiss_index'. Please process the PDF files again.")
+         st.error(f"Could not find the index for '{collection}'. Please process the PDF files again.")
     except Exception as e:
         st.error(f"An error occurred during question processing: {e}")
 
 
-def perform_sentiment_analysis():
-    """Performs sentiment analysis on the full text stored in session state."""
-    if 'raw_text' not in st.session_state or not st.session_state.raw_text:
-        st.warning("Please upload and process PDF files first to analyze sentiment.")
-        return
+def perform_sentiment_analysis(collection):
+    """Performs sentiment analysis on the full text extracted for a collection."""
+    path = os.path.join(ingest_jobs.collection_dir(collection), ingest_jobs.TEXT_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw_text = f.read()
+    except OSError:
+        raw_text = ""
 
-    if not st.session_state.raw_text.strip():
+    if not raw_text.strip():
          st.warning("No text was extracted from the PDFs to analyze.")
          return
 
     st.subheader("Sentiment Analysis")
     with st.spinner("Analyzing sentiment..."):
         try:
-            chain = analyze_sentiment_chain()
-            # Provide the full text stored in session state
             # Limit text length if necessary to avoid exceeding model token limits
             max_len = 20000 # Adjust based on model context window and typical PDF size
-            text_to_analyze = st.session_state.raw_text[:max_len]
-            if len(st.session_state.raw_text) > max_len:
+            if len(raw_text) > max_len:
                  st.info(f"Analyzing sentiment on the first {max_len} characters due to length limitations.")
 
-            response = chain.invoke(text_to_analyze)
+            response = pdf_qa.analyze_sentiment(raw_text, max_chars=max_len)
             st.write(response)
         except Exception as e:
             st.error(f"An error occurred during sentiment analysis: {e}")
 
 
+@st.fragment(run_every=2)
+def show_ingest_jobs():
+    """Progress of this session's ingestion jobs, refreshed every 2s without rerunning the page."""
+    queue = ingest_jobs.get_job_queue()
+    jobs = queue.list(ids=st.session_state.ingest_jobs)
+    finished = {job["id"] for job in jobs if job["status"] not in ingest_jobs.ACTIVE}
+    for job in jobs:
+        label = f"#{job['id']} {job['collection']}"
+        if job["status"] in ingest_jobs.ACTIVE:
+            stage = job["stage"] or "waiting for a worker"
+            st.progress(min(1.0, job["progress"]), text=f"{label}: {stage} {job['message'] or ''}")
+            if st.button("Cancel", key=f"cancel_job_{job['id']}"):
+                queue.cancel(job["id"])
+        else:
+            st.caption(f"{label}: {job['status']} - {job['message'] or ''}")
+    # A job just finished: rerun the whole page so the new collection can be selected
+    if finished - st.session_state.seen_finished_jobs:
+        st.session_state.seen_finished_jobs |= finished
+        st.rerun()
+
+
 # --- Streamlit App ---
 
 def main():
     st.set_page_config(page_title="Chat & Analyze PDF", layout="wide")
+    accounting.use_streamlit_session("geminipdfanlayserupdated")
     st.header("Chat with & Analyze PDF using Gemini💁")
 
     # Initialize session state variables
-    if 'vector_store_ready' not in st.session_state:
-        st.session_state.vector_store_ready = False
-    if 'raw_text' not in st.session_state:
-        st.session_state.raw_text = ""
+    if 'ingest_jobs' not in st.session_state:
+        st.session_state.ingest_jobs = []
+    if 'seen_finished_jobs' not in st.session_state:
+        st.session_state.seen_finished_jobs = set()
+
+    queue = ingest_jobs.ensure_workers()
+    collections = ingest_jobs.list_collections()
 
     # --- Sidebar for PDF Upload and Processing ---
     with st.sidebar:
         st.title("Menu:")
         pdf_docs = st.file_uploader("Upload PDF Files", accept_multiple_files=True, type=["pdf"])
+        collection_name = st.text_input("Collection name", value=pdf_docs[0].name.rsplit(".", 1)[0] if pdf_docs else "")
 
         if st.button("Process Uploaded PDFs"):
             if pdf_docs:
-                with st.spinner("Processing PDFs... Extracting text, chunking, embedding..."):
-                    # 1. Extract Text
-                    st.session_state.raw_text = get_pdf_text(pdf_docs)
-                    if not st.session_state.raw_text.strip():
-                         st.error("No text could be extracted from the provided PDF(s). They might be image-based or empty.")
-                         st.session_state.vector_store_ready = False # Reset flag
-                    else:
-                        # 2. Get Text Chunks
-                        text_chunks = get_text_chunks(st.session_state.raw_text)
-                        if not text_chunks:
-                            st.warning("Text was extracted, but could not be split into chunks.")
-                            st.session_state.vector_store_ready = False # Reset flag
-                        else:
-                            # 3. Create Vector Store
-                            success = get_vector_store(text_chunks)
-                            if success:
-                                st.session_state.vector_store_ready = True
-                                st.success("Processing Complete! Vector store created.")
-                            else:
-                                st.error("Failed to create vector store.")
-                                st.session_state.vector_store_ready = False # Reset flag
+                # Extraction, chunking and embedding run in a background worker
+                job_id = queue.submit(collection_name or "default", [(pdf.name, pdf.getvalue()) for pdf in pdf_docs])
+                st.session_state.ingest_jobs.insert(0, job_id)
+                st.success(f"Queued as job #{job_id}; you can keep asking questions meanwhile.")
             else:
                 st.warning("Please upload at least one PDF file.")
 
+        if st.session_state.ingest_jobs:
+            show_ingest_jobs()
+
+        collection = st.selectbox("Collection to query", collections) if collections else None
+
         # Add Sentiment Analysis Button (enabled only after processing)
-        if st.session_state.get('vector_store_ready', False): # Check if processed
+        if collection:
              if st.button("Analyze Sentiment of PDFs"):
-                 perform_sentiment_analysis() # Call the analysis function defined above
+                 with accounting.scope(feature="sentiment"):
+                     perform_sentiment_analysis(collection) # Call the analysis function defined above
         else:
              st.info("Process PDFs to enable Sentiment Analysis.")
 
@@ -247,8 +151,12 @@ def main():
     user_question = st.text_input("Your question:")
 
     if user_question:
-        handle_user_input(user_question)
+        if collection is None:
+            st.warning("Please upload and process PDF files first.")
+        else:
+            with accounting.scope(feature="ask"):
+                handle_user_input(user_question, collection)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
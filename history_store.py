@@ -0,0 +1,218 @@
+"""Append-only chat history persistence for the image analyser.
+
+Every conversation is one JSONL file in HISTORY_DIR. The first line is a
+header record (image name, start timestamp, description) and each following
+line is a single question/answer turn, so saving a turn costs one small append
+instead of rewriting the whole conversation. Writes are queued and flushed in
+batches by a background thread, off the Streamlit request path.
+
+Older versions wrote a full JSON snapshot per question; those files are still
+readable, and `python history_store.py --compact` merges them into sessions.
+"""
+import argparse
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+
+HISTORY_DIR = "chat_history"
+FLUSH_INTERVAL = 0.5  # seconds a write may wait in the queue
+MAX_BATCH = 256  # records written per flush at most
+
+_STOP = object()
+
+
+class HistoryWriter:
+    """Background writer that batches appends to per-session JSONL files."""
+
+    def __init__(self, history_dir=HISTORY_DIR, flush_interval=FLUSH_INTERVAL):
+        self.history_dir = history_dir
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        os.makedirs(history_dir, exist_ok=True)
+
+    def start_session(self, image_name, description):
+        """Create a new conversation and return its file path."""
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        path = os.path.join(self.history_dir, f"{image_name}_{timestamp}.jsonl")
+        self._queue.put((path, {
+            "type": "session",
+            "image_name": image_name,
+            "timestamp": timestamp,
+            "description": description,
+        }))
+        return path
+
+    def append_turn(self, path, question, answer):
+        """Queue one question/answer turn for the given session."""
+        self._queue.put((path, {"type": "turn", "q": question, "a": answer}))
+
+    def flush(self):
+        """Block until every queued record has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Flush pending records and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            # Collect whatever else arrives within the flush window
+            try:
+                while len(batch) < MAX_BATCH:
+                    nxt = self._queue.get(timeout=self.flush_interval)
+                    if nxt is _STOP:
+                        self._queue.put(_STOP)
+                        self._queue.task_done()
+                        break
+                    batch.append(nxt)
+            except queue.Empty:
+                pass
+            self._write_batch(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_batch(self, batch):
+        by_path = {}
+        for path, record in batch:
+            by_path.setdefault(path, []).append(json.dumps(record, ensure_ascii=False))
+        for path, lines in by_path.items():
+            try:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError as e:
+                print(f"history-writer: could not write {path}: {e}")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_history_writer():
+    """Return the process-wide history writer, starting it on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = HistoryWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def load_history_files(history_dir=HISTORY_DIR):
+    """List session logs and legacy snapshots, newest first."""
+    files = glob.glob(os.path.join(history_dir, "*.jsonl"))
+    files += glob.glob(os.path.join(history_dir, "*.json"))
+    files.sort(key=os.path.getmtime, reverse=True)
+    return files
+
+
+def load_history_file(filename):
+    """Load a session log or a legacy snapshot into the snapshot layout."""
+    if not filename.endswith(".jsonl"):
+        with open(filename, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    data = {"image_name": None, "timestamp": None, "description": "", "conversation": []}
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # tolerate a torn last line after a crash
+            if record.get("type") == "session":
+                data["image_name"] = record.get("image_name")
+                data["timestamp"] = record.get("timestamp")
+                data["description"] = record.get("description", "")
+            elif record.get("type") == "turn":
+                data["conversation"].append([record["q"], record["a"]])
+    return data
+
+
+def _is_prefix(shorter, longer):
+    return len(shorter) <= len(longer) and list(map(list, longer[:len(shorter)])) == list(map(list, shorter))
+
+
+def compact_snapshots(history_dir=HISTORY_DIR, dry_run=False):
+    """Merge legacy per-question snapshots into one JSONL log per conversation.
+
+    Snapshots of the same image are chained when they share the description and
+    each conversation extends the previous one. Returns a list of
+    (session_path, merged_snapshot_paths) tuples.
+    """
+    snapshots = []
+    for path in glob.glob(os.path.join(history_dir, "*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshots.append((path, json.load(f)))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Skipping {path}: {e}")
+    snapshots.sort(key=lambda s: (s[1].get("image_name") or "", s[1].get("timestamp") or ""))
+
+    chains = []
+    for path, data in snapshots:
+        last = chains[-1] if chains else None
+        if (
+            last
+            and last[-1][1].get("image_name") == data.get("image_name")
+            and last[-1][1].get("description") == data.get("description")
+            and _is_prefix(last[-1][1].get("conversation", []), data.get("conversation", []))
+        ):
+            last.append((path, data))
+        else:
+            chains.append([(path, data)])
+
+    results = []
+    for chain in chains:
+        first, latest = chain[0][1], chain[-1][1]
+        session_path = os.path.join(history_dir, f"{first['image_name']}_{first['timestamp']}.jsonl")
+        merged = [path for path, _ in chain]
+        results.append((session_path, merged))
+        if dry_run:
+            continue
+        lines = [json.dumps({
+            "type": "session",
+            "image_name": first["image_name"],
+            "timestamp": first["timestamp"],
+            "description": latest.get("description", ""),
+        }, ensure_ascii=False)]
+        for q, a in latest.get("conversation", []):
+            lines.append(json.dumps({"type": "turn", "q": q, "a": a}, ensure_ascii=False))
+        tmp_path = session_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, session_path)
+        # Keep the sidebar's newest-first ordering stable
+        mtime = max(os.path.getmtime(path) for path in merged)
+        os.utime(session_path, (mtime, mtime))
+        for path in merged:
+            os.remove(path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chat history maintenance")
+    parser.add_argument("--compact", action="store_true", help="merge legacy JSON snapshots into JSONL sessions")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be merged")
+    parser.add_argument("--dir", default=HISTORY_DIR, help="history directory")
+    args = parser.parse_args()
+
+    if args.compact:
+        for session_path, merged in compact_snapshots(args.dir, dry_run=args.dry_run):
+            print(f"{session_path} <- {len(merged)} snapshot(s)")
+    else:
+        parser.print_help()
@@ -1,17 +1,10 @@
 import streamlit as st
-from PIL import Image
-import google.generativeai as genai
+import accounting
+import gemini_gateway
 import os
 import time
-from io import BytesIO
-import base64
-import json
-from datetime import datetime
-import glob
-from dotenv import load_dotenv  # Added for .env support
-
-# Load environment variables from .env file
-load_dotenv()
+from analysers.image import answer_question, get_image_description, get_image_model
+from history_store import HISTORY_DIR, get_history_writer, load_history_files, load_history_file
 
 # Configure the app
 st.set_page_config(
@@ -29,20 +22,14 @@ def local_css(file_name):
 local_css("style.css")  # Create a style.css file in the same directory
 
 # History directory setup
-HISTORY_DIR = "chat_history"
 os.makedirs(HISTORY_DIR, exist_ok=True)
 
 # Initialize Gemini using environment variable
 def initialize_gemini():
-    api_key = os.getenv("GOOGLE_API_KEY")
+    api_key = gemini_gateway.api_key()
     if not api_key:
         raise ValueError("No GEMINI_API_KEY found in environment variables")
-    
-    genai.configure(api_key=api_key)
-    
-    # Get model name from .env or default to gemini-1.5-flash
-    model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
-    return genai.GenerativeModel(model_name)
+    return get_image_model()
 
 # Function to display image with animation
 def display_image(image):
@@ -50,75 +37,6 @@ def display_image(image):
     with col2:
         st.image(image, caption="Uploaded Image", use_column_width=True)
 
-# Function to get image description
-def get_image_description(model, image):
-    with st.spinner('Analyzing image...'):
-        img_bytes = BytesIO()
-        image.save(img_bytes, format="PNG")
-        img_data = base64.b64encode(img_bytes.getvalue()).decode()
-        
-        response = model.generate_content([
-            "Describe this image in detail. Include objects, colors, actions, and any text present.",
-            {"mime_type": "image/png", "data": img_data}
-        ])
-        return response.text
-
-# Function to answer questions
-def answer_question(model, image, question, history):
-    with st.spinner('Generating answer...'):
-        img_bytes = BytesIO()
-        image.save(img_bytes, format="PNG")
-        img_data = base64.b64encode(img_bytes.getvalue()).decode()
-        
-        # Include chat history for context
-        context = "\n".join([f"Q: {q}\nA: {a}" for q, a in history])
-        
-        prompt = f"""
-        Context from previous conversation:
-        {context}
-        
-        New question: {question}
-        
-        Answer the question based on the image and previous context.
-        """
-        
-        response = model.generate_content([
-            prompt,
-            {"mime_type": "image/png", "data": img_data}
-        ])
-        return response.text
-
-# Function to save conversation to history
-def save_to_history(description, history, image_name=None):
-    if not image_name:
-        image_name = f"image_{int(time.time())}"
-    
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"{HISTORY_DIR}/{image_name}_{timestamp}.json"
-    
-    data = {
-        "image_name": image_name,
-        "timestamp": timestamp,
-        "description": description,
-        "conversation": history
-    }
-    
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
-    
-    return filename
-
-# Function to load history files
-def load_history_files():
-    files = glob.glob(f"{HISTORY_DIR}/*.json")
-    files.sort(key=os.path.getmtime, reverse=True)
-    return files
-
-# Function to load a specific history file
-def load_history_file(filename):
-    with open(filename, 'r') as f:
-        return json.load(f)
-
 # Function to display history in sidebar
 def display_history_sidebar():
     with st.sidebar:
@@ -133,7 +51,7 @@ def display_history_sidebar():
         selected_file = st.selectbox(
             "Select a past conversation:",
             options=history_files,
-            format_func=lambda x: os.path.basename(x).replace('.json', ''),
+            format_func=lambda x: os.path.splitext(os.path.basename(x))[0],
             key="history_selector"
         )
         
@@ -144,6 +62,7 @@ def display_history_sidebar():
 
 # Main app function
 def main():
+    accounting.use_streamlit_session("imageanalyser")
     # Sidebar with dark theme
     with st.sidebar:
         st.title("🔑 Menu")
@@ -211,6 +130,8 @@ def main():
     
     if uploaded_file is not None:
         try:
+            from PIL import Image
+
             image = Image.open(uploaded_file)
             image_name = uploaded_file.name.split('.')[0]  # Get filename without extension
             
@@ -222,7 +143,8 @@ def main():
                 st.session_state.history = []
             
             if 'description' not in st.session_state:
-                st.session_state.description = get_image_description(model, image)
+                with accounting.scope(feature="describe_image"), st.spinner('Analyzing image...'):
+                    st.session_state.description = get_image_description(model, image)
             
             # Display description in an expandable section
             with st.expander("📝 Image Description", expanded=True):
@@ -256,7 +178,8 @@ def main():
                     st.markdown(question)
                 
                 # Get and display answer
-                answer = answer_question(model, image, question, st.session_state.history)
+                with accounting.scope(feature="ask_about_image"), st.spinner('Generating answer...'):
+                    answer = answer_question(model, image, question, st.session_state.history)
                 
                 with st.chat_message("assistant"):
                     st.markdown(answer)
@@ -264,12 +187,14 @@ def main():
                 # Update history
                 st.session_state.history.append((question, answer))
                 
-                # Save to history after each question
-                save_to_history(
-                    st.session_state.description,
-                    st.session_state.history,
-                    image_name
-                )
+                # Append the new turn to this conversation's log
+                writer = get_history_writer()
+                if 'history_path' not in st.session_state:
+                    st.session_state.history_path = writer.start_session(
+                        image_name or f"image_{int(time.time())}",
+                        st.session_state.description
+                    )
+                writer.append_turn(st.session_state.history_path, question, answer)
                 
         except Exception as e:
             st.error(f"Error processing image: {e}")
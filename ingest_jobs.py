@@ -0,0 +1,445 @@
+"""Background PDF ingestion: a persistent job table and worker processes.
+
+"Submit & Process" used to extract, chunk and embed inside the Streamlit
+script run, freezing the session for minutes and losing the work if the
+browser disconnected. Now the uploaded files are written to disk and a job
+row is queued in a SQLite table (WAL mode, shared by every process); worker
+processes claim jobs one at a time, report progress back to the row
+(pages are extracted, chunked and embedded as a stream, then the index is
+saved), and honour cancellation between pages. Each job builds a named
+collection: a FAISS index written to its own version directory,
+collections/<name>/v<job id>/, and published by atomically replacing the
+collection's CURRENT pointer file. Readers always find a complete index, the
+one they were serving stays on disk while they switch, and two jobs for the
+same collection run one after the other, in submission order.
+
+Workers normally start from the app (`ensure_workers`), but can also run on
+their own:
+
+    python ingest_jobs.py --workers 2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+JOBS_FILE = "ingest_jobs.db"
+UPLOAD_DIR = "ingest_uploads"
+COLLECTIONS_DIR = "collections"
+TEXT_FILE = "text.txt"  # extracted text kept next to each index, for sentiment analysis
+CURRENT_FILE = "CURRENT"  # names a collection's live version directory
+DEFAULT_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+EMBED_BATCH = 32  # chunks embedded per progress update / cancellation check
+POLL_INTERVAL = 1.0
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+# Overall progress at the start of each stage; "index" extracts, chunks and embeds page by page
+STAGES = {"index": 0.0, "save": 0.95}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    files TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+_COLUMNS = ("id", "collection", "files", "status", "stage", "progress", "message",
+            "cancel_requested", "worker_pid", "created_at", "updated_at")
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when the job's cancel flag is set."""
+
+
+def safe_collection_name(name):
+    """Collection names become directory names."""
+    name = re.sub(r"[^\w.-]+", "_", name.strip()).strip("._")
+    return name[:64] or "default"
+
+
+class JobQueue:
+    """The job table; safe to use from any thread or process."""
+
+    def __init__(self, path=JOBS_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        job["files"] = json.loads(job["files"])
+        return job
+
+    def submit(self, collection, files, upload_dir=UPLOAD_DIR):
+        """Queue a job for `files` ([(filename, bytes)]); returns the job id."""
+        collection = safe_collection_name(collection)
+        job_dir = os.path.join(upload_dir, uuid.uuid4().hex)
+        os.makedirs(job_dir, exist_ok=True)
+        paths = []
+        for i, (name, data) in enumerate(files):
+            path = os.path.join(job_dir, f"{i:03d}_{os.path.basename(name) or 'upload.pdf'}")
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO jobs (collection, files, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (collection, json.dumps(paths), QUEUED, now, now),
+        )
+        return cur.lastrowid
+
+    def get(self, job_id):
+        row = self._conn().execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row)
+
+    def list(self, ids=None, limit=20):
+        """Most recent jobs first, optionally only the given ids."""
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+        params = ()
+        if ids is not None:
+            ids = list(ids)
+            if not ids:
+                return []
+            sql += f" WHERE id IN ({', '.join('?' * len(ids))})"
+            params = tuple(ids)
+        rows = self._conn().execute(sql + " ORDER BY id DESC LIMIT ?", params + (limit,)).fetchall()
+        return [self._row(r) for r in rows]
+
+    def cancel(self, job_id):
+        """Cancel a queued job now, or ask its worker to stop at the next step."""
+        conn = self._conn()
+        now = time.time()
+        cur = conn.execute(
+            "UPDATE jobs SET status = ?, message = 'cancelled before start', updated_at = ? "
+            "WHERE id = ? AND status = ?",
+            (CANCELLED, now, job_id, QUEUED),
+        )
+        if cur.rowcount:
+            files = self.get(job_id)["files"]
+            if files:
+                shutil.rmtree(os.path.dirname(files[0]), ignore_errors=True)
+        conn.execute(
+            "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status = ?",
+            (now, job_id, RUNNING),
+        )
+
+    def claim(self, pid):
+        """Atomically take the oldest queued job; returns it or None.
+
+        Jobs for a collection run one at a time, in submission order, so a
+        collection is only ever published by one job at a time and a newer
+        upload is never overwritten by an older one that finished later.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status = ? "
+                "AND collection NOT IN (SELECT collection FROM jobs WHERE status = ?) ORDER BY id LIMIT 1",
+                (QUEUED, RUNNING),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker_pid = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, pid, time.time(), row[0]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self._row(row)
+
+    def progress(self, job_id, stage, fraction=0.0, message=None):
+        """Record progress within a stage; raises JobCancelled if cancellation was requested."""
+        stages = list(STAGES)
+        start = STAGES[stage]
+        nxt = stages.index(stage) + 1
+        end = STAGES[stages[nxt]] if nxt < len(stages) else 1.0
+        conn = self._conn()
+        conn.execute(
+            "UPDATE jobs SET stage = ?, progress = ?, message = ?, updated_at = ? WHERE id = ?",
+            (stage, start + (end - start) * fraction, message, time.time(), job_id),
+        )
+        cancelled = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if cancelled and cancelled[0]:
+            raise JobCancelled()
+
+    def finish(self, job_id, status, message=None):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END, "
+            "message = ?, updated_at = ? WHERE id = ?",
+            (status, status, message, time.time(), job_id),
+        )
+
+    def requeue_orphans(self):
+        """Put running jobs whose worker process is gone back in the queue."""
+        rows = self._conn().execute("SELECT id, worker_pid FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+        for job_id, pid in rows:
+            if not _pid_alive(pid):
+                self._conn().execute(
+                    "UPDATE jobs SET status = ?, worker_pid = NULL, message = 'requeued after worker exit', "
+                    "updated_at = ? WHERE id = ? AND status = ?",
+                    (QUEUED, time.time(), job_id, RUNNING),
+                )
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collection_root(name, root=COLLECTIONS_DIR):
+    return os.path.join(root, safe_collection_name(name))
+
+
+def _current_version(base):
+    try:
+        with open(os.path.join(base, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def collection_dir(name, root=COLLECTIONS_DIR):
+    """Directory of a collection's live index (index.faiss, index.pkl and TEXT_FILE)."""
+    base = collection_root(name, root)
+    version = _current_version(base)
+    return os.path.join(base, version) if version else base  # unversioned collections kept the index in base
+
+
+def list_collections(root=COLLECTIONS_DIR):
+    """Names of collections with a complete index, newest first."""
+    if not os.path.isdir(root):
+        return []
+    names = [n for n in os.listdir(root) if os.path.exists(os.path.join(collection_dir(n, root), "index.faiss"))]
+    return sorted(names, key=lambda n: os.path.getmtime(collection_dir(n, root)), reverse=True)
+
+
+def collection_version(name, root=COLLECTIONS_DIR):
+    """Changes whenever the collection's index is replaced; use as a cache key."""
+    base = collection_root(name, root)
+    version = _current_version(base)
+    if version:
+        return version
+    try:
+        return os.path.getmtime(os.path.join(base, "index.faiss"))
+    except OSError:
+        return None
+
+
+def _version_number(version):
+    try:
+        return int(version[1:])
+    except (TypeError, ValueError):
+        return -1
+
+
+def _publish(base, version):
+    """Make a finished version directory the live one: a single atomic replace of the pointer file.
+
+    Callers publish one at a time per collection (see `JobQueue.claim`).
+    CURRENT only moves forward: a version older than the live one is
+    discarded instead.
+    """
+    previous = _current_version(base)
+    if previous is not None and _version_number(previous) > _version_number(version):
+        shutil.rmtree(os.path.join(base, version), ignore_errors=True)
+        return
+    tmp = os.path.join(base, f"{CURRENT_FILE}.{version}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(base, CURRENT_FILE))
+    # Keep the version readers may still be loading; drop older finished ones, and the unversioned
+    # layout once a versioned index has been live for a whole job
+    for entry in os.listdir(base):
+        if entry.startswith("v") and not entry.endswith(".tmp") and entry not in (version, previous):
+            shutil.rmtree(os.path.join(base, entry), ignore_errors=True)
+    if previous is not None:
+        for legacy in ("index.faiss", "index.pkl", TEXT_FILE):
+            try:
+                os.remove(os.path.join(base, legacy))
+            except OSError:
+                pass
+
+
+def _embed_batch(store, chunks, embeddings, faiss):
+    texts, metadatas = [c.text for c in chunks], [c.metadata for c in chunks]
+    if store is None:
+        return faiss.from_texts(texts, embedding=embeddings, metadatas=metadatas)
+    store.add_texts(texts, metadatas=metadatas)
+    return store
+
+
+def run_job(queue, job, root=COLLECTIONS_DIR):
+    """Ingest one job's files into its collection, reporting progress as it goes."""
+    from langchain_community.vectorstores import FAISS
+
+    import gemini_gateway
+    from analysers import pdf_qa
+    from analysers.chunking import chunk_pages, iter_pdf_pages
+
+    job_id, files = job["id"], job["files"]
+    texts = []
+    stats = []  # analysers.ocr.DocumentStats per file
+    embedded = 0
+    store = None
+    embeddings = gemini_gateway.get_embeddings(pdf_qa.EMBEDDING_MODEL)
+
+    def pages():
+        # Pages stream from the PDFs into the chunker; each one reports progress and checks for cancellation
+        for i, path in enumerate(files):
+            name = os.path.basename(path)
+            for page in iter_pdf_pages([path], on_error=lambda pdf, e: print(f"ingest: {pdf}: {e}"),
+                                       on_stats=stats.append):
+                ocr = " (OCR)" if page.method == "ocr" else ""
+                queue.progress(job_id, "index", (i + page.number / page.count) / len(files),
+                               f"{name} page {page.number}/{page.count}{ocr}, {embedded} chunks embedded")
+                texts.append(page.text)
+                yield page._replace(source=name.split("_", 1)[-1])
+
+    batch = []
+    for chunk in chunk_pages(pages()):
+        batch.append(chunk)
+        if len(batch) < EMBED_BATCH:
+            continue
+        store = _embed_batch(store, batch, embeddings, FAISS)
+        embedded += len(batch)
+        batch = []
+    if batch:
+        store = _embed_batch(store, batch, embeddings, FAISS)
+        embedded += len(batch)
+    text = "".join(texts)
+    if store is None:
+        raise ValueError("no text could be extracted; the PDFs may be empty, or OCR of scanned pages failed")
+
+    queue.progress(job_id, "save")
+    base = collection_root(job["collection"], root)
+    version = f"v{job_id}"
+    tmp_dir = os.path.join(base, f"{version}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)  # left by an attempt whose worker died
+    try:
+        store.save_local(tmp_dir)
+        with open(os.path.join(tmp_dir, TEXT_FILE), "w", encoding="utf-8") as f:
+            f.write(text)
+        if os.path.isdir(os.path.join(base, version)):
+            shutil.rmtree(tmp_dir)  # an earlier attempt got as far as the rename; its index is the same
+        else:
+            os.replace(tmp_dir, os.path.join(base, version))  # a new name, so the rename is atomic
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _publish(base, version)
+    result = f"{embedded} chunks from {len(files)} file(s)"
+    ocr_pages = sum(s.ocr_pages for s in stats)
+    return f"{result}, {ocr_pages} scanned page(s) transcribed" if ocr_pages else result
+
+
+def worker_loop(path=JOBS_FILE, root=COLLECTIONS_DIR, stop_when_idle=False):
+    """Claim and run jobs until killed (or until the queue is empty if `stop_when_idle`)."""
+    queue = JobQueue(path)
+    pid = os.getpid()
+    while True:
+        job = queue.claim(pid)
+        if job is None:
+            if stop_when_idle:
+                return
+            time.sleep(POLL_INTERVAL)
+            continue
+        try:
+            message = run_job(queue, job, root)
+        except JobCancelled:
+            queue.finish(job["id"], CANCELLED, "cancelled")
+        except Exception as e:
+            queue.finish(job["id"], FAILED, f"{type(e).__name__}: {e}")
+        else:
+            queue.finish(job["id"], DONE, message)
+        if job["files"]:
+            shutil.rmtree(os.path.dirname(job["files"][0]), ignore_errors=True)
+
+
+_workers = []
+_workers_lock = threading.Lock()
+_queue = None
+
+
+def get_job_queue():
+    """Process-wide JobQueue."""
+    global _queue
+    with _workers_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+
+def ensure_workers(n=DEFAULT_WORKERS):
+    """Start `n` worker processes for this server process, replacing any that died."""
+    queue = get_job_queue()
+    # Spawned, not forked: the parent is a multi-threaded Streamlit server
+    ctx = multiprocessing.get_context("spawn")
+    with _workers_lock:
+        _workers[:] = [p for p in _workers if p.is_alive()]
+        if len(_workers) < n:
+            queue.requeue_orphans()
+        while len(_workers) < n:
+            process = ctx.Process(target=worker_loop, name="ingest-worker", daemon=True)
+            process.start()
+            _workers.append(process)
+    return queue
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF ingestion workers")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    parser.add_argument("--status", action="store_true", help="list recent jobs and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        for job in JobQueue().list(limit=50):
+            print(f"#{job['id']:<5} {job['collection']:<24} {job['status']:<10} "
+                  f"{job['stage'] or '':<8} {job['progress']:>4.0%}  {job['message'] or ''}")
+    else:
+        JobQueue().requeue_orphans()
+        processes = [
+            multiprocessing.Process(target=worker_loop, kwargs={"stop_when_idle": args.once})
+            for _ in range(args.workers)
+        ]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
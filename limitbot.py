@@ -1,39 +1,89 @@
-from dotenv import load_dotenv
-load_dotenv() ## loading all the environment variables
-
 import streamlit as st
-import os
-import google.generativeai as genai
+import threading
+import time
+import uuid
+import accounting
+import gemini_gateway
+from answer_cache import AnswerCache
+from chat_sessions import ChatSessionManager
+from question_log import get_question_log, load_logged_questions
+from streaming import render_stream, show_stream_timings
+from topic_classifier import ACCEPT, REJECT, OUT_OF_CONTEXT_REPLY, build_default_classifier
+from tracing import trace
+
+MODEL = "gemini-2.0-flash"
 
-# Configure generative AI
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+@st.cache_resource
+def get_chat_manager():
+    """One bounded chat per visitor instead of a single module-level chat."""
+    return ChatSessionManager(gemini_gateway.get_model(MODEL))
 
-# Function to load Gemini Pro model and get responses
-model = genai.GenerativeModel("gemini-2.0-flash")
-chat = model.start_chat(history=[])
+def get_chat():
+    return get_chat_manager().get_chat(st.session_state['session_id'])
 
 def get_gemini_response(question):
-    response = chat.send_message(question, stream=True)
+    response = gemini_gateway.send_message(get_chat(), question, stream=True)
     return response
 
-# Function to determine if the question is IT-related and respond if it is
-def handle_it_question(question):
-    classification_prompt = (
+@st.cache_resource
+def get_topic_classifier():
+    """Build the local IT-topic classifier once per process."""
+    return build_default_classifier(load_logged_questions())
+
+def build_prompt(question, verdict):
+    """Prompt for an accepted question, or the classify-and-answer prompt."""
+    if verdict == ACCEPT:
+        return (
+            "You are an AI expert in the IT field. Provide a detailed response to the following question.\n\n"
+            f"Question: {question}\n"
+        )
+    return (
         "You are an AI expert. Determine if the following question is related to the IT field, "
         "which includes areas such as AI, ML, software development, web development, networking, data science, etc. "
         "If it is IT-related, provide a detailed response. If not, say 'Sorry, out of context question.'\n\n"
         f"Question: {question}\n"
     )
-    response = chat.send_message(classification_prompt, stream=True)
-    final_response = ""
-    for chunk in response:
-        final_response += chunk.text
-    return final_response
+
+def answer_faq(question, classifier):
+    """Stateless answer used to pre-warm the cache outside any chat session."""
+    verdict = classifier.classify(question)
+    if verdict == REJECT:
+        return OUT_OF_CONTEXT_REPLY
+    with accounting.scope(app="limitbot", feature="prewarm"):
+        return gemini_gateway.generate_content(build_prompt(question, verdict), model=MODEL).text
+
+@st.cache_resource
+def get_answer_cache():
+    """Process-wide FAQ cache, pre-warmed in the background from the question log."""
+    cache = AnswerCache()
+    classifier = get_topic_classifier()
+    threading.Thread(
+        target=cache.prewarm,
+        args=(load_logged_questions(), lambda q: answer_faq(q, classifier)),
+        daemon=True,
+    ).start()
+    return cache
+
+# Function to determine if the question is IT-related and respond if it is
+@trace("handle_it_question")
+def handle_it_question(question):
+    """Render the answer as it streams; return (answer, local verdict, StreamResult or None)."""
+    # Settle clear cases locally; only ambiguous questions need the LLM to classify
+    verdict = get_topic_classifier().classify(question)
+    if verdict == REJECT:
+        st.write(OUT_OF_CONTEXT_REPLY)
+        return OUT_OF_CONTEXT_REPLY, verdict, None
+    start = time.perf_counter()
+    response = gemini_gateway.send_message(get_chat(), build_prompt(question, verdict), stream=True)
+    result = render_stream(response, start)
+    # Keep only the bare question in history, not the long classification prompt
+    get_chat_manager().compact_last_turn(st.session_state['session_id'], question)
+    return result.text, verdict, result
 
 # Function to log user questions
-def log_question(question):
-    with open("abc.txt", "a") as log_file:
-        log_file.write(question + "\n")
+def log_question(question, **fields):
+    """Queue a structured record for the background question log."""
+    get_question_log().log(question, session=st.session_state['session_id'], **fields)
 
 # Initialize Streamlit app
 st.set_page_config(page_title="Q&A Demo")
@@ -42,19 +92,55 @@ st.header("Gemini LLM Application")
 # Initialize session state for chat history if it doesn't exist
 if 'chat_history' not in st.session_state:
     st.session_state['chat_history'] = []
+if 'session_id' not in st.session_state:
+    st.session_state['session_id'] = uuid.uuid4().hex
+accounting.use_streamlit_session("limitbot")
 
 input = st.text_input("Input: ", key="input")
 submit = st.button("Ask the question")
 
 if submit and input:
-    log_question(input)  # Log the user's question
-
-    response = handle_it_question(input)
+    # Later turns depend on this visitor's conversation ("why?"), so only opening questions are cached
+    first_turn = not st.session_state['chat_history']
     st.session_state['chat_history'].append(("You", input))
     st.subheader("The Response is")
-    st.write(response)
+
+    cache = get_answer_cache()
+    start = time.perf_counter()
+    response = cache.get(input) if first_turn else None
+    if response is not None:
+        st.write(response)
+        get_chat_manager().record_turn(st.session_state['session_id'], input, response)
+        log_question(input, cache_hit=True, latency=time.perf_counter() - start)
+    else:
+        try:
+            with accounting.scope(feature="ask"):
+                response, verdict, stream = handle_it_question(input)
+        except accounting.BudgetExceeded as e:
+            st.warning(f"Request not sent: {e}")
+            st.stop()
+        latency = time.perf_counter() - start
+        if first_turn:
+            cache.put(input, response, latency)
+        usage = stream.usage if stream else None
+        log_question(
+            input,
+            classification=verdict,
+            latency=latency,
+            ttft_ms=round(stream.ttft * 1000, 1) if stream else None,
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            output_tokens=getattr(usage, "candidates_token_count", None),
+        )
     st.session_state['chat_history'].append(("Bot", response))
 
+stats = get_answer_cache().stats()
+st.sidebar.caption(
+    f"FAQ cache: {stats['hits']} hits / {stats['misses']} misses "
+    f"({stats['hit_ratio']:.0%}), {stats['latency_saved_s']:.1f}s of model time saved"
+)
+show_stream_timings()
+accounting.show_session_usage()
+
 st.subheader("The Chat History is")
 for role, text in st.session_state['chat_history']:
     st.write(f"{role}: {text}")
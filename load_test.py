@@ -0,0 +1,400 @@
+"""Concurrent-user load test against the local stub Gemini server.
+
+    python load_test.py --sessions 1 5 10 25 50 --duration 30
+    python load_test.py --sessions 10 --latency 0.5 --error-rate 0.05 --json report.json
+    python load_test.py --sessions 1 10 50 --json new.json --compare old.json
+
+Each simulated session is a thread in this process, as Streamlit runs one
+script thread per visitor, looping over realistic flows through the same
+code the apps use (analysers, gemini_gateway, accounting, caches):
+
+- pdf:     upload a generated multi-page PDF (extract, chunk, embed into an
+           in-memory FAISS index), then ask a few questions about it
+- invoice: a batch of generated invoice images, one question each
+- image:   describe an image, then a few follow-up questions with history
+- event:   questions about an event, through the FAQ and response caches
+
+All model and embedding calls go to stub_gemini_server with the given latency,
+jitter, per-chunk delay and error rate. For every session count the report
+has throughput, p50/p95/p99 latency (overall, per flow and per operation),
+failure rates and resident memory (peak, and growth per session), printed as
+a table and optionally written as JSON for comparison between versions.
+The usage ledger and the event and artifact databases go to a temporary
+directory, so a run starts cold and leaves the working directory alone.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+FLOWS = ("pdf", "invoice", "image", "event")
+WORDS = (
+    "warranty invoice delivery contract payment supplier customer schedule report revenue budget quarter "
+    "policy security network server storage backup license renewal support ticket incident release audit "
+    "compliance training onboarding vendor shipment order quantity discount total tax period clause"
+).split()
+QUESTIONS = (
+    "What is the warranty period?", "Who is the supplier?", "What is the total amount?",
+    "When is the payment due?", "Summarise the main obligations.", "Which risks are mentioned?",
+)
+EVENT_QUESTIONS = (
+    "When does the event start?", "Where is the venue?", "Is there a registration fee?",
+    "Who can participate?", "What are the prizes?", "Is food provided?",
+)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list (q in 0..100)."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def rss_bytes():
+    """Current resident set size of this process (Linux; 0 elsewhere)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+# --- synthetic inputs -------------------------------------------------------
+
+def _paragraphs(rng, n, words=80):
+    return [" ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "." for _ in range(n)]
+
+
+def make_pdf(pages):
+    """A minimal text PDF (Helvetica), one list of lines per page."""
+    objects = {1: "<< /Type /Catalog /Pages 2 0 R >>", 3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for i, lines in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        escaped = (line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines)
+        stream = "BT /F1 10 Tf 40 760 Td 12 TL " + " ".join(f"({line}) Tj T*" for line in escaped) + " ET"
+        objects[content_id] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+        objects[page_id] = (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        kids.append(f"{page_id} 0 R")
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = out.tell()
+        out.write(f"{number} 0 obj\n{objects[number]}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    count = max(objects) + 1
+    out.write(f"xref\n0 {count}\n0000000000 65535 f \n".encode())
+    for number in range(1, count):
+        out.write(f"{offsets.get(number, 0):010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def make_document(rng, pages=6):
+    """PDF bytes with `pages` pages of generated text, wrapped to the page width."""
+    page_lines = []
+    for _ in range(pages):
+        lines = []
+        for paragraph in _paragraphs(rng, 5):
+            words, line = paragraph.split(), ""
+            for word in words:
+                if len(line) + len(word) > 95:
+                    lines.append(line)
+                    line = ""
+                line = f"{line} {word}".strip()
+            lines.append(line)
+        page_lines.append(lines[:60])
+    return make_pdf(page_lines)
+
+
+def make_image(rng, lines=8, size=(800, 600), format="PNG"):
+    """Image bytes with a few lines of text on it, like a scanned invoice."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for i in range(lines):
+        draw.text((30, 30 + i * 40), f"{rng.choice(WORDS).title()} {rng.randint(1, 999)}.{rng.randint(0, 99):02d}",
+                  fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+# --- flows ------------------------------------------------------------------
+
+class Recorder:
+    """Thread-safe list of (flow, op, seconds, ok, error) samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []
+
+    def time(self, flow, op, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._add(flow, op, time.perf_counter() - start, False, f"{type(e).__name__}: {e}")
+            raise
+        self._add(flow, op, time.perf_counter() - start, True, None)
+        return result
+
+    def _add(self, flow, op, seconds, ok, error):
+        with self._lock:
+            self.samples.append((flow, op, seconds, ok, error))
+
+
+def pdf_flow(rec, rng, questions=3):
+    from analysers import pdf_qa
+
+    pdf = make_document(rng)
+    text = rec.time("pdf", "extract", pdf_qa.get_pdf_text, [io.BytesIO(pdf)])
+    chunks = rec.time("pdf", "chunk", pdf_qa.get_text_chunks, text, 2000, 200)
+    store = rec.time("pdf", "embed", pdf_qa.get_vector_store, chunks, None)
+    for question in rng.sample(QUESTIONS, questions):
+        rec.time("pdf", "question", pdf_qa.answer_question, question, store)
+
+
+def invoice_flow(rec, rng, batch=3):
+    from analysers.invoice import extract_invoice
+
+    for _ in range(batch):
+        image = make_image(rng)
+        rec.time("invoice", "extract", extract_invoice, image, "image/png", rng.choice(QUESTIONS))
+
+
+def image_flow(rec, rng, turns=3):
+    from PIL import Image
+
+    from analysers.image import answer_question, get_image_description, get_image_model
+
+    image = Image.open(io.BytesIO(make_image(rng, lines=4, size=(640, 480))))
+    model = get_image_model()
+    rec.time("image", "describe", get_image_description, model, image)
+    history = []
+    for question in rng.sample(QUESTIONS, turns):
+        answer = rec.time("image", "question", answer_question, model, image, question, history)
+        history.append((question, answer))
+
+
+def event_flow(rec, rng, questions=3):
+    from analysers.events import answer_event_question
+
+    event = rng.choice(EVENTS)
+    for question in rng.sample(EVENT_QUESTIONS, questions):
+        rec.time("event", "question", answer_event_question, event[0], question, event[1])
+
+
+FLOW_FUNCS = {"pdf": pdf_flow, "invoice": invoice_flow, "image": image_flow, "event": event_flow}
+EVENTS = [
+    (f"Event {i}", " ".join(_paragraphs(random.Random(i), 12)))
+    for i in range(5)
+]
+
+
+def session(rec, seed, deadline, flows, weights):
+    import accounting
+
+    rng = random.Random(seed)
+    accounting.set_scope(app="loadtest", session=f"loadtest-{seed}")
+    while time.perf_counter() < deadline:
+        flow = rng.choices(flows, weights)[0]
+        with accounting.scope(feature=flow):
+            try:
+                rec.time(flow, "flow", FLOW_FUNCS[flow], rec, rng)
+            except Exception:
+                pass  # already recorded; carry on like a user retrying
+
+
+def run_level(sessions, duration, flows, weights, seed=0):
+    """Run `sessions` concurrent sessions for `duration` seconds; returns the level's report."""
+    rec = Recorder()
+    baseline_rss = peak_rss = rss_bytes()
+    done = threading.Event()
+
+    def sample_memory():
+        nonlocal peak_rss
+        while not done.wait(0.2):
+            peak_rss = max(peak_rss, rss_bytes())
+
+    sampler = threading.Thread(target=sample_memory, name="loadtest-rss", daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [
+        threading.Thread(target=session, args=(rec, seed * 100_000 + i, deadline, flows, weights),
+                         name=f"loadtest-session-{i}")
+        for i in range(sessions)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    peak_rss = max(peak_rss, rss_bytes())
+    return summarise(rec.samples, sessions, elapsed, baseline_rss, peak_rss)
+
+
+def _stats(samples, elapsed):
+    latencies = [s[2] for s in samples if s[3]]
+    failed = sum(1 for s in samples if not s[3])
+    stats = {
+        "count": len(samples),
+        "failed": failed,
+        "failure_rate": round(failed / len(samples), 4) if samples else 0.0,
+        "throughput_per_s": round(len(samples) / elapsed, 3) if elapsed else 0.0,
+    }
+    if latencies:
+        stats.update({
+            "mean_s": round(sum(latencies) / len(latencies), 4),
+            "p50_s": round(percentile(latencies, 50), 4),
+            "p95_s": round(percentile(latencies, 95), 4),
+            "p99_s": round(percentile(latencies, 99), 4),
+        })
+    return stats
+
+
+def summarise(samples, sessions, elapsed, baseline_rss, peak_rss):
+    flows = [s for s in samples if s[1] == "flow"]
+    ops = [s for s in samples if s[1] != "flow"]
+    by_flow, by_op, errors = defaultdict(list), defaultdict(list), defaultdict(int)
+    for s in flows:
+        by_flow[s[0]].append(s)
+    for s in ops:
+        by_op[f"{s[0]}.{s[1]}"].append(s)
+        if s[4]:
+            errors[s[4][:200]] += 1
+    return {
+        "sessions": sessions,
+        "elapsed_s": round(elapsed, 2),
+        "flows": _stats(flows, elapsed),
+        "operations": _stats(ops, elapsed),
+        "by_flow": {k: _stats(v, elapsed) for k, v in sorted(by_flow.items())},
+        "by_operation": {k: _stats(v, elapsed) for k, v in sorted(by_op.items())},
+        "memory": {
+            "baseline_mb": round(baseline_rss / 2**20, 1),
+            "peak_mb": round(peak_rss / 2**20, 1),
+            "per_session_mb": round((peak_rss - baseline_rss) / 2**20 / sessions, 2) if sessions else 0.0,
+        },
+        "top_errors": dict(sorted(errors.items(), key=lambda kv: -kv[1])[:5]),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_level(level):
+    ops = level["operations"]
+    print(
+        f"{level['sessions']:>5} sessions  {ops['throughput_per_s']:8.2f} ops/s  "
+        f"p50 {ops.get('p50_s', 0):6.3f}s  p95 {ops.get('p95_s', 0):6.3f}s  p99 {ops.get('p99_s', 0):6.3f}s  "
+        f"failed {ops['failure_rate']:6.1%}  peak RSS {level['memory']['peak_mb']:7.1f} MB "
+        f"(+{level['memory']['per_session_mb']:.2f} MB/session)"
+    )
+    for name, stats in level["by_operation"].items():
+        print(f"        {name:<18} n={stats['count']:<6} p50 {stats.get('p50_s', 0):6.3f}s  "
+              f"p95 {stats.get('p95_s', 0):6.3f}s  failed {stats['failure_rate']:6.1%}")
+
+
+def compare(report, previous):
+    """Print p95 latency, throughput and failure-rate changes per matching session count."""
+    before = {level["sessions"]: level for level in previous.get("levels", [])}
+    print(f"\ncompared with {previous.get('config', {}).get('revision') or 'previous report'}:")
+    for level in report["levels"]:
+        old = before.get(level["sessions"])
+        if old is None:
+            continue
+        new_ops, old_ops = level["operations"], old["operations"]
+        p95_new, p95_old = new_ops.get("p95_s", 0), old_ops.get("p95_s", 0)
+        change = f"{(p95_new - p95_old) / p95_old:+.0%}" if p95_old else "n/a"
+        print(f"{level['sessions']:>5} sessions  p95 {p95_old:.3f}s -> {p95_new:.3f}s ({change})  "
+              f"throughput {old_ops['throughput_per_s']:.2f} -> {new_ops['throughput_per_s']:.2f} ops/s  "
+              f"failed {old_ops['failure_rate']:.1%} -> {new_ops['failure_rate']:.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-session load test against the stub Gemini server")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 25], help="session counts to step through")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per session count")
+    parser.add_argument("--flows", nargs="+", default=list(FLOWS), choices=FLOWS)
+    parser.add_argument("--weights", type=float, nargs="+", help="relative frequency of each flow")
+    parser.add_argument("--latency", type=float, default=0.3, help="stub base latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.3, help="stub latency jitter (fraction)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="stub delay between streamed chunks (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub fraction of 503 replies")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="write the report as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+    if args.weights and len(args.weights) != len(args.flows):
+        parser.error("--weights needs one value per flow")
+
+    from stub_gemini_server import start_stub_server
+
+    stub = dict(latency=args.latency, jitter=args.jitter, token_delay=args.token_delay,
+                error_rate=args.error_rate, seed=args.seed)
+    server, url = start_stub_server(**stub)
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ["GEMINI_API_ENDPOINT"] = url
+    os.environ.setdefault("GEMINI_USAGE_LOG", os.path.join(workdir, "usage_ledger.jsonl"))
+    # Nothing in the working directory is touched: fresh event and artifact databases per run
+    os.environ.setdefault("EVENTS_DB", os.path.join(workdir, "events.db"))
+    os.environ.setdefault("ARTIFACT_CACHE_DB", os.path.join(workdir, "artifact_cache.db"))
+
+    report = {
+        "config": {
+            "revision": _git_revision(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "duration_s": args.duration,
+            "flows": dict(zip(args.flows, args.weights or [1.0] * len(args.flows))),
+            "stub": stub,
+            "gateway": {k: os.getenv(k) for k in ("GEMINI_MAX_CONCURRENCY", "GEMINI_RATE_PER_SECOND",
+                                                  "GEMINI_BURST", "GEMINI_HEDGE_AFTER", "GEMINI_SINGLEFLIGHT")},
+            "python": sys.version.split()[0],
+        },
+        "levels": [],
+    }
+    try:
+        for i, sessions in enumerate(args.sessions):
+            level = run_level(sessions, args.duration, args.flows, args.weights or [1.0] * len(args.flows),
+                              seed=args.seed + i)
+            report["levels"].append(level)
+            print_level(level)
+    finally:
+        server.shutdown()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import os
 import json
 import streamlit as st
-import google.generativeai as genai
-from event_response import get_event_response,EVENTS_FILE,load_events_from_file
+import accounting
+from event_cache import get_event_cache
+from event_response import get_cached_event_response,EVENTS_FILE,load_events_from_file
 
 # Load environment variables
 
@@ -10,6 +11,7 @@ from event_response import get_event_response,EVENTS_FILE,load_events_from_file
 def public_page():
     """Public page for event-specific Q&A."""
     st.title("Event Q&A Bot")
+    accounting.use_streamlit_session("public")
 
     # Load events
     events = load_events_from_file()
@@ -23,12 +25,24 @@ def public_page():
 
     if st.button("Submit Question"):
         if question:
-            response = get_event_response(events[selected_event], question)
+            try:
+                with accounting.scope(feature="event_question"):
+                    response = get_cached_event_response(selected_event, events[selected_event], question)
+            except accounting.BudgetExceeded as e:
+                st.warning(f"Request not sent: {e}")
+                return
             st.subheader("Response")
             st.write(response)
         else:
             st.error("Please enter a question.")
 
+    event_stats = get_event_cache().stats().get(selected_event)
+    if event_stats:
+        st.sidebar.caption(
+            f"Answer cache for this event: {event_stats['hits']} hits / {event_stats['misses']} misses "
+            f"({event_stats['hit_ratio']:.0%}), {event_stats['entries']} cached"
+        )
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,172 @@
+"""Structured, rotating question log for the Q&A bots.
+
+`QuestionLog.log` only builds a small record and puts it on an in-memory
+queue; a background QueueListener thread serialises it and does the file I/O. The JSONL file is
+rotated by size and rotated segments are gzip-compressed, so the log no longer
+grows without bound. Each record carries the question, session, topic
+classification, cache hit flag, latency and token counts.
+
+The original plain-text log (abc.txt, one question per line) is still read by
+`load_logged_questions` so existing history keeps feeding the cache pre-warm
+and the topic classifier.
+"""
+import atexit
+import glob
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+
+QUESTION_LOG_FILE = "question_log.jsonl"
+LEGACY_LOG_FILE = "abc.txt"
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 10
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {"ts": round(record.created, 3)}
+        data.update(record.fields)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class _PassThroughQueueHandler(logging.handlers.QueueHandler):
+    # Records are only ever formatted by the listener, off the request path
+    def prepare(self, record):
+        return record
+
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class JsonlLog:
+    """Asynchronous JSONL sink backed by a queue and a rotating file handler."""
+
+    def __init__(self, path, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+        self.path = path
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+        )
+        file_handler.namer = _gzip_namer
+        file_handler.rotator = _gzip_rotator
+        file_handler.setFormatter(_JsonFormatter())
+
+        self._queue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(self._queue, file_handler)
+        self._listener.start()
+        self._closed = False
+
+        self._logger = logging.getLogger(f"jsonl_log.{id(self)}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.addHandler(_PassThroughQueueHandler(self._queue))
+
+    def write(self, fields):
+        """Queue one record (a JSON-serialisable dict); never blocks on disk."""
+        self._logger.info("", extra={"fields": fields})
+
+    def close(self):
+        """Drain the queue and stop the writer thread; safe to call twice."""
+        if not self._closed:
+            self._closed = True
+            self._listener.stop()
+
+
+class QuestionLog(JsonlLog):
+    """Question records: text, session, classification, cache hit, latency, tokens."""
+
+    def __init__(self, path=QUESTION_LOG_FILE, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+        super().__init__(path, max_bytes, backup_count)
+
+    def log(self, question, session=None, classification=None, cache_hit=False, latency=None,
+            prompt_tokens=None, output_tokens=None, **extra):
+        """Queue one question record; never blocks on disk."""
+        fields = {
+            "question": question,
+            "session": session,
+            "classification": classification,
+            "cache_hit": cache_hit,
+            "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+        }
+        fields.update(extra)
+        self.write(fields)
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_question_log():
+    """Return the process-wide question log, starting its writer on first use."""
+    global _log
+    with _log_lock:
+        if _log is None:
+            _log = QuestionLog()
+            atexit.register(_log.close)
+        return _log
+
+
+def _read_jsonl(f):
+    for line in f:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(record, dict):
+            yield record
+
+
+def iter_records(path):
+    """Records from a JsonlLog, oldest first: rotated segments, then the live file."""
+    # Rotated segments are path.1.gz (newest) .. path.N.gz (oldest)
+    segments = sorted(glob.glob(path + ".*.gz"), key=lambda p: int(p.rsplit(".", 2)[1]), reverse=True)
+    for segment in segments:
+        with gzip.open(segment, "rt", encoding="utf-8", errors="ignore") as f:
+            yield from _read_jsonl(f)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            yield from _read_jsonl(f)
+
+
+def load_logged_questions(path=QUESTION_LOG_FILE, legacy_path=LEGACY_LOG_FILE):
+    """All logged questions, oldest first: legacy text log, rotated segments, live file."""
+    questions = []
+    if legacy_path and os.path.exists(legacy_path):
+        with open(legacy_path, "r", encoding="utf-8", errors="ignore") as f:
+            questions.extend(line.strip() for line in f if line.strip())
+    for record in iter_records(path):
+        question = record.get("question")
+        if question:
+            questions.append(question.strip())
+    return questions
+
+
+if __name__ == "__main__":
+    # Burst benchmark: time spent on the caller's thread per record
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        qlog = QuestionLog(os.path.join(tmp, "bench.jsonl"), max_bytes=256 * 1024, backup_count=100)
+        n = 50_000
+        start = time.perf_counter()
+        for i in range(n):
+            qlog.log(f"what is r2 score {i}", session="bench", classification="accept", latency=0.42)
+        enqueue = time.perf_counter() - start
+        qlog.close()
+        total = time.perf_counter() - start
+        print(f"{n} records: {enqueue / n * 1e6:.1f}us/record on the request path, "
+              f"{total:.2f}s until flushed, {len(load_logged_questions(qlog.path, None))} read back")
@@ -1,15 +1,8 @@
-from dotenv import load_dotenv
-import os
-import io
-import base64
 import streamlit as st
-from PIL import Image
-import pdf2image
-import google.generativeai as genai
-
-# Load environment variables
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+import accounting
+from analysers.invoice import DETAILED_INVOICE_PROMPT, input_image_setup
+from analysers.resume import get_gemini_response, input_pdf_setup
+from analysers.resume_ranking import rank_resumes, table_rows
 
 def setup_css():
     """Add custom dark theme CSS for styling"""
@@ -220,28 +213,6 @@ def setup_css():
         unsafe_allow_html=True,
     )
 
-def get_gemini_response(input, content, prompt):
-    """Fetch response from Gemini 2.0 Flash model."""
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content([input, content[0], prompt])
-    return response.text
-
-def input_image_setup(uploaded_file):
-    """Process uploaded image for invoice analysis."""
-    bytes_data = uploaded_file.getvalue()
-    image_parts = [{"mime_type": uploaded_file.type, "data": bytes_data}]
-    return image_parts
-
-def input_pdf_setup(uploaded_file):
-    """Process uploaded PDF for resume analysis."""
-    images = pdf2image.convert_from_bytes(uploaded_file.read())
-    first_page = images[0]
-    img_byte_arr = io.BytesIO()
-    first_page.save(img_byte_arr, format='JPEG')
-    img_byte_arr = img_byte_arr.getvalue()
-    pdf_parts = [{"mime_type": "image/jpeg", "data": base64.b64encode(img_byte_arr).decode()}]
-    return pdf_parts
-
 def show_invoice_analyzer():
     """Render the Invoice Analyzer section with dark theme."""
     st.subheader("📄 Invoice Analyzer")
@@ -257,20 +228,15 @@ def show_invoice_analyzer():
         uploaded_file = st.file_uploader("Choose an invoice image...", type=["jpg", "jpeg", "png"], key="invoice_upload")
     
     if uploaded_file:
-        image = Image.open(uploaded_file)
-        st.image(image, caption="Uploaded Invoice", use_column_width=True)
+        st.image(uploaded_file.getvalue(), caption="Uploaded Invoice", use_column_width=True)
     
     if st.button("🔍 Analyze Invoice", key="analyze_invoice", help="Click to analyze the uploaded invoice"):
         if uploaded_file and input_text.strip():
             with st.spinner("Analyzing invoice..."):
                 try:
-                    image_data = input_image_setup(uploaded_file)
-                    input_prompt = """
-                    You are an expert in understanding invoices.
-                    You will receive input images as invoices and answer questions based on the input image.
-                    Provide detailed, accurate responses with extracted values when possible.
-                    """
-                    response = get_gemini_response(input_prompt, image_data, input_text)
+                    image_data = input_image_setup(uploaded_file.getvalue(), uploaded_file.type)
+                    with accounting.scope(feature="analyze_invoice"):
+                        response = get_gemini_response(DETAILED_INVOICE_PROMPT, image_data, input_text)
                     st.subheader("Analysis Results")
                     st.markdown('<div class="response-container">', unsafe_allow_html=True)
                     st.write(response)
@@ -301,13 +267,14 @@ def show_resume_analyzer():
             if uploaded_file and input_text.strip():
                 with st.spinner("Analyzing resume..."):
                     try:
-                        pdf_content = input_pdf_setup(uploaded_file)
+                        pdf_content = input_pdf_setup(uploaded_file.getvalue())
                         input_prompt = """
                         You are an experienced Technical Human Resource Manager. Your task is to review the provided resume against 
                         the job description, highlight strengths and weaknesses, and provide professional evaluation.
                         Be specific about skills matching and areas for improvement.
                         """
-                        response = get_gemini_response(input_prompt, pdf_content, input_text)
+                        with accounting.scope(feature="analyze_resume"):
+                            response = get_gemini_response(input_prompt, pdf_content, input_text)
                         st.subheader("Resume Evaluation")
                         st.markdown('<div class="response-container">', unsafe_allow_html=True)
                         st.write(response)
@@ -322,13 +289,14 @@ def show_resume_analyzer():
             if uploaded_file and input_text.strip():
                 with st.spinner("Calculating match..."):
                     try:
-                        pdf_content = input_pdf_setup(uploaded_file)
+                        pdf_content = input_pdf_setup(uploaded_file.getvalue())
                         input_prompt = """
                         You are a skilled ATS scanner. Evaluate the resume against the provided job description, give the percentage 
                         match, list missing keywords, and provide final thoughts.
                         Format your response with clear sections for percentage, missing keywords, and recommendations.
                         """
-                        response = get_gemini_response(input_prompt, pdf_content, input_text)
+                        with accounting.scope(feature="match_percentage"):
+                            response = get_gemini_response(input_prompt, pdf_content, input_text)
                         st.subheader("ATS Match Results")
                         st.markdown('<div class="response-container">', unsafe_allow_html=True)
                         st.write(response)
@@ -338,8 +306,39 @@ def show_resume_analyzer():
             else:
                 st.warning("Please upload a resume and provide a job description.")
 
+def show_resume_ranking():
+    """Rank many resumes against one job description; only the top N go to the model."""
+    st.subheader("🏆 Resume Ranking")
+    st.markdown(
+        '<div class="tool-description">Upload many resumes and one job description. Every resume is scored locally '
+        'by keyword coverage and similarity; only the best matches get a full ATS review.</div>',
+        unsafe_allow_html=True
+    )
+
+    uploaded_files = st.file_uploader("Upload resumes (PDF)...", type=["pdf"], accept_multiple_files=True,
+                                      key="ranking_upload")
+    input_text = st.text_area("Paste the job description here:", key="ranking_input", height=150)
+    top_n = st.slider("Resumes reviewed by the model", 1, 50, 10, key="ranking_top_n")
+
+    if st.button("🏆 Rank Resumes", key="rank_resumes"):
+        if uploaded_files and input_text.strip():
+            with st.spinner(f"Scoring {len(uploaded_files)} resumes..."):
+                try:
+                    with accounting.scope(feature="rank_resumes"):
+                        rows = rank_resumes([(f.name, f.getvalue()) for f in uploaded_files], input_text, top_n)
+                    st.dataframe(table_rows(rows), use_container_width=True, hide_index=True)
+                    for row in rows:
+                        if row["evaluation"]:
+                            with st.expander(f"{row['name']}: {row['match_percent'] or '?'}% match"):
+                                st.write(row["evaluation"])
+                except Exception as e:
+                    st.error(f"An error occurred: {str(e)}")
+        else:
+            st.warning("Please upload resumes and provide a job description.")
+
 def main():
     setup_css()
+    accounting.use_streamlit_session("resume_invoice_analyser")
     st.markdown("<div class='main-header'>Gemini Document Analyzer</div>", unsafe_allow_html=True)
     st.markdown(
         '<div style="text-align: center; margin-bottom: 2rem; color: var(--text-secondary); font-size: 1.1rem;">'
@@ -351,7 +350,7 @@ def main():
     # Tool selection with animated tabs
     selected_tool = st.radio(
         "Select a tool:",
-        ("Invoice Analyzer", "Resume Analyzer"),
+        ("Invoice Analyzer", "Resume Analyzer", "Resume Ranking"),
         key="tool_selector",
         horizontal=True,
         label_visibility="hidden"
@@ -363,6 +362,8 @@ def main():
         show_invoice_analyzer()
     elif selected_tool == "Resume Analyzer":
         show_resume_analyzer()
+    elif selected_tool == "Resume Ranking":
+        show_resume_ranking()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
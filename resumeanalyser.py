@@ -1,47 +1,10 @@
-from dotenv import load_dotenv
-
-load_dotenv()
-import base64
 import streamlit as st
-import os
-import io
-from PIL import Image 
-import pdf2image
-import google.generativeai as genai
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-
-
-
-def get_gemini_response(input,pdf_content,prompt):
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content([input, pdf_content[0], prompt])
-    return response.text
-
-
-def input_pdf_setup(uploaded_file):
-    if uploaded_file is not None:
-        ## Convert the PDF to image
-        images=pdf2image.convert_from_bytes(uploaded_file.read())
-
-        first_page=images[0]
-
-        # Convert to bytes
-        img_byte_arr = io.BytesIO()
-        first_page.save(img_byte_arr, format='JPEG')
-        img_byte_arr = img_byte_arr.getvalue()
-
-        pdf_parts = [
-            {
-                "mime_type": "image/jpeg",
-                "data": base64.b64encode(img_byte_arr).decode()  # encode to base64
-            }
-        ]
-        return pdf_parts
-    else:
-        raise FileNotFoundError("No file uploaded")
+import accounting
+from analysers.resume import PROMPTS, get_gemini_response, input_pdf_setup
 
 
 st.set_page_config(page_title="ATS Resume EXpert")
+accounting.use_streamlit_session("resumeanalyser")
 st.header("ATS Tracking System")
 input_text=st.text_area("Job Description: ",key="input")
 uploaded_file=st.file_uploader("Upload your resume(PDF)...",type=["pdf"])
@@ -57,22 +20,18 @@ submit1 = st.button("Tell Me About the Resume")
 
 submit3 = st.button("Percentage match")
 
-input_prompt1 = """
- You are an experienced Technical Human Resource Manager or you are in field of any one job role in data science ,machine learning ,ai ,deep learning, dev ops, full stack developer, mlops, data analyst your task is to review the provided resume against the job description. 
-  Please share your professional evaluation on whether the candidate's profile aligns with the role. 
- Highlight the strengths and weaknesses of the applicant in relation to the specified job requirements.
-"""
-
-input_prompt3 = """
-You are an skilled ATS (Applicant Tracking System) scanner with a deep understanding of data science ,machine learning ,ai ,deep learning, dev ops, full stack developer, mlops, data analyst and ATS functionality, 
-your task is to evaluate the resume against the provided job description. give me the percentage of match if the resume matches
-the job description. First the output should come as percentage and then keywords missing and last final thoughts.
-"""
+input_prompt1 = PROMPTS["evaluation"]
+input_prompt3 = PROMPTS["percentage_match"]
 
 if submit1:
     if uploaded_file is not None:
-        pdf_content=input_pdf_setup(uploaded_file)
-        response=get_gemini_response(input_prompt1,pdf_content,input_text)
+        pdf_content=input_pdf_setup(uploaded_file.getvalue())
+        try:
+            with accounting.scope(feature="tell_me_about_resume"):
+                response=get_gemini_response(input_prompt1,pdf_content,input_text)
+        except accounting.BudgetExceeded as e:
+            st.warning(f"Request not sent: {e}")
+            st.stop()
         st.subheader("The Repsonse is")
         st.write(response)
     else:
@@ -80,8 +39,13 @@ if submit1:
 
 elif submit3:
     if uploaded_file is not None:
-        pdf_content=input_pdf_setup(uploaded_file)
-        response=get_gemini_response(input_prompt3,pdf_content,input_text)
+        pdf_content=input_pdf_setup(uploaded_file.getvalue())
+        try:
+            with accounting.scope(feature="percentage_match"):
+                response=get_gemini_response(input_prompt3,pdf_content,input_text)
+        except accounting.BudgetExceeded as e:
+            st.warning(f"Request not sent: {e}")
+            st.stop()
         st.subheader("The Repsonse is")
         st.write(response)
     else:
@@ -0,0 +1,372 @@
+"""Single-flight coalescing of identical in-flight model requests.
+
+When many visitors ask the same popular question at the same moment, every
+session used to send its own identical request. The gateway now routes calls
+through `coalesce`: the first caller for a request (keyed by the canonical
+hash of kind, model, prompt, attachments and history from gemini_replay)
+makes the upstream call, and identical calls that arrive while it is in
+flight wait for it and share the result. Streamed responses are pumped into a
+shared buffer by a background thread and fanned out chunk by chunk to every
+waiter as they arrive. Nothing is kept after the call finishes; this is not a
+cache.
+
+Within one process this works across all Streamlit sessions. With
+GEMINI_SINGLEFLIGHT_DB set to a SQLite path it also works across processes:
+the leader records the request in a lock table and publishes the result, and
+other processes poll for it (streams are shared whole, once complete). Set
+GEMINI_SINGLEFLIGHT=0 to disable coalescing.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import tracing
+from gemini_replay import _usage, request_hash
+
+ENABLED = os.getenv("GEMINI_SINGLEFLIGHT", "1") != "0"
+SHARED_DB = os.getenv("GEMINI_SINGLEFLIGHT_DB")
+WAIT_TIMEOUT = float(os.getenv("GEMINI_SINGLEFLIGHT_WAIT", "90"))  # cross-process follower wait
+RESULT_TTL = 5.0  # seconds a published result may still be picked up by late followers
+POLL_INTERVAL = 0.05
+
+
+def _chunk_text(chunk):
+    try:
+        return chunk.text
+    except (ValueError, AttributeError):  # e.g. a chunk carrying only safety metadata
+        return ""
+
+
+class _Flight:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks = []
+        self.response = None
+        self.error = None
+        self.done = False
+        self.followers = 0
+
+    def finish(self, response=None, error=None):
+        with self.cond:
+            self.response = response
+            self.error = error
+            self.done = True
+            self.cond.notify_all()
+
+    def wait(self):
+        with self.cond:
+            while not self.done:
+                self.cond.wait()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+class SharedResponse:
+    """A follower's view of a non-streamed response: `.text`, `.usage_metadata`, iteration."""
+
+    coalesced = True
+
+    def __init__(self, response):
+        self._response = response
+        self.text = response.text
+
+    def __iter__(self):
+        yield self._response
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class FanOutStream:
+    """One consumer's iterator over a streamed response shared by several callers."""
+
+    def __init__(self, flight, coalesced, on_complete=None):
+        self._flight = flight
+        self.coalesced = coalesced
+        self._on_complete = on_complete
+
+    def __iter__(self):
+        flight = self._flight
+        i = 0
+        while True:
+            with flight.cond:
+                while i >= len(flight.chunks) and not flight.done:
+                    flight.cond.wait()
+                pending = flight.chunks[i:]
+                finished = flight.done
+            for chunk in pending:
+                yield chunk
+            i += len(pending)
+            if finished and i >= len(flight.chunks):
+                break
+        if flight.error is not None:
+            raise flight.error
+        if self._on_complete is not None:
+            self._on_complete(self.text)
+
+    @property
+    def text(self):
+        return "".join(_chunk_text(c) for c in self._flight.chunks)
+
+    @property
+    def usage_metadata(self):
+        return getattr(self._flight.response, "usage_metadata", None)
+
+
+class PublishedResponse:
+    """A response another process published to the shared store."""
+
+    coalesced = True
+
+    def __init__(self, record):
+        self._chunks = record["response"]["chunks"]
+        self.text = "".join(self._chunks)
+        usage = record.get("usage")
+        self.usage_metadata = SimpleNamespace(**usage) if usage else None
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield SimpleNamespace(text=chunk)
+
+
+class _SharedStore:
+    """Cross-process lock/result table in SQLite."""
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS flights (
+        key TEXT PRIMARY KEY,
+        pid INTEGER NOT NULL,
+        started REAL NOT NULL,
+        result TEXT,
+        finished REAL
+    );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(self._SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key):
+        """('lead', None), ('follow', None) or ('done', result) for this key."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM flights WHERE finished IS NOT NULL AND finished < ?", (now - RESULT_TTL,))
+            row = conn.execute("SELECT pid, started, result FROM flights WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                pid, started, result = row
+                if result is not None:
+                    conn.execute("COMMIT")
+                    return "done", json.loads(result)
+                if _pid_alive(pid) and now - started < WAIT_TIMEOUT:
+                    conn.execute("COMMIT")
+                    return "follow", None
+            conn.execute(
+                "INSERT OR REPLACE INTO flights (key, pid, started, result, finished) VALUES (?, ?, ?, NULL, NULL)",
+                (key, os.getpid(), now),
+            )
+            conn.execute("COMMIT")
+            return "lead", None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def publish(self, key, chunks, usage):
+        record = {"response": {"chunks": chunks}, "usage": usage}
+        self._conn().execute(
+            "UPDATE flights SET result = ?, finished = ? WHERE key = ? AND pid = ?",
+            (json.dumps(record, ensure_ascii=False), time.time(), key, os.getpid()),
+        )
+
+    def abandon(self, key):
+        self._conn().execute("DELETE FROM flights WHERE key = ? AND pid = ?", (key, os.getpid()))
+
+    def wait(self, key, timeout=WAIT_TIMEOUT):
+        """The published result, or None if the leader went away or took too long."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            row = self._conn().execute("SELECT result FROM flights WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[0] is not None:
+                return json.loads(row[0])
+            time.sleep(POLL_INTERVAL)
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+_store = None
+_store_lock = threading.Lock()
+
+
+def _shared_store():
+    global _store
+    if not SHARED_DB:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = _SharedStore(SHARED_DB)
+        return _store
+
+
+def _lead(key, stream, live_call, flight):
+    """Run the upstream call for a flight, across processes when a shared store is configured."""
+    store = _shared_store()
+    while store is not None:
+        state, record = store.claim(key)
+        if state == "done":
+            return "shared", record
+        if state == "lead":
+            break
+        record = store.wait(key)
+        if record is not None:
+            return "shared", record
+        # The leader vanished or took too long: claim again, another process may have taken over already
+    try:
+        response = live_call()
+    except Exception:
+        if store is not None:
+            store.abandon(key)
+        raise
+    return "live", response
+
+
+def coalesce(kind, model, request, stream, live_call, on_shared=None):
+    """Run `live_call`, or share the result of an identical call already in flight.
+
+    `on_shared(text)` is called for followers only, to apply side effects the
+    leader's call had on its own state (such as appending a chat turn).
+    """
+    if not ENABLED:
+        return live_call()
+    key = request_hash(kind, model, request, stream)
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+        else:
+            flight.followers += 1
+    if not leader:
+        tracing.count("gemini_coalesced_total")
+        if stream:
+            return FanOutStream(flight, True, on_shared)
+        response = SharedResponse(flight.wait())
+        if on_shared is not None:
+            on_shared(response.text)
+        return response
+
+    def release():
+        with _flights_lock:
+            if _flights.get(key) is flight:
+                del _flights[key]
+
+    try:
+        source, result = _lead(key, stream, live_call, flight)
+    except Exception as e:
+        release()
+        flight.finish(error=e)
+        raise
+    if source == "shared":
+        # Another process made the call; local followers share its published result
+        tracing.count("gemini_coalesced_total")
+        release()
+        response = PublishedResponse(result)
+        if on_shared is not None:
+            on_shared(response.text)
+        flight.chunks.extend(response)
+        flight.finish(response=response)
+        return response
+
+    store = _shared_store()
+    if not stream:
+        release()
+        flight.finish(response=result)
+        if store is not None:
+            store.publish(key, [result.text], _usage(getattr(result, "usage_metadata", None)))
+        return result
+
+    def pump():
+        try:
+            for chunk in result:
+                with flight.cond:
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+        except Exception as e:
+            release()
+            flight.finish(error=e)
+            if store is not None:
+                store.abandon(key)
+            return
+        release()
+        flight.finish(response=result)
+        if store is not None:
+            store.publish(key, [_chunk_text(c) for c in flight.chunks],
+                          _usage(getattr(result, "usage_metadata", None)))
+
+    threading.Thread(target=pump, name="singleflight-pump", daemon=True).start()
+    return FanOutStream(flight, False)
+
+
+def _bench(callers=20, latency=0.3):
+    """Identical concurrent requests: upstream calls made and wall time."""
+    from concurrent.futures import ThreadPoolExecutor
+    from types import SimpleNamespace
+
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(latency)
+        return SimpleNamespace(text="answer", usage_metadata=None)
+
+    def stream_upstream():
+        calls.append(1)
+        for word in "a streamed answer in five".split():
+            time.sleep(latency / 5)
+            yield SimpleNamespace(text=word + " ")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(callers) as pool:
+        texts = list(pool.map(lambda _: coalesce("bench", "m", ["q"], False, upstream).text, range(callers)))
+    print(f"{callers} identical calls: {len(calls)} upstream, {time.perf_counter() - start:.2f}s, "
+          f"{len(set(texts))} distinct answer(s)")
+
+    calls.clear()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(callers) as pool:
+        texts = list(pool.map(
+            lambda _: "".join(c.text for c in coalesce("bench", "m", ["s"], True, stream_upstream)), range(callers)
+        ))
+    print(f"{callers} identical streams: {len(calls)} upstream, {time.perf_counter() - start:.2f}s, "
+          f"{len(set(texts))} distinct answer(s)")
+
+
+if __name__ == "__main__":
+    _bench()
@@ -0,0 +1,154 @@
+"""Cold-start benchmark: import time and time to first render for each app.
+
+    python startup_bench.py                      # every app, 3 cold runs each
+    python startup_bench.py chatbot.py limitbot.py -n 5 --top 15
+    python startup_bench.py --json startup.json --baseline startup_baseline.json
+
+Each run is a fresh interpreter started with `python -X importtime` that
+renders the app once with Streamlit's AppTest (no browser; GEMINI_API_ENDPOINT
+points at the local stub so nothing reaches the real API). Reported per app:
+the median time to import Streamlit, the median time for the first script
+run, the import time spent during that run, and the modules that cost the
+most to import, from the `-X importtime` breakdown. With --baseline, exits 1
+if any app's first render is more than --tolerance slower than recorded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APPS = [
+    "chatbot.py", "limitbot.py", "eventbot.py", "public.py", "admin.py",
+    "pdfanalyser.py", "geminipdfanlayserupdated.py", "imageanalyser.py",
+    "resumeanalyser.py", "resume_invoice_analyser.py", "multilanguageinvoiceextractor.py",
+]
+RENDER_MARKER = "-- startup_bench: first render --"
+
+
+def parse_importtime(stderr):
+    """(total import µs, {module: cumulative µs}) for top-level imports after the render marker."""
+    lines = stderr.splitlines()
+    if RENDER_MARKER in lines:
+        lines = lines[lines.index(RENDER_MARKER) + 1:]
+    modules = {}
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue  # nested import (already in its parent's cumulative time) or the header
+        modules[name.strip()] = modules.get(name.strip(), 0) + int(cumulative)
+    return sum(modules.values()), modules
+
+
+def _child(app):
+    """Runs inside the benchmarked interpreter: render `app` once, print timings as JSON."""
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    streamlit_s = time.perf_counter() - start
+    print(RENDER_MARKER, file=sys.stderr, flush=True)
+    at = AppTest.from_file(app, default_timeout=120)
+    start = time.perf_counter()
+    at.run()
+    render_s = time.perf_counter() - start
+    print(json.dumps({
+        "streamlit_s": streamlit_s,
+        "render_s": render_s,
+        "errors": [e.message for e in at.exception],
+    }))
+
+
+def run_once(app, env):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", app],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(app)) or ".",
+    )
+    if proc.returncode != 0 or not proc.stdout.strip():
+        tail = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")][-5:]
+        return {"errors": ["\n".join(tail) or f"exit code {proc.returncode}"]}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["import_us"], result["modules"] = parse_importtime(proc.stderr)
+    return result
+
+
+def bench(apps, runs=3, top=10):
+    from stub_gemini_server import start_stub_server
+
+    server, url = start_stub_server(latency=0.0, token_delay=0.0)
+    env = dict(os.environ, GEMINI_API_ENDPOINT=url, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    for name in ("METRICS_PORT", "METRICS_FILE", "GEMINI_REPLAY"):
+        env.pop(name, None)
+    report = {}
+    try:
+        for app in apps:
+            results = [run_once(app, env) for _ in range(runs)]
+            ok = [r for r in results if "render_s" in r]
+            entry = {"runs": runs, "errors": sorted({e for r in results for e in r.get("errors", [])})}
+            if ok:
+                modules = {}
+                for r in ok:
+                    for name, us in r["modules"].items():
+                        modules.setdefault(name, []).append(us)
+                slowest = sorted(modules.items(), key=lambda kv: -statistics.median(kv[1]))[:top]
+                entry.update(
+                    streamlit_s=statistics.median(r["streamlit_s"] for r in ok),
+                    render_s=statistics.median(r["render_s"] for r in ok),
+                    import_s=statistics.median(r["import_us"] for r in ok) / 1e6,
+                    slowest_imports={name: statistics.median(us) / 1e6 for name, us in slowest},
+                )
+            report[app] = entry
+            _print_entry(app, entry)
+    finally:
+        server.shutdown()
+    return report
+
+
+def _print_entry(app, entry):
+    if "render_s" not in entry:
+        print(f"{app:<36} failed: {entry['errors'][0] if entry['errors'] else '?'}")
+        return
+    print(f"{app:<36} streamlit {entry['streamlit_s']:6.2f}s   first render {entry['render_s']:6.2f}s"
+          f"   (imports {entry['import_s']:5.2f}s)")
+    for name, seconds in entry["slowest_imports"].items():
+        print(f"    {seconds * 1000:9.1f} ms  {name}")
+    for error in entry["errors"]:
+        print(f"    error: {error.splitlines()[0] if error else error}")
+
+
+def compare(report, baseline, tolerance):
+    """Apps whose first render regressed by more than `tolerance` (a fraction) against `baseline`."""
+    regressions = []
+    for app, entry in report.items():
+        before = baseline.get(app, {}).get("render_s")
+        if before and "render_s" in entry and entry["render_s"] > before * (1 + tolerance):
+            regressions.append((app, before, entry["render_s"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time and time to first render per app")
+    parser.add_argument("apps", nargs="*", default=APPS)
+    parser.add_argument("-n", "--runs", type=int, default=3, help="cold runs per app (median reported)")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports listed per app")
+    parser.add_argument("--json", metavar="PATH", help="write the report as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    parser.add_argument("--child", metavar="APP", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child)
+        sys.exit(0)
+    report = bench(args.apps, args.runs, args.top)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for app, before, after in regressions:
+            print(f"REGRESSION {app}: first render {before:.2f}s -> {after:.2f}s", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,81 @@
+"""Incremental rendering of streamed Gemini responses in Streamlit.
+
+`render_stream` shows tokens as they arrive, returns the assembled message
+once so callers can store it in history as a single entry, and measures
+time-to-first-token and total generation time for the request.
+"""
+import time
+from dataclasses import dataclass
+
+import streamlit as st
+
+import tracing
+
+RECENT_TIMINGS = 50  # per-session samples kept for the sidebar summary
+
+
+@dataclass
+class StreamResult:
+    text: str
+    ttft: float  # seconds from request start to first non-empty chunk
+    total: float  # seconds from request start to last chunk
+    chunks: int
+    usage: object = None  # usage_metadata from the response, when available
+
+
+def render_stream(response, start=None):
+    """Render a streamed response as it arrives and return a StreamResult.
+
+    `start` should be taken just before the request was sent so the timings
+    include the upstream wait; it defaults to now.
+    """
+    start = time.perf_counter() if start is None else start
+    first = None
+    count = 0
+
+    def chunks():
+        nonlocal first, count
+        for chunk in response:
+            text = chunk.text
+            if not text:
+                continue
+            if first is None:
+                first = time.perf_counter()
+            count += 1
+            yield text
+
+    with tracing.trace("render_stream"):
+        text = st.write_stream(chunks())
+    end = time.perf_counter()
+    if not isinstance(text, str):
+        text = "".join(str(part) for part in text)
+    result = StreamResult(
+        text=text,
+        ttft=(first or end) - start,
+        total=end - start,
+        chunks=count,
+        usage=getattr(response, "usage_metadata", None),
+    )
+    tracing.record_usage(result.usage)
+    _remember(result)
+    return result
+
+
+def _remember(result):
+    timings = st.session_state.setdefault("stream_timings", [])
+    timings.append((result.ttft, result.total))
+    del timings[:-RECENT_TIMINGS]
+
+
+def show_stream_timings():
+    """Sidebar summary of this session's recent time-to-first-token and total time."""
+    timings = st.session_state.get("stream_timings")
+    if not timings:
+        return
+    ttft = sorted(t for t, _ in timings)
+    total = sorted(t for _, t in timings)
+    mid = len(timings) // 2
+    st.sidebar.caption(
+        f"Last answer: first token {timings[-1][0]:.2f}s, done {timings[-1][1]:.2f}s · "
+        f"median over {len(timings)}: {ttft[mid]:.2f}s / {total[mid]:.2f}s"
+    )
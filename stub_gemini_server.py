@@ -0,0 +1,207 @@
+"""Local stand-in for the Gemini REST API.
+
+Serves generateContent, streamGenerateContent (JSON array or `alt=sse`),
+countTokens, embedContent and batchEmbedContents under /v1beta/models/, with
+configurable latency and error rate, so the gateway, the apps and the load
+tests can run on a box without network access or an API key:
+
+    python stub_gemini_server.py --port 8765 --latency 0.3 --error-rate 0.05
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8765 streamlit run public.py
+
+Replies are deterministic for a given prompt; embeddings are hashed
+bag-of-words vectors, so similar texts get similar vectors.
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+EMBEDDING_DIM = 768
+_PATH_RE = re.compile(r"^/v1beta/(?:models|tunedModels)/(?P<model>[^:/]+):(?P<method>\w+)$")
+_WORD_RE = re.compile(r"\w+")
+
+
+def _texts(contents):
+    """All text parts from a request's contents (role-less dicts or full Content)."""
+    texts = []
+    for content in contents or []:
+        for part in content.get("parts", []):
+            if "text" in part:
+                texts.append(part["text"])
+    return texts
+
+
+def _count_tokens(texts):
+    return sum(len(t) // 4 + 1 for t in texts)
+
+
+def embed(text, dim=EMBEDDING_DIM):
+    """Deterministic unit-length bag-of-words embedding."""
+    vec = [0.0] * dim
+    for word in _WORD_RE.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+class StubConfig:
+    def __init__(self, latency=0.2, jitter=0.1, token_delay=0.01, error_rate=0.0, reply_words=60, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_delay = token_delay  # seconds between streamed chunks
+        self.error_rate = error_rate
+        self.reply_words = reply_words
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def delay(self):
+        with self.lock:
+            self.requests += 1
+            extra = self.random.uniform(0, self.jitter)
+            fail = self.random.random() < self.error_rate
+        time.sleep(self.latency + extra)
+        return fail
+
+
+def _reply_text(prompt_texts, words):
+    prompt = " ".join(prompt_texts)
+    seed = hashlib.sha256(prompt.encode()).hexdigest()
+    tail = " ".join(prompt.split()[-12:])
+    body = " ".join(f"w{seed[i % 64]}{i}" for i in range(words))
+    return f"Stub answer to: {tail}\n{body}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        match = _PATH_RE.match(url.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._send_json(400, {"error": {"code": 400, "message": "bad json", "status": "INVALID_ARGUMENT"}})
+        if not match:
+            return self._send_json(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+
+        if self.config.delay():
+            return self._send_json(503, {"error": {"code": 503, "message": "stub overloaded", "status": "UNAVAILABLE"}})
+
+        method = match.group("method")
+        if method == "generateContent":
+            return self._send_json(200, self._generate(request))
+        if method == "streamGenerateContent":
+            return self._stream(request, sse=parse_qs(url.query).get("alt") == ["sse"])
+        if method == "countTokens":
+            texts = _texts(request.get("contents") or request.get("generateContentRequest", {}).get("contents"))
+            return self._send_json(200, {"totalTokens": _count_tokens(texts)})
+        if method == "embedContent":
+            text = " ".join(_texts([request.get("content", {})]))
+            return self._send_json(200, {"embedding": {"values": embed(text)}})
+        if method == "batchEmbedContents":
+            embeddings = [
+                {"values": embed(" ".join(_texts([r.get("content", {})])))}
+                for r in request.get("requests", [])
+            ]
+            return self._send_json(200, {"embeddings": embeddings})
+        return self._send_json(404, {"error": {"code": 404, "message": method, "status": "NOT_FOUND"}})
+
+    def _usage(self, prompt_texts, reply):
+        prompt_tokens = _count_tokens(prompt_texts)
+        output_tokens = _count_tokens([reply])
+        return {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        }
+
+    def _generate(self, request):
+        texts = _texts(request.get("contents"))
+        reply = _reply_text(texts, self.config.reply_words)
+        return {
+            "candidates": [{"content": {"parts": [{"text": reply}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": self._usage(texts, reply),
+        }
+
+    def _stream(self, request, sse):
+        texts = _texts(request.get("contents"))
+        words = _reply_text(texts, self.config.reply_words).split(" ")
+        pieces = [" ".join(words[i:i + 8]) + " " for i in range(0, len(words), 8)]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream" if sse else "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        if not sse:
+            self._write_chunk(b"[")
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            payload = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}, "index": 0}]}
+            if last:
+                payload["candidates"][0]["finishReason"] = "STOP"
+                payload["usageMetadata"] = self._usage(texts, "".join(pieces))
+            data = json.dumps(payload).encode()
+            if sse:
+                self._write_chunk(b"data: " + data + b"\r\n\r\n")
+            else:
+                self._write_chunk((b"," if i else b"") + data)
+            if not last:
+                time.sleep(self.config.token_delay)
+        if not sse:
+            self._write_chunk(b"]")
+        self._write_chunk(b"")
+
+
+def start_stub_server(host="127.0.0.1", port=0, **config):
+    """Start the stub in a background thread; returns (server, base_url)."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": StubConfig(**config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-gemini", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub for the Gemini REST API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="base seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.1, help="extra random seconds per request")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(
+        args.host, args.port, latency=args.latency, jitter=args.jitter,
+        token_delay=args.token_delay, error_rate=args.error_rate, seed=args.seed,
+    )
+    print(f"Stub Gemini API listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
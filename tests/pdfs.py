@@ -0,0 +1,43 @@
+"""Hand-built PDFs for tests: text pages, image-only ("scanned") pages and blank pages."""
+import io
+
+
+def make_pdf(kinds):
+    """A PDF with one page per character of `kinds`: t = text, s = scanned image, b = blank."""
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    image_id = 4 + 2 * len(kinds)
+    objects[image_id] = ("<< /Type /XObject /Subtype /Image /Width 1 /Height 1 /ColorSpace /DeviceGray "
+                         "/BitsPerComponent 8 /Length 1 >>\nstream\n\x00\nendstream")
+    kids = []
+    for i, kind in enumerate(kinds):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        if kind == "t":
+            stream = f"BT /F1 10 Tf 40 760 Td (Text layer of page {i + 1} with enough words.) Tj ET"
+            resources = "/Font << /F1 3 0 R >>"
+        elif kind == "s":
+            stream = "q 100 0 0 100 0 0 cm /Im1 Do Q"
+            resources = f"/XObject << /Im1 {image_id} 0 R >>"
+        else:
+            stream, resources = "", ""
+        objects[content_id] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                            f"/Resources << {resources} >> /Contents {content_id} 0 R >>")
+        kids.append(f"{page_id} 0 R")
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = out.tell()
+        out.write(f"{number} 0 obj\n{objects[number]}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    count = max(objects) + 1
+    out.write(f"xref\n0 {count}\n0000000000 65535 f \n".encode())
+    for number in range(1, count):
+        out.write(f"{offsets.get(number, 0):010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
@@ -0,0 +1,14 @@
+from accounting import IMAGE_TOKENS, measure
+
+
+def test_measure_counts_text_and_inline_data():
+    counts = measure(["héllo", {"mime_type": "image/jpeg", "data": b"\xff" * 30}])
+    assert counts["payload_bytes"] == len("héllo".encode("utf-8")) + 30
+    assert counts["base64_bytes"] == 40
+    assert counts["images"] == 1
+    assert counts["estimated_tokens"] > IMAGE_TOKENS
+
+
+def test_measure_reads_chat_history_parts():
+    history = [{"role": "user", "parts": ["hello"]}, {"role": "model", "parts": ["hi there"]}]
+    assert measure(["next"] + history)["payload_bytes"] == len("nexthellohi there")
@@ -0,0 +1,62 @@
+import pytest
+
+from answer_cache import AnswerCache, content_tokens, normalize_question
+
+
+def test_normalized_questions_share_an_entry():
+    cache = AnswerCache()
+    cache.put("What is R2 score?", "r2 answer")
+    assert cache.get("what is r2  score") == "r2 answer"
+    assert normalize_question("  What's   NEW?! ") == "what s new"
+
+
+def test_fuzzy_matching_is_off_by_default():
+    cache = AnswerCache()
+    cache.put("what is python 2", "python 2 answer")
+    assert cache.get("what is pyhton 2") is None
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("what is python 2", "what is python 3"),
+    ("what is r2 score", "what is r3 score"),
+    ("where is the event", "when is the event"),
+])
+def test_fuzzy_match_needs_the_same_content_words(cached, asked):
+    cache = AnswerCache(fuzzy_threshold=0.8)
+    cache.put(cached, "cached answer")
+    assert cache.get(asked) is None
+
+
+def test_fuzzy_match_still_serves_filler_differences():
+    cache = AnswerCache(fuzzy_threshold=0.8)
+    cache.put("what is the r2 score", "r2 answer")
+    assert cache.get("what is r2 score") == "r2 answer"
+    assert content_tokens("What is the R2 score?") == content_tokens("what is r2 score")
+
+
+def test_ttl_expiry(monkeypatch):
+    import answer_cache
+
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "monotonic", lambda: now[0])
+    cache = AnswerCache(ttl=10)
+    cache.put("q", "a")
+    now[0] += 11
+    assert cache.get("q") is None
+
+
+def test_lfu_eviction_keeps_the_frequent_entry():
+    cache = AnswerCache(max_entries=2)
+    cache.put("often", "a")
+    cache.put("rarely", "b")
+    cache.get("often")
+    cache.put("new", "c")
+    assert cache.get("often") == "a"
+    assert cache.get("rarely") is None
+
+
+def test_prewarm_answers_repeated_questions_only():
+    cache = AnswerCache()
+    added = cache.prewarm(["What is AI?", "what is ai", "once only"], lambda q: f"answer: {q}")
+    assert added == 1
+    assert cache.get("What is AI") == "answer: what is ai"
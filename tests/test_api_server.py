@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+
+import api_server  # noqa: E402
+
+
+class FakeRequest:
+    def __init__(self, body):
+        self.body = body
+
+    async def json(self):
+        return self.body
+
+
+def _question_body(body):
+    return asyncio.run(api_server._question_body(FakeRequest(body)))
+
+
+@pytest.mark.parametrize("k", [1, api_server.MAX_QUERY_K, None])
+def test_k_is_optional_and_bounded(k):
+    body = {"question": "what is covered?", "k": k}
+    assert _question_body(body) == body
+
+
+@pytest.mark.parametrize("k", ["five", "5", 2.5, 0, -1, True, api_server.MAX_QUERY_K + 1, [5]])
+def test_bad_k_is_a_400(k):
+    with pytest.raises(web.HTTPBadRequest) as error:
+        _question_body({"question": "what is covered?", "k": k})
+    assert "'k'" in error.value.text
+
+
+def test_question_is_required():
+    with pytest.raises(web.HTTPBadRequest):
+        _question_body({"question": "  ", "k": 3})
@@ -0,0 +1,64 @@
+import pytest
+
+import artifact_cache
+from artifact_cache import ArtifactCache, artifact_key, content_hash
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(str(tmp_path / "artifacts.db"), max_bytes=1000)
+
+
+def test_round_trips_bytes_text_and_json(cache):
+    doc = content_hash(b"%PDF-1.4 resume")
+    cache.put("page_image", doc, b"\xff\xd8jpeg", 1, dpi=200)
+    cache.put_text("page_text", doc, "héllo", 1)
+    cache.put_json("pdf_layout", doc, ["text", "ocr"], min_chars=20)
+    assert cache.get("page_image", doc, 1, dpi=200) == b"\xff\xd8jpeg"
+    assert cache.get_text("page_text", doc, 1) == "héllo"
+    assert cache.get_json("pdf_layout", doc, min_chars=20) == ["text", "ocr"]
+
+
+def test_kind_page_and_parameters_are_part_of_the_key(cache):
+    doc = content_hash(b"doc")
+    cache.put_text("ocr_text", doc, "page one", 1, dpi=200, model="m")
+    assert cache.get_text("ocr_text", doc, 2, dpi=200, model="m") is None
+    assert cache.get_text("ocr_text", doc, 1, dpi=300, model="m") is None
+    assert cache.get_text("page_text", doc, 1, dpi=200, model="m") is None
+    assert cache.get_text("ocr_text", content_hash(b"other"), 1, dpi=200, model="m") is None
+    assert artifact_key("k", doc, 1, a=1, b=2) == artifact_key("k", doc, 1, b=2, a=1)
+
+
+def test_least_recently_used_are_evicted_over_the_cap(cache, monkeypatch):
+    monkeypatch.setattr(artifact_cache, "TOUCH_INTERVAL", -1)  # every hit refreshes last_used
+    for page in (1, 2, 3):
+        cache.put("page_image", "doc", bytes(300), page)
+    assert cache.get("page_image", "doc", 1) is not None  # page 2 is now the least recently used
+    cache.put("page_image", "doc", bytes(300), 4)
+    assert cache.get("page_image", "doc", 2) is None
+    assert all(cache.get("page_image", "doc", page) is not None for page in (1, 3, 4))
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_values_over_the_cap_are_not_stored(cache):
+    cache.put("page_image", "doc", bytes(2000), 1)
+    assert cache.get("page_image", "doc", 1) is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_stats_and_clear(cache):
+    cache.put_text("page_text", "doc", "abc", 1)
+    cache.get_text("page_text", "doc", 1)
+    cache.get_text("page_text", "doc", 2)
+    stats = cache.stats()
+    assert stats["kinds"] == {"page_text": {"entries": 1, "bytes": 3}}
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    cache.clear()
+    assert cache.get_text("page_text", "doc", 1) is None
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "artifacts.db"), enabled=False)
+    cache.put_text("page_text", "doc", "abc", 1)
+    assert cache.get_text("page_text", "doc", 1) is None
+    assert not (tmp_path / "artifacts.db").exists()
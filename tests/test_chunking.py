@@ -0,0 +1,62 @@
+from analysers.chunking import Page, chunk_pages, chunk_text, eval_document, is_heading
+from chat_sessions import estimate_tokens
+
+
+def _table(rows=3000):
+    return "\n".join(f"row {i} | item {i * 7} | qty {i % 9} | price {i * 3.5:.2f} | region north" for i in range(rows))
+
+
+def test_unpunctuated_table_has_no_fragment_chunks():
+    sizes = [estimate_tokens(c) for c in chunk_text(_table())]
+    assert len(sizes) > 10
+    assert max(sizes) <= 1000
+    assert min(sizes[:-1]) >= 900  # only the last chunk may be short
+
+
+def test_chunks_never_exceed_the_target_with_overlap():
+    pages, _ = eval_document(sections=30)
+    for tokens in (120, 400, 1000):
+        chunks = list(chunk_pages(pages, chunk_tokens=tokens, overlap_tokens=tokens // 10))
+        assert max(c.tokens for c in chunks) <= tokens
+
+
+def test_consecutive_chunks_overlap_within_a_section():
+    text = " ".join(f"Sentence number {i} talks about the same policy." for i in range(200))
+    chunks = chunk_text(text, chunk_tokens=100, overlap_tokens=20)
+    assert len(chunks) > 2
+    last_sentence = chunks[0].rsplit(". ", 1)[-1]
+    assert chunks[1].startswith(last_sentence.rstrip("."))
+
+
+def test_hyphenated_line_breaks_are_rejoined():
+    assert "configuration" in chunk_text("The configu-\nration is stored centrally.")[0]
+
+
+def test_page_and_heading_metadata():
+    pages = [
+        Page("a.pdf", 1, 2, "1. Billing Policy\nInvoices are sent monthly. Payment is due in 30 days."),
+        Page("a.pdf", 2, 2, "Late payments incur a fee."),
+    ]
+    [chunk] = chunk_pages(pages)
+    assert chunk.metadata == {"source": "a.pdf", "page_start": 1, "page_end": 2, "heading": "1. Billing Policy"}
+
+
+def test_new_source_starts_a_new_chunk():
+    pages = [Page("a.pdf", 1, 1, "First document text."), Page("b.pdf", 1, 1, "Second document text.")]
+    assert [c.source for c in chunk_pages(pages)] == ["a.pdf", "b.pdf"]
+
+
+def test_is_heading():
+    assert is_heading("2.1 Scope")
+    assert is_heading("TERMS AND CONDITIONS")
+    assert not is_heading("2024 revenue grew by ten percent")
+    assert not is_heading("This is an ordinary sentence.")
+
+
+def test_spaceless_runs_are_sliced_to_the_target():
+    for text in ("x" * 10000, "see " + "a" * 4100 + " end.", "A" * 12000):
+        chunks = list(chunk_pages([Page(None, 1, 1, text)]))
+        assert max(c.tokens for c in chunks) <= 1000
+        assert "".join(c.text for c in chunks).replace(" ", "").count("x") == text.count("x")
+    chunks = list(chunk_pages([Page(None, 1, 1, "z" * 10000)], chunk_tokens=50, overlap_tokens=5))
+    assert max(c.tokens for c in chunks) <= 50
@@ -0,0 +1,29 @@
+import pytest
+
+from event_faq import DEFAULT_FAQ_QUESTIONS, find_faq_answer
+
+FAQ = {q: f"answer to {q}" for q in DEFAULT_FAQ_QUESTIONS}
+
+
+@pytest.mark.parametrize("question, canonical", [
+    ("When is the event?", "When is the event?"),
+    ("when is the EVENT", "When is the event?"),
+    ("What is the entry fee", "What is the entry fee?"),
+    ("Can you tell me, what is the entry fee?", "What is the entry fee?"),
+])
+def test_same_question_matches(question, canonical):
+    assert find_faq_answer(FAQ, question) == FAQ[canonical]
+
+
+@pytest.mark.parametrize("question", [
+    "Where is the event?",  # differs from "When is the event?" in the interrogative only
+    "What is the event fee?",  # differs from "What is the entry fee?" in one noun
+    "Who is the event for?",
+    "What is the parking fee?",
+])
+def test_one_word_difference_does_not_match(question):
+    assert find_faq_answer(FAQ, question) is None
+
+
+def test_empty_question_does_not_match():
+    assert find_faq_answer(FAQ, "?!") is None
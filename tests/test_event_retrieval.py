@@ -0,0 +1,34 @@
+from chat_sessions import estimate_tokens
+from event_retrieval import CHUNK_TOKENS, BM25Index, chunk_description, select_context
+
+
+def _agenda(lines=600):
+    # One slot per line, no sentence punctuation, no blank lines
+    return "\n".join(f"{9 + i // 4}:{i % 4 * 15:02d} session {i} on topic {i} in room {i % 7}" for i in range(lines))
+
+
+def test_unpunctuated_agenda_is_chunked():
+    chunks = chunk_description(_agenda())
+    assert len(chunks) > 1
+    assert max(estimate_tokens(c) for c in chunks) <= CHUNK_TOKENS
+
+
+def test_long_run_on_line_is_wrapped_by_words():
+    chunks = chunk_description(" ".join(f"word{i}" for i in range(3000)))
+    assert len(chunks) > 1
+    assert max(estimate_tokens(c) for c in chunks) <= CHUNK_TOKENS
+
+
+def test_select_context_never_empty():
+    context = select_context(_agenda(), "what is in room 3")
+    assert context.strip()
+    assert estimate_tokens(context) <= 1500 + 60  # cap plus the "..." separators
+
+
+def test_small_description_used_whole():
+    assert select_context("Annual meetup. Doors open at 9.", "when?") == "Annual meetup. Doors open at 9."
+
+
+def test_bm25_ranks_matching_chunk_first():
+    index = BM25Index(["registration opens at 8", "the awards ceremony starts at 7 pm", "lunch is served"])
+    assert index.search("when do the awards start")[0][1] == 1
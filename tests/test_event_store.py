@@ -0,0 +1,15 @@
+import importlib
+
+import event_store
+
+
+def test_events_db_overrides_the_database_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "events.db")
+    monkeypatch.setenv("EVENTS_DB", path)
+    try:
+        module = importlib.reload(event_store)
+        assert module.EVENTS_FILE == path
+        assert module.EventStore().path == path
+    finally:
+        monkeypatch.delenv("EVENTS_DB")
+        importlib.reload(event_store)
@@ -0,0 +1,71 @@
+import pytest
+
+pytest.importorskip("google.generativeai")
+pytest.importorskip("langchain_google_genai")
+
+import accounting  # noqa: E402
+import gemini_gateway  # noqa: E402
+from stub_gemini_server import start_stub_server  # noqa: E402
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    """The gateway configured from scratch against a local stub server, over REST."""
+    server, url = start_stub_server(latency=0.0, jitter=0.0, token_delay=0.0)
+    monkeypatch.setenv("GEMINI_API_ENDPOINT", url)
+    monkeypatch.setenv("GEMINI_USAGE_LOG", str(tmp_path / "usage.jsonl"))
+    monkeypatch.delenv("GEMINI_REPLAY", raising=False)
+    for name, value in (("_settings", {}), ("_settings_loaded", False), ("_configured", False), ("_models", {})):
+        monkeypatch.setattr(gemini_gateway, name, value)
+    monkeypatch.setattr(accounting, "_ledger", None)
+    yield url
+    server.shutdown()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Functions sent through `gemini_gateway.call`, the limiter."""
+    seen = []
+    limited = gemini_gateway.call
+
+    def counting(fn, *args, **kwargs):
+        seen.append(fn)
+        return limited(fn, *args, **kwargs)
+
+    monkeypatch.setattr(gemini_gateway, "call", counting)
+    return seen
+
+
+def test_sdk_rest_path(stub):
+    assert gemini_gateway.generate_content(["question 1"]).text.startswith("Stub answer to:")
+    chunks = [c.text for c in gemini_gateway.generate_content(["stream please"], stream=True)]
+    assert "".join(chunks).startswith("Stub answer to:")
+    chat = gemini_gateway.get_model().start_chat(history=[])
+    gemini_gateway.send_message(chat, "hello")
+    assert len(chat.history) == 2
+
+
+def test_langchain_chat_goes_through_the_limiter(stub, calls):
+    reply = gemini_gateway.get_chat_llm().invoke("what is on the agenda")
+    assert reply.content.startswith("Stub answer to:")
+    assert len(calls) == 1
+
+
+def test_embeddings_go_through_the_limiter_one_batch_at_a_time(stub, calls):
+    embeddings = gemini_gateway.get_embeddings()
+    vectors = embeddings.embed_documents([f"chunk {i}" for i in range(2 * gemini_gateway.EMBED_BATCH + 1)])
+    assert len(vectors) == 2 * gemini_gateway.EMBED_BATCH + 1
+    assert len(calls) == 3
+    assert len(embeddings.embed_query("chunk 1")) == len(vectors[0])
+    assert len(calls) == 4
+
+
+def test_request_bytes_come_from_the_accounting_measure(stub):
+    import tracing
+
+    def sent():
+        return sum(v for (name, _), v in tracing._counters.items() if name == "gemini_request_bytes_total")
+
+    before = sent()
+    gemini_gateway.generate_content(["twelve bytes"])
+    assert sent() - before == len("twelve bytes")
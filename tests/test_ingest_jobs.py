@@ -0,0 +1,95 @@
+import os
+
+import ingest_jobs
+from ingest_jobs import collection_dir, collection_root, collection_version, list_collections
+
+
+def _finish_version(root, name, version, text):
+    """What run_job leaves behind: a complete version directory, then the pointer swap."""
+    base = collection_root(name, root)
+    tmp_dir = os.path.join(base, f"{version}.tmp")
+    os.makedirs(tmp_dir)
+    for file in ("index.faiss", "index.pkl"):
+        open(os.path.join(tmp_dir, file), "w").close()
+    with open(os.path.join(tmp_dir, ingest_jobs.TEXT_FILE), "w") as f:
+        f.write(text)
+    os.replace(tmp_dir, os.path.join(base, version))
+    ingest_jobs._publish(base, version)
+
+
+def _text(root, name):
+    with open(os.path.join(collection_dir(name, root), ingest_jobs.TEXT_FILE)) as f:
+        return f.read()
+
+
+def test_publishing_switches_the_live_version(tmp_path):
+    root = str(tmp_path)
+    _finish_version(root, "handbook", "v1", "first")
+    assert collection_version("handbook", root) == "v1"
+    assert _text(root, "handbook") == "first"
+
+    _finish_version(root, "handbook", "v2", "second")
+    assert collection_version("handbook", root) == "v2"
+    assert _text(root, "handbook") == "second"
+    assert list_collections(root) == ["handbook"]
+
+
+def test_previous_version_is_kept_for_readers_and_older_ones_pruned(tmp_path):
+    root = str(tmp_path)
+    for number in (1, 2, 3):
+        _finish_version(root, "handbook", f"v{number}", str(number))
+    base = collection_root("handbook", root)
+    assert sorted(os.listdir(base)) == [ingest_jobs.CURRENT_FILE, "v2", "v3"]
+
+
+def test_a_job_still_writing_is_not_pruned_or_listed(tmp_path):
+    root = str(tmp_path)
+    base = collection_root("handbook", root)
+    os.makedirs(os.path.join(base, "v9.tmp"))
+    assert list_collections(root) == []
+    assert collection_version("handbook", root) is None
+
+    _finish_version(root, "handbook", "v1", "first")
+    _finish_version(root, "handbook", "v2", "second")
+    _finish_version(root, "handbook", "v3", "third")
+    assert os.path.isdir(os.path.join(base, "v9.tmp"))
+
+
+def test_unversioned_collections_stay_readable(tmp_path):
+    root = str(tmp_path)
+    base = collection_root("legacy", root)
+    os.makedirs(base)
+    for file in ("index.faiss", "index.pkl", ingest_jobs.TEXT_FILE):
+        open(os.path.join(base, file), "w").close()
+    assert collection_dir("legacy", root) == base
+    assert isinstance(collection_version("legacy", root), float)
+    assert list_collections(root) == ["legacy"]
+
+    _finish_version(root, "legacy", "v1", "first")
+    assert _text(root, "legacy") == "first"
+    assert os.path.exists(os.path.join(base, "index.faiss"))  # a reader may still be loading it
+    _finish_version(root, "legacy", "v2", "second")
+    assert not os.path.exists(os.path.join(base, "index.faiss"))
+
+
+def test_an_older_version_never_replaces_a_newer_one(tmp_path):
+    root = str(tmp_path)
+    _finish_version(root, "handbook", "v7", "newer")
+    _finish_version(root, "handbook", "v3", "older")
+    assert collection_version("handbook", root) == "v7"
+    assert _text(root, "handbook") == "newer"
+    assert not os.path.exists(os.path.join(collection_root("handbook", root), "v3"))
+
+
+def test_jobs_for_one_collection_run_one_at_a_time(tmp_path):
+    queue = ingest_jobs.JobQueue(str(tmp_path / "jobs.db"))
+    upload_dir = str(tmp_path / "uploads")
+    first = queue.submit("handbook", [("a.pdf", b"1")], upload_dir)
+    second = queue.submit("handbook", [("b.pdf", b"2")], upload_dir)
+    other = queue.submit("faq", [("c.pdf", b"3")], upload_dir)
+
+    assert queue.claim(pid=1)["id"] == first
+    assert queue.claim(pid=2)["id"] == other  # the second handbook job waits for the first
+    assert queue.claim(pid=2) is None
+    queue.finish(first, ingest_jobs.DONE)
+    assert queue.claim(pid=1)["id"] == second
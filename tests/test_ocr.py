@@ -0,0 +1,79 @@
+import io
+import threading
+
+import pytest
+
+pytest.importorskip("PyPDF2")
+
+from analysers import ocr  # noqa: E402
+from artifact_cache import ArtifactCache  # noqa: E402
+from tests.pdfs import make_pdf  # noqa: E402
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(str(tmp_path / "artifacts.db"))
+
+
+class FakeTranscriber:
+    """Records the pages it is asked for and answers once `release` is set."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def __call__(self, data, number, dpi=None, model=None, data_hash=None):
+        self.calls.append(number)
+        assert self.release.wait(5)
+        return f"Transcript of page {number}."
+
+
+@pytest.fixture
+def transcribed(monkeypatch):
+    fake = FakeTranscriber()
+    monkeypatch.setattr(ocr, "transcribe_page", fake)
+    return fake
+
+
+def test_pages_are_classified_and_transcribed(cache, transcribed):
+    transcribed.release.set()
+    stats = []
+    pages = list(ocr.read_pages(io.BytesIO(make_pdf("tsbt")), cache=cache, on_stats=stats.append))
+    assert [p.method for p in pages] == ["text", "ocr", "blank", "text"]
+    assert pages[1].text == "Transcript of page 2."
+    assert (stats[0].text_pages, stats[0].ocr_pages, stats[0].blank_pages) == (2, 1, 1)
+
+
+def test_text_pages_are_yielded_before_ocr_finishes(cache, transcribed):
+    pages = ocr.read_pages(io.BytesIO(make_pdf("tts")), cache=cache)
+    first, second = next(pages), next(pages)  # would block if the reader waited for the scanned page
+    assert (first.method, second.method) == ("text", "text")
+    transcribed.release.set()
+    assert next(pages).text == "Transcript of page 3."
+
+
+def test_reupload_is_served_from_the_cache(cache, transcribed):
+    transcribed.release.set()
+    data = make_pdf("tss")
+    list(ocr.read_pages(io.BytesIO(data), cache=cache))
+    stats = []
+    pages = list(ocr.read_pages(io.BytesIO(data), cache=cache, on_stats=stats.append))
+    assert transcribed.calls == [2, 3]  # not transcribed again
+    assert stats[0].cached_text_layer and stats[0].cached_pages == 2
+    assert pages[2].text == "Transcript of page 3."
+
+
+def test_ocr_disabled_leaves_scanned_pages_empty(cache, transcribed):
+    stats = []
+    pages = list(ocr.read_pages(io.BytesIO(make_pdf("ts")), ocr=False, cache=cache, on_stats=stats.append))
+    assert pages[1].text == "" and stats[0].missing_pages == 1
+    assert transcribed.calls == []
+
+
+def test_pages_are_parsed_as_they_are_consumed(cache, monkeypatch):
+    classified = []
+    classify = ocr.classify
+    monkeypatch.setattr(ocr, "classify", lambda page, text: classified.append(text) or classify(page, text))
+    pages = ocr.read_pages(io.BytesIO(make_pdf("tttt")), cache=cache)
+    next(pages)
+    assert len(classified) == 1
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from analysers import reranking  # noqa: E402
+from analysers.reranking import lexical_scores, mmr, query_terms, rerank  # noqa: E402
+
+
+def test_query_terms_drop_stopwords_and_short_words_but_keep_numbers():
+    assert query_terms("What is the refund policy for order 42 in Q3?") == ["refund", "policy", "order", "42"]
+
+
+def test_lexical_scores_favour_exact_matches():
+    texts = ["the warranty covers parts", "invoice INV-7731 is overdue", "invoices are sent monthly"]
+    scores = lexical_scores("status of invoice inv-7731", texts)
+    assert int(np.argmax(scores)) == 1
+    assert scores[0] == 0
+    assert not lexical_scores("the and", texts).any()
+
+
+def test_mmr_skips_near_duplicates():
+    vectors = np.array([[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]], dtype=np.float32)
+    relevance = np.array([0.9, 0.89, 0.5], dtype=np.float32)
+    unit = reranking._unit(vectors)
+    assert mmr(relevance, unit, 2) == [0, 2]
+    assert mmr(relevance, unit, 2, lambda_mult=1.0) == [0, 1]
+    assert mmr(relevance, unit, 10) == [0, 2, 1]
+    assert mmr(relevance[:0], unit[:0], 3) == []
+
+
+def test_rerank_spreads_the_top_k_over_distinct_passages():
+    query, vectors, texts, groups = reranking._synthetic_candidates()
+    plain = np.argsort(-(reranking._unit(vectors) @ reranking._unit(query)))[:5]
+    order = rerank("section 1", query, vectors, texts, k=5)
+    assert len(order) == 5
+    assert len(set(groups[order])) > len(set(groups[plain]))
+
+
+class FakeStore:
+    """The parts of a langchain FAISS store that `retrieve` uses."""
+
+    def __init__(self, vectors, texts, query=(1.0, 1.0)):
+        self.vectors = reranking._unit(vectors)
+        self.query = list(query)
+        self.docs = {f"d{i}": SimpleNamespace(page_content=t) for i, t in enumerate(texts)}
+        self.index_to_docstore_id = {i: f"d{i}" for i in range(len(texts))}
+        self.embedding_function = SimpleNamespace(embed_query=lambda question: self.query)
+        self.docstore = SimpleNamespace(search=self.docs.get)
+        self.index = SimpleNamespace(search=self._search, reconstruct_batch=lambda ids: self.vectors[ids])
+        self.similarity_searches = 0
+
+    def _search(self, query, k):
+        order = np.argsort(-(self.vectors @ query[0]), kind="stable")[:k]
+        ids = np.full(k, -1)
+        ids[:len(order)] = order
+        return None, ids[None, :]
+
+    def similarity_search(self, question, k):
+        self.similarity_searches += 1
+        return [self.docs[f"d{i}"] for i in self._search(np.asarray([self.query]), k)[1][0]]
+
+
+CANDIDATES = ([[1.0, 0.3], [1.0, 0.3], [0.25, 1.0]], ["first", "first copy", "second"])
+
+
+def test_retrieve_reranks_over_fetched_candidates():
+    store = FakeStore(*CANDIDATES)
+    docs = reranking.retrieve(store, "what is it", k=2, fetch_k=10)
+    assert [d.page_content for d in docs] == ["first", "second"]
+    assert store.similarity_searches == 0
+
+
+def test_retrieve_without_over_fetch_is_a_plain_similarity_search():
+    store = FakeStore(*CANDIDATES)
+    docs = reranking.retrieve(store, "what is it", k=2, fetch_k=2)
+    assert [d.page_content for d in docs] == ["first", "first copy"]
+    assert store.similarity_searches == 1
@@ -0,0 +1,25 @@
+from analysers import resume_ranking
+from analysers.resume_ranking import prefilter, rank_resumes, unique_names
+
+
+def test_repeated_names_get_a_suffix():
+    resumes = [("cv.pdf", b"1"), ("cv.pdf", b"2"), ("cv.pdf (2)", b"3"), ("other.pdf", b"4"), ("cv.pdf", b"5")]
+    assert unique_names(resumes) == [
+        ("cv.pdf", b"1"), ("cv.pdf (3)", b"2"), ("cv.pdf (2)", b"3"), ("other.pdf", b"4"), ("cv.pdf (4)", b"5"),
+    ]
+    assert unique_names(resumes[3:4]) == resumes[3:4]
+
+
+def test_prefilter_scores_keyword_coverage():
+    rows = prefilter({"a.pdf": "python django postgres", "b.pdf": "cooking"}, "Python developer with Django")
+    assert [r["name"] for r in rows] == ["a.pdf", "b.pdf"]
+    assert rows[0]["keyword_coverage"] > rows[1]["keyword_coverage"]
+    assert rows[1]["missing_keywords"]
+
+
+def test_resumes_with_the_same_name_are_all_ranked(monkeypatch):
+    texts = {b"python": "python django developer", b"cooking": "pastry chef"}
+    monkeypatch.setattr(resume_ranking, "extract_texts", lambda resumes, jobs: {n: texts[d] for n, d in resumes})
+    rows = rank_resumes([("cv.pdf", b"python"), ("cv.pdf", b"cooking")], "Python developer", top_n=0, jobs=1)
+    assert sorted(r["name"] for r in rows) == ["cv.pdf", "cv.pdf (2)"]
+    assert rows[0]["name"] == "cv.pdf"
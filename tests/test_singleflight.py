@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import singleflight
+
+
+class Upstream:
+    """A model call that blocks until released, counting how often it was made."""
+
+    def __init__(self, text="answer", words=None, error=None):
+        self.calls = 0
+        self.release = threading.Event()
+        self.text = text
+        self.words = words
+        self.error = error
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        if self.words is None:
+            return SimpleNamespace(text=self.text, usage_metadata=None)
+        return (SimpleNamespace(text=w) for w in self.words)
+
+
+def _run_together(n, fn, request=("generate_content", "m", ["q"], False), upstream=None):
+    """Start `n` calls of `fn`, release the upstream once all but the leader are waiting on it."""
+    pool = ThreadPoolExecutor(n)
+    futures = [pool.submit(fn)]
+    key = singleflight.request_hash(*request)
+    deadline = time.monotonic() + 5
+    while key not in singleflight._flights and time.monotonic() < deadline:
+        time.sleep(0.005)
+    futures += [pool.submit(fn) for _ in range(n - 1)]
+    while singleflight._flights[key].followers < n - 1 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    upstream.release.set()
+    results = []
+    for f in futures:
+        try:
+            results.append(f.result(5))
+        except Exception as e:
+            results.append(e)
+    pool.shutdown()
+    return results
+
+
+@pytest.fixture(autouse=True)
+def local_only(monkeypatch):
+    monkeypatch.setattr(singleflight, "ENABLED", True)
+    monkeypatch.setattr(singleflight, "SHARED_DB", None)
+
+
+def test_identical_calls_share_one_upstream_request():
+    upstream = Upstream()
+    shared = []
+
+    def ask():
+        return singleflight.coalesce("generate_content", "m", ["q"], False, upstream, shared.append)
+
+    responses = _run_together(5, ask, upstream=upstream)
+    assert upstream.calls == 1
+    assert [r.text for r in responses] == ["answer"] * 5
+    assert sum(getattr(r, "coalesced", False) for r in responses) == 4
+    assert shared == ["answer"] * 4  # followers only
+    assert not singleflight._flights
+
+
+def test_streams_fan_out_every_chunk():
+    upstream = Upstream(words=["a ", "streamed ", "answer"])
+
+    def ask():
+        stream = singleflight.coalesce("generate_content", "m", ["q"], True, upstream)
+        return "".join(c.text for c in stream)
+
+    assert _run_together(4, ask, request=("generate_content", "m", ["q"], True), upstream=upstream) == \
+        ["a streamed answer"] * 4
+    assert upstream.calls == 1
+
+
+def test_errors_reach_every_caller_and_are_not_kept():
+    upstream = Upstream(error=ConnectionError("down"))
+
+    def ask():
+        return singleflight.coalesce("generate_content", "m", ["q"], False, upstream)
+
+    results = _run_together(3, ask, upstream=upstream)
+    assert all(isinstance(r, ConnectionError) for r in results)
+    retry = Upstream()
+    retry.release.set()
+    assert singleflight.coalesce("generate_content", "m", ["q"], False, retry).text == "answer"
+    assert retry.calls == 1
+
+
+def test_different_requests_are_not_coalesced():
+    upstream = Upstream()
+    upstream.release.set()
+    singleflight.coalesce("generate_content", "m", ["q1"], False, upstream)
+    singleflight.coalesce("generate_content", "m", ["q2"], False, upstream)
+    singleflight.coalesce("generate_content", "other", ["q1"], False, upstream)
+    assert upstream.calls == 3
+
+
+def test_shared_store_leads_follows_and_publishes(tmp_path):
+    store = singleflight._SharedStore(str(tmp_path / "flights.db"))
+    assert store.claim("k") == ("lead", None)
+    assert store.claim("k") == ("follow", None)  # this process is alive and still in flight
+    store.publish("k", ["an ", "answer"], None)
+    state, record = store.claim("k")
+    assert state == "done"
+    assert singleflight.PublishedResponse(record).text == "an answer"
+    assert store.wait("k", timeout=0.1)["response"]["chunks"] == ["an ", "answer"]
+
+
+def test_abandoned_flight_is_given_up_on(tmp_path):
+    store = singleflight._SharedStore(str(tmp_path / "flights.db"))
+    store.claim("k")
+    store.abandon("k")
+    assert store.wait("k", timeout=0.1) is None
+    assert store.claim("k") == ("lead", None)
+
+
+OTHER_PID = os.getppid()  # a live process that is not this one
+
+
+def _other_process_leads(store, key):
+    store._conn().execute(
+        "INSERT OR REPLACE INTO flights (key, pid, started, result, finished) VALUES (?, ?, ?, NULL, NULL)",
+        (key, OTHER_PID, time.time()),
+    )
+
+
+def _other_process_publishes(store, key, text):
+    record = {"response": {"chunks": [text]}, "usage": None}
+    store._conn().execute("UPDATE flights SET result = ?, finished = ? WHERE key = ? AND pid = ?",
+                          (json.dumps(record), time.time(), key, OTHER_PID))
+
+
+@pytest.fixture
+def shared_store(tmp_path, monkeypatch):
+    store = singleflight._SharedStore(str(tmp_path / "flights.db"))
+    monkeypatch.setattr(singleflight, "SHARED_DB", store.path)
+    monkeypatch.setattr(singleflight, "_store", store)
+    monkeypatch.setattr(singleflight, "POLL_INTERVAL", 0.01)
+    return store
+
+
+def test_follower_follows_whoever_took_over_from_a_vanished_leader(shared_store, monkeypatch):
+    key = singleflight.request_hash("generate_content", "m", ["q"], False)
+    _other_process_leads(shared_store, key)
+    waits = []
+    wait = shared_store.wait
+
+    def leader_vanishes_then_another_takes_over(key, timeout=1.0):
+        waits.append(key)
+        if len(waits) == 1:
+            _other_process_leads(shared_store, key)  # a third process claimed it first
+            threading.Timer(0.05, _other_process_publishes, (shared_store, key, "their answer")).start()
+            return None
+        return wait(key, timeout)
+
+    monkeypatch.setattr(shared_store, "wait", leader_vanishes_then_another_takes_over)
+    upstream = Upstream()
+    upstream.release.set()
+    response = singleflight.coalesce("generate_content", "m", ["q"], False, upstream)
+    assert response.text == "their answer"
+    assert upstream.calls == 0
+    assert len(waits) == 2
+
+
+def test_follower_takes_a_result_published_while_it_gave_up(shared_store, monkeypatch):
+    key = singleflight.request_hash("generate_content", "m", ["q"], False)
+    _other_process_leads(shared_store, key)
+
+    def published_just_too_late(key, timeout=1.0):
+        _other_process_publishes(shared_store, key, "late answer")
+        return None
+
+    monkeypatch.setattr(shared_store, "wait", published_just_too_late)
+    upstream = Upstream()
+    upstream.release.set()
+    assert singleflight.coalesce("generate_content", "m", ["q"], False, upstream).text == "late answer"
+    assert upstream.calls == 0
+
+
+def test_follower_leads_once_the_leader_is_gone(shared_store):
+    key = singleflight.request_hash("generate_content", "m", ["q"], False)
+    _other_process_leads(shared_store, key)
+    threading.Timer(0.05, lambda: shared_store._conn().execute("DELETE FROM flights WHERE key = ?", (key,))).start()
+    upstream = Upstream()
+    upstream.release.set()
+    assert singleflight.coalesce("generate_content", "m", ["q"], False, upstream).text == "answer"
+    assert upstream.calls == 1
+    assert shared_store.claim(key)[0] == "done"  # published for the other processes
@@ -0,0 +1,58 @@
+import pytest
+
+from topic_classifier import (
+    ACCEPT, AMBIGUOUS, EVAL_SET, IT_KEYWORDS, REJECT, build_default_classifier, evaluate, tokenize,
+)
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return build_default_classifier()
+
+
+@pytest.mark.parametrize("question", [
+    "how to improve my memory",
+    "what is the dress code",
+    "what is a server in a restaurant",
+])
+def test_everyday_senses_are_not_accepted(classifier, question):
+    assert classifier.classify(question) != ACCEPT
+
+
+@pytest.mark.parametrize("word", ["code", "memory", "server", "network", "cloud", "os", "ip", "ram", "excel", "vector"])
+def test_ambiguous_words_are_not_keywords(word):
+    assert word not in IT_KEYWORDS
+
+
+@pytest.mark.parametrize("question", [
+    "what is kafka",
+    "where is java island",
+    "how long does a python snake live",
+    "what is my gemini horoscope",
+    "how to debug my relationship",
+])
+def test_keyword_alone_is_left_to_the_llm_gate(classifier, question):
+    assert classifier.classify(question) == AMBIGUOUS
+
+
+def test_logged_questions_are_not_promoted_on_a_keyword_alone():
+    logged = ["where is java island", "how long does a python snake live"] * 5
+    classifier = build_default_classifier(logged)
+    assert classifier.classify("where is java island") == AMBIGUOUS
+    assert classifier.classify("how long does a python snake live") == AMBIGUOUS
+
+
+def test_clear_cases_are_decided_locally(classifier):
+    assert classifier.classify("explain gradient descent in neural networks") == ACCEPT
+    assert classifier.classify("who won the cricket world cup") == REJECT
+
+
+def test_eval_set_accuracy(classifier):
+    assert len(EVAL_SET) >= 40
+    report = evaluate(classifier, repeats=1)
+    assert report["accuracy_on_decided"] == 1.0
+    assert report["coverage"] >= 0.35
+
+
+def test_tokenize_drops_stopwords_and_adds_bigrams():
+    assert tokenize("What is the R2 score?") == ["r2", "score", "r2 score"]
@@ -0,0 +1,309 @@
+"""Local IT-topic pre-classifier for limitbot.
+
+A small TF-IDF centroid model plus a keyword lexicon decides in well under a
+millisecond whether a question is clearly about IT, clearly not, or somewhere
+in between. Only the ambiguous middle band is sent to Gemini for the
+classification prompt; clear rejections never leave the process.
+
+Run `python topic_classifier.py --eval` for the accuracy/latency harness.
+"""
+import argparse
+import math
+import re
+import statistics
+import time
+from collections import Counter
+
+from question_log import load_logged_questions
+
+ACCEPT = "accept"
+REJECT = "reject"
+AMBIGUOUS = "ambiguous"
+
+OUT_OF_CONTEXT_REPLY = "Sorry, out of context question."
+
+# Terms that point to IT. Words with common everyday meanings ("code", "memory", "server",
+# "cloud", ...) are left out. Many that remain have other senses too ("java island", "python
+# snake"), so a keyword only tips a question to ACCEPT when its other words also lean IT;
+# otherwise it keeps the question away from REJECT.
+IT_KEYWORDS = {
+    "ai", "ml", "dl", "nlp", "llm", "gpt", "gemini", "rmse", "mse", "mae", "r2", "auc", "roc",
+    "regression", "classification", "clustering", "neural", "cnn", "rnn", "lstm", "transformer",
+    "algorithm", "python", "java", "javascript", "typescript", "html", "css", "react", "django",
+    "flask", "sql", "database", "api", "http", "tcp", "dns", "networking",
+    "aws", "azure", "gcp", "docker", "kubernetes", "devops", "mlops", "linux",
+    "git", "github", "compiler", "programming", "coding", "software", "hardware", "cpu",
+    "gpu", "cybersecurity", "encryption", "blockchain", "dataset", "pandas", "numpy",
+    "tensorflow", "pytorch", "overfitting", "gradient", "embedding", "backend",
+    "frontend", "microservices", "kafka", "hadoop", "streamlit", "debug", "rom",
+}
+
+IT_SEEDS = [
+    "what is machine learning",
+    "what is artificial intelligence",
+    "explain deep learning",
+    "what is r2 score in regression",
+    "what is root mean square error",
+    "difference between supervised and unsupervised learning",
+    "how does a neural network learn",
+    "what is overfitting and how to avoid it",
+    "how do i reverse a linked list in python",
+    "what is a rest api",
+    "explain tcp vs udp",
+    "how does dns resolution work",
+    "what is docker and why use containers",
+    "how to deploy a flask app on aws",
+    "what is a primary key in sql database",
+    "explain gradient descent",
+    "what is precision and recall",
+    "how does https encryption work",
+    "what is kubernetes",
+    "difference between git merge and rebase",
+    "what is data science",
+    "how to build a website with react",
+    "what is cloud computing",
+    "explain the transformer architecture",
+    "what is a vector database",
+    "how to find a memory leak in a c++ program",
+    "how to configure an nginx web server",
+    "what does an operating system kernel do",
+    "how to write a function that returns a list",
+    "how to fix a bug in my code",
+    "how to connect to a mysql database from node",
+    "what is a hash table",
+    "how does a compiler work",
+    "what is object oriented programming",
+    "what is a decision tree classifier",
+    "what is an ip address and subnet mask",
+    "how much ram does a laptop need for programming",
+    "how to install packages with pip",
+    "what is a load balancer",
+    "what is unit testing",
+    "what is a css flexbox layout",
+    "what is a variable in programming",
+    "how to query data with sql joins",
+]
+
+OFF_SEEDS = [
+    "who is gandhi",
+    "have you watched naruto",
+    "what is the capital of france",
+    "who won the cricket world cup",
+    "tell me a joke",
+    "what is your favourite movie",
+    "how to cook biryani",
+    "who is the prime minister of india",
+    "what is the meaning of life",
+    "recommend a good anime",
+    "how tall is mount everest",
+    "what should i eat for dinner",
+    "who wrote romeo and juliet",
+    "what is the weather today",
+    "how to lose weight fast",
+    "best places to visit in goa",
+    "who is the richest man in the world",
+    "sing me a song",
+    "what is love",
+    "how old is the sun",
+    "who is the best football player",
+    "tell me about indian history",
+    "who is the president of the united states",
+    "explain the french revolution",
+    "what is the largest animal on earth",
+    "which actor won the oscar",
+    "how to improve my concentration while studying",
+    "what should i wear to a wedding",
+    "how to make friends at a new school",
+    "what is gravity in physics",
+    "how does rain form in clouds",
+    "how to sleep better at night",
+    "what is the history of the roman empire",
+    "how to play chess",
+    "what are the planets in the solar system",
+]
+
+# Held-out labelled questions for --eval (True = IT-related)
+EVAL_SET = [
+    ("what is ml", True),
+    ("what is  ai", True),
+    ("what is rmse", True),
+    ("what is r2 score", True),
+    ("explain random forest algorithm", True),
+    ("how to connect python to mysql", True),
+    ("what is an api gateway", True),
+    ("how do convolutional neural networks work", True),
+    ("what is the difference between ram and rom", True),
+    ("how to center a div in css", True),
+    ("what is logistic regression", True),
+    ("explain k means clustering", True),
+    ("what is devops", True),
+    ("what is an ip address", True),
+    ("who is virat kohli", False),
+    ("what is the best pizza topping", False),
+    ("tell me about the mughal empire", False),
+    ("who is the president of america", False),
+    ("how to learn guitar", False),
+    ("what is the plot of naruto", False),
+    ("which is the tallest building", False),
+    ("what is photosynthesis", False),
+    ("recommend a bollywood movie", False),
+    ("how many players in a football team", False),
+    # Everyday senses of IT words
+    ("how to improve my memory", False),
+    ("what is the dress code", False),
+    ("what is a server in a restaurant", False),
+    ("how to network at a conference", False),
+    ("what is a vector in physics", False),
+    ("what is the cloud made of", False),
+    ("how to rest after a workout", False),
+    ("what is the capital of japan", False),
+    ("who invented the telephone", False),
+    ("what is a healthy breakfast", False),
+    # IT questions using those words
+    ("how to fix a memory leak in java", True),
+    ("how to set up a web server on linux", True),
+    ("what is a cloud database", True),
+    ("how to write clean python code", True),
+    ("what is a linked list", True),
+    ("how does a load balancer work", True),
+    ("what is an operating system", True),
+    ("how to debug a javascript function", True),
+    # Other senses of the keywords themselves
+    ("where is java island", False),
+    ("how long does a python snake live", False),
+    ("what is my gemini horoscope", False),
+    ("how to debug my relationship", False),
+    ("who was franz kafka", False),
+]
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+_STOPWORDS = {
+    "what", "is", "the", "a", "an", "of", "in", "to", "and", "how", "do", "does", "i", "you",
+    "me", "my", "for", "on", "with", "why", "who", "are", "can", "explain", "between", "vs",
+    "about", "tell", "which", "it", "be", "your", "use", "difference",
+}
+
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed, plus adjacent bigrams."""
+    words = [w for w in _TOKEN_RE.findall(text.lower()) if w not in _STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class TopicClassifier:
+    """TF-IDF centroid classifier with a keyword override and an ambiguity band."""
+
+    def __init__(self, it_examples, off_examples, accept_threshold=0.12, reject_threshold=-0.05,
+                 keyword_boost=0.35):
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self.keyword_boost = keyword_boost
+
+        docs = [tokenize(t) for t in list(it_examples) + list(off_examples)]
+        df = Counter(term for doc in docs for term in set(doc))
+        n = len(docs)
+        self._idf = {term: math.log((1 + n) / (1 + count)) + 1.0 for term, count in df.items()}
+        self._it_centroid = self._centroid(docs[:len(it_examples)])
+        self._off_centroid = self._centroid(docs[len(it_examples):])
+
+    def _vector(self, tokens):
+        tf = Counter(tokens)
+        vec = {t: c * self._idf[t] for t, c in tf.items() if t in self._idf}
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        return {t: v / norm for t, v in vec.items()} if norm else {}
+
+    def _centroid(self, docs):
+        total = Counter()
+        for doc in docs:
+            total.update(self._vector(doc))
+        norm = math.sqrt(sum(v * v for v in total.values()))
+        return {t: v / norm for t, v in total.items()} if norm else {}
+
+    @staticmethod
+    def _dot(vec, centroid):
+        return sum(v * centroid.get(t, 0.0) for t, v in vec.items())
+
+    def _centroid_score(self, tokens):
+        vec = self._vector(tokens)
+        return self._dot(vec, self._it_centroid) - self._dot(vec, self._off_centroid)
+
+    def _scores(self, question):
+        """(centroid score, whether a keyword is present, centroid score of the non-keyword words)."""
+        tokens = tokenize(question)
+        rest = [t for t in tokens if not any(w in IT_KEYWORDS for w in t.split())]
+        return self._centroid_score(tokens), len(rest) < len(tokens), self._centroid_score(rest)
+
+    def score(self, question):
+        """Return a score in roughly [-1, 1]; positive means IT-related.
+
+        With a keyword present the score only leans IT as far as the other
+        words do, so one keyword alone never decides a question.
+        """
+        centroid, keyword, rest = self._scores(question)
+        if not keyword:
+            return centroid
+        return centroid + self.keyword_boost if rest > 0 else min(centroid, rest)
+
+    def classify(self, question):
+        """Return ACCEPT, REJECT or AMBIGUOUS for the question."""
+        _, keyword, _ = self._scores(question)
+        score = self.score(question)
+        if score >= self.accept_threshold:
+            return ACCEPT
+        if score <= self.reject_threshold and not keyword:
+            return REJECT
+        return AMBIGUOUS  # includes keyword-only hits: the LLM gate decides
+
+
+def build_default_classifier(logged_questions=()):
+    """Train on the seed sets, adding logged questions the seed-only classifier accepts.
+
+    A keyword is not enough to make a logged question an IT example; it has
+    to be accepted on the strength of its other words too.
+    """
+    seeded = TopicClassifier(IT_SEEDS, OFF_SEEDS)
+    logged_it = [q for q in dict.fromkeys(logged_questions) if seeded.classify(q) == ACCEPT]
+    return TopicClassifier(IT_SEEDS + logged_it, OFF_SEEDS) if logged_it else seeded
+
+
+def evaluate(classifier, eval_set=EVAL_SET, repeats=200):
+    """Measure accuracy on decided cases, local coverage and per-call latency."""
+    decided = correct = 0
+    for question, is_it in eval_set:
+        verdict = classifier.classify(question)
+        if verdict == AMBIGUOUS:
+            continue
+        decided += 1
+        correct += (verdict == ACCEPT) == is_it
+
+    timings = []
+    for _ in range(repeats):
+        for question, _ in eval_set:
+            start = time.perf_counter()
+            classifier.classify(question)
+            timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return {
+        "examples": len(eval_set),
+        "decided_locally": decided,
+        "coverage": decided / len(eval_set),
+        "accuracy_on_decided": correct / decided if decided else 0.0,
+        "latency_us_p50": statistics.median(timings),
+        "latency_us_p99": timings[int(len(timings) * 0.99) - 1],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IT-topic pre-classifier")
+    parser.add_argument("--eval", action="store_true", help="run the accuracy/latency harness")
+    parser.add_argument("--log", default="question_log.jsonl", help="question log used for training")
+    parser.add_argument("question", nargs="*", help="classify the given question")
+    args = parser.parse_args()
+
+    clf = build_default_classifier(load_logged_questions(args.log))
+    if args.eval:
+        for key, value in evaluate(clf).items():
+            print(f"{key:>22}: {value:.3f}" if isinstance(value, float) else f"{key:>22}: {value}")
+    if args.question:
+        text = " ".join(args.question)
+        print(f"{clf.classify(text)} ({clf.score(text):+.3f})")
@@ -0,0 +1,234 @@
+"""Per-stage latency tracing with a Prometheus text export.
+
+Wrap a pipeline stage with `trace`, either as a decorator or a context
+manager:
+
+    @trace("get_pdf_text")
+    def get_pdf_text(pdf_docs): ...
+
+    with trace("similarity_search"):
+        docs = db.similarity_search(question)
+
+Each stage gets a latency histogram and an error counter. Model calls made
+through gemini_gateway while a stage is open add the request bytes and the
+prompt/output tokens to that stage (the innermost open stage on the thread).
+
+Metrics are kept in process memory and exported in the Prometheus text
+format, from an HTTP endpoint when METRICS_PORT is set (`/metrics`) and/or to
+a file rewritten every METRICS_DUMP_INTERVAL seconds when METRICS_FILE is set
+(suitable for node_exporter's textfile collector). `python tracing.py --dump`
+prints the current process's metrics, which is mostly useful after a run of
+`--demo`.
+"""
+import argparse
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds; model calls dominate, so the tail goes out to a minute
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", "15"))
+
+_lock = threading.Lock()
+_histograms = {}  # stage -> [bucket counts..., +Inf count, sum]
+_counters = {}  # (metric name, stage) -> value
+_local = threading.local()
+
+COUNTER_HELP = {
+    "gemini_stage_errors_total": "Stage invocations that raised",
+    "gemini_request_bytes_total": "Text and inline-data bytes sent to the model",
+    "gemini_prompt_tokens_total": "Prompt tokens reported by the model",
+    "gemini_output_tokens_total": "Output tokens reported by the model",
+    "gemini_model_calls_total": "Model calls made",
+}
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current_stage():
+    """Innermost open stage on this thread, or 'untraced'."""
+    stack = _stack()
+    return stack[-1] if stack else "untraced"
+
+
+def observe(stage, seconds):
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+        hist[len(BUCKETS)] += 1
+        hist[-1] += seconds
+
+
+def count(name, value=1, stage=None):
+    """Add to a per-stage counter; `stage` defaults to the current one."""
+    key = (name, stage or current_stage())
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+class trace:
+    """Time a stage; use as `with trace(name):` or `@trace(name)`."""
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        _stack().append(self.stage)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self._start)
+        _stack().pop()
+        if exc_type is not None:
+            count("gemini_stage_errors_total", stage=self.stage)
+        return False
+
+    def __call__(self, fn):
+        stage = self.stage
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with trace(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+
+def record_usage(usage, stage=None):
+    """Count the prompt/output tokens from a response's usage_metadata."""
+    if usage is None:
+        return
+    count("gemini_prompt_tokens_total", getattr(usage, "prompt_token_count", 0) or 0, stage)
+    count("gemini_output_tokens_total", getattr(usage, "candidates_token_count", 0) or 0, stage)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {stage: list(h) for stage, h in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP gemini_stage_duration_seconds Wall time per pipeline stage",
+        "# TYPE gemini_stage_duration_seconds histogram",
+    ]
+    for stage, hist in sorted(histograms.items()):
+        label = _label(stage)
+        for bound, n in zip(BUCKETS, hist):
+            lines.append(f'gemini_stage_duration_seconds_bucket{{stage="{label}",le="{bound}"}} {n}')
+        lines.append(f'gemini_stage_duration_seconds_bucket{{stage="{label}",le="+Inf"}} {hist[len(BUCKETS)]}')
+        lines.append(f'gemini_stage_duration_seconds_sum{{stage="{label}"}} {hist[-1]:.6f}')
+        lines.append(f'gemini_stage_duration_seconds_count{{stage="{label}"}} {hist[len(BUCKETS)]}')
+    for name, help_text in COUNTER_HELP.items():
+        rows = sorted((stage, v) for (n, stage), v in counters.items() if n == name)
+        if not rows:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        lines.extend(f'{name}{{stage="{_label(stage)}"}} {value}' for stage, value in rows)
+    return "\n".join(lines) + "\n"
+
+
+def dump(path):
+    """Write the metrics to `path` atomically."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def start_exporter():
+    """Start the METRICS_PORT endpoint and/or METRICS_FILE dumper once per process."""
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+    port = os.getenv("METRICS_PORT")
+    if port:
+        try:
+            server = ThreadingHTTPServer((os.getenv("METRICS_HOST", "127.0.0.1"), int(port)), _MetricsHandler)
+        except OSError as e:  # another app on this box already serves the port
+            print(f"tracing: metrics endpoint not started on port {port}: {e}")
+        else:
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    path = os.getenv("METRICS_FILE")
+    if path:
+        def loop():
+            while True:
+                time.sleep(DUMP_INTERVAL)
+                try:
+                    dump(path)
+                except OSError as e:
+                    print(f"tracing: could not write {path}: {e}")
+
+        threading.Thread(target=loop, name="metrics-dump", daemon=True).start()
+
+
+def _demo():
+    @trace("get_pdf_text")
+    def extract():
+        time.sleep(0.02)
+        return "text " * 1000
+
+    with trace("handle_user_input"):
+        text = extract()
+        with trace("similarity_search"):
+            time.sleep(0.003)
+        with trace("qa_chain"):
+            count("gemini_request_bytes_total", len(text.encode("utf-8")))
+            count("gemini_model_calls_total")
+            time.sleep(0.05)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage tracing and metrics export")
+    parser.add_argument("--demo", action="store_true", help="record a few synthetic stages first")
+    parser.add_argument("--dump", metavar="PATH", nargs="?", const="-", help="print (or write) the metrics")
+    args = parser.parse_args()
+    if args.demo:
+        _demo()
+    if args.dump == "-" or (args.demo and not args.dump):
+        print(render_prometheus(), end="")
+    elif args.dump:
+        dump(args.dump)
+    else:
+        parser.print_help()